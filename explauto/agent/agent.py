@@ -17,6 +17,10 @@ class Agent(Observable):
         self.ms = np.zeros(self.conf.ndims)
         self.expl_dims = im_model.expl_dims
         self.inf_dims = sorted(list(set(conf.dims) - set(self.expl_dims)))
+        # Positions of the motor and sensory dimensions in a point (x, y) of the exploration and inference spaces
+        ms_order = np.argsort(list(self.expl_dims) + list(self.inf_dims))
+        self.m_positions = ms_order[self.conf.m_dims]
+        self.s_positions = ms_order[self.conf.s_dims]
 
         self.sensorimotor_model = sm_model
         self.interest_model = im_model
@@ -83,6 +87,17 @@ class Agent(Observable):
                 x = x[list(set(self.expl_dims) - set(self.context_mode['context_dims']))]
         return x
 
+    def choose_batch(self, n, context_ms=None):
+        """ Returns n points chosen by the interest model (array of shape (n, len(expl_dims))), given a context for each point (rows of context_ms) in context modes.
+        """
+        if self.context_mode is not None:
+            return np.array([self.choose(c) for c in context_ms])
+        try:
+            return self.interest_model.sample(n)
+        except ExplautoBootstrapError:
+            logger.warning('Interest model not bootstrapped yet')
+            return rand_bounds(self.conf.bounds[:, self.expl_dims], n)
+
     def infer(self, expl_dims, inf_dims, x):
         """ Use the sensorimotor model to compute the expected value on inf_dims given that the value on expl_dims is x.
 
@@ -100,6 +115,24 @@ class Agent(Observable):
             y = rand_bounds(self.conf.bounds[:, inf_dims]).flatten()
         return y
 
+    def infer_batch(self, expl_dims, inf_dims, X):
+        """ Same as :meth:`~explauto.agent.agent.Agent.infer` for each row of X, with a batch inference of the sensorimotor model.
+        """
+        X = np.asarray(X)
+        n_bootstrap = min(self.n_bootstrap, len(X))
+        self.n_bootstrap -= n_bootstrap
+        if n_bootstrap > 0:
+            logger.warning('Sensorimotor model not bootstrapped yet')
+        Y = np.zeros((len(X), len(inf_dims)))
+        Y[:n_bootstrap] = rand_bounds(self.conf.bounds[:, inf_dims], n_bootstrap)
+        if n_bootstrap < len(X):
+            try:
+                Y[n_bootstrap:] = self.sensorimotor_model.infer_batch(expl_dims, inf_dims, X[n_bootstrap:])
+            except ExplautoBootstrapError:
+                logger.warning('Sensorimotor model not bootstrapped yet')
+                Y[n_bootstrap:] = rand_bounds(self.conf.bounds[:, inf_dims], len(X) - n_bootstrap)
+        return Y
+
     def extract_ms(self, x, y):
         """ Returns the motor and sensory parts from a point in the exploration
         space (expl_dims) and a point in the inference space (inf_dims).
@@ -109,6 +142,12 @@ class Agent(Observable):
         ms[self.inf_dims] = y
         return ms[self.conf.m_dims], ms[self.conf.s_dims]
 
+    def extract_ms_batch(self, X, Y):
+        """ Returns the motor and sensory parts (arrays of shape (n, m_ndims) and (n, s_ndims)) from points in the exploration space (rows of X) and in the inference space (rows of Y).
+        """
+        XY = np.hstack((X, Y))
+        return XY[:, self.m_positions], XY[:, self.s_positions]
+
     def motor_primitive(self, m):
         """ Prepare the movement from a command m. To be overridded in order to generate more complex movement (tutorial to come). This version simply bounds the command.
         """
@@ -163,6 +202,97 @@ class Agent(Observable):
         return movement
 
 
+    def produce_batch(self, n, context_ms=None):
+        """ Same as :meth:`~explauto.agent.agent.Agent.produce` for n movements at once (given a context for each movement, rows of context_ms, in context modes).
+
+        The points, inferences and movements are emitted once for the batch (as arrays of shape (n, ...)), on the topics 'choice_batch', 'inference_batch' and 'movement_batch'.
+
+        :returns: the generated movements (array of shape (n, m_ndims))
+        """
+        if context_ms is not None:
+            context_ms = np.asarray(context_ms)
+            n = len(context_ms)
+        self.x = self.choose_batch(n, context_ms)
+        if (context_ms is not None and self.context_mode["mode"] == 'mdmsds' and
+                self.expl_dims == self.conf.s_dims and not self.context_mode['choose_m']):
+            m = context_ms[:, :self.conf.m_ndims//2]
+            in_dims = list(range(self.conf.m_ndims//2)) + list(range(self.conf.m_ndims, self.conf.m_ndims + self.conf.s_ndims))
+            out_dims = list(range(self.conf.m_ndims//2, self.conf.m_ndims))
+            dm = self.infer_batch(in_dims, out_dims, np.hstack((m, self.x)))
+            self.y = np.hstack((m, dm))
+        else:
+            self.y = self.infer_batch(self.expl_dims, self.inf_dims, self.x)
+
+        self.m, self.s = self.extract_ms_batch(self.x, self.y)
+
+        movements = self.motor_primitive(self.m)
+
+        self.emit('choice_batch', self.x)
+        self.emit('inference_batch', self.y)
+        self.emit('movement_batch', movements)
+
+        return movements
+
+    def bootstrap(self, environment, n=None):
+        """ Bootstrap stage: the points of n iterations (the remaining n_bootstrap ones by default) are chosen at once,
+        with random inferences instead of those of the sensorimotor model, executed in the environment as a batch of movements,
+        and perceived with batch updates of the sensorimotor and interest models (see :meth:`~explauto.agent.agent.Agent.perceive_batch`).
+
+        :param environment: the environment in which the movements are executed
+
+        :returns: the sensory effects of the movements
+        """
+        if self.context_mode is not None:
+            raise NotImplementedError('Batch bootstrap is only available without context')
+        n = self.n_bootstrap if n is None else n
+        self.n_bootstrap = max(0, self.n_bootstrap - n)
+
+        self.x = self.choose_batch(n)
+        self.y = rand_bounds(self.conf.bounds[:, self.inf_dims], n)
+        self.m, self.s = self.extract_ms_batch(self.x, self.y)
+        movements = self.motor_primitive(self.m)
+
+        self.emit('choice_batch', self.x)
+        self.emit('inference_batch', self.y)
+        self.emit('movement_batch', movements)
+
+        S = environment.update_batch(movements)
+        self.perceive_batch(S)
+        return S
+
+    def perceive_batch(self, S_, context=None):
+        """ Same as :meth:`~explauto.agent.agent.Agent.perceive` for the sensory effects (rows of S_) of the movements of the last :meth:`~explauto.agent.agent.Agent.produce_batch`, the interest model being updated at once.
+
+        The perceived effects are emitted once for the batch, on the topic 'perception_batch'.
+        """
+        S = self.sensory_primitive(np.asarray(S_))
+        self.emit('perception_batch', S)
+        if context is None:
+            M, S_g = self.m, self.s
+            MS_sm = S
+            XY, MS = np.hstack((M, S_g)), np.hstack((M, S))
+        else:
+            context = np.asarray(context)
+            if self.context_mode["mode"] == 'mdmsds':
+                M = self.m
+                m, dm = M[:, :M.shape[1]//2], M[:, M.shape[1]//2:]
+                s, ds = S[:, :S.shape[1]//2], S[:, S.shape[1]//2:]
+                ds_g = self.s[:, :self.s.shape[1]//2]
+                MS_sm = np.hstack((s, ds))
+                XY, MS = np.hstack((m, dm, context, ds_g)), np.hstack((m, dm, s, ds))
+            elif self.context_mode["mode"] == 'mcs':
+                M = self.m
+                s = S[:, context.shape[1]:]
+                s_g = self.s[:, context.shape[1]:]
+                MS_sm = np.hstack((context, s))
+                XY, MS = np.hstack((M, context, s_g)), np.hstack((M, context, s))
+            else:
+                raise NotImplementedError
+        self.sensorimotor_model.update_batch(M, MS_sm)
+        self.interest_model.update_batch(XY, MS)
+
+        self.t += len(S)
+
     def perceive(self, s_, context=None):
         """ Learning (see the `Explauto introduction <about.html>`__ for more detail):
 
@@ -79,11 +79,13 @@ class Environment(Observable, metaclass=ABCMeta):
 
         :param numpy.array m_ag: a motor command with shape (self.conf.m_ndims, ) or a set of n motor commands of shape (n, self.conf.m_ndims)
 
-        :param bool log: emit the motor and sensory values for logging purpose (default: True).
+        :param bool log: emit the motor and sensory values for logging purpose (default: True). The values of a set of motor commands are emitted at once on the 'motor_batch' and 'sensori_batch' topics, and one command after the other on the 'motor' and 'sensori' topics for the subscribers that are not subscribed to the batch topics (as before the batch topics existed).
 
         :returns: an array of shape (self.conf.ndims, ) or (n, self.conf.ndims) according to the shape of the m_ag parameter, containing the motor values (which can be different from m_ag, e.g. bounded according to self.conf.m_bounds) and the corresponding sensory values.
 
         .. note:: self.conf.ndims = self.conf.m_ndims + self.conf.s_ndims is the dimensionality of the sensorimotor space (dim of the motor space + dim of the sensory space).
+
+        .. note:: A set of motor commands is executed one after the other (from the current state if reset is False), see :meth:`compute_sensori_effect_batch`.
         """
 
         if reset:
@@ -91,10 +93,34 @@ class Environment(Observable, metaclass=ABCMeta):
         if len(array(m_ag).shape) == 1:
             s = self.one_update(m_ag, log)
         else:
-            s = []
-            for m in m_ag:
-                s.append(self.one_update(m, log))
-            s = array(s)
+            s = self.batch_update(m_ag, False, log)
+        return s
+
+    def update_batch(self, m_ags, log=True):
+        """ Computes the sensory effects of a batch of motor commands, each one from a reset environment (as with n calls to :meth:`update`).
+
+        :param numpy.array m_ags: motor commands of shape (n, self.conf.m_ndims)
+
+        :param bool log: emit the motor and sensory values of the batch (arrays of shape (n, ...)) on the 'motor_batch' and 'sensori_batch' topics, and row by row on the 'motor' and 'sensori' topics for the subscribers that are not subscribed to the batch topics (default: True).
+
+        :returns: an array of shape (n, self.conf.s_ndims) containing the sensory effects.
+        """
+        return self.batch_update(m_ags, True, log).reshape(len(m_ags), -1)
+
+    def batch_update(self, m_ags, reset, log=True):
+        m_envs = self.compute_motor_command_batch(m_ags)
+        s = self.compute_sensori_effect_batch(m_envs, reset)
+
+        if log:
+            self.emit('motor_batch', m_envs)
+            self.emit('sensori_batch', s)
+            # Row by row, as successive updates, for the subscribers that only follow the row topics
+            motor_subscribers, sensori_subscribers = self.row_subscribers('motor'), self.row_subscribers('sensori')
+            if motor_subscribers or sensori_subscribers:
+                for m_env, s_env in zip(m_envs, s):
+                    self.emit('motor', m_env, motor_subscribers)
+                    self.emit('sensori', s_env, sensori_subscribers)
+
         return s
 
     def reset(self):
@@ -109,6 +135,25 @@ class Environment(Observable, metaclass=ABCMeta):
     def compute_sensori_effect(self):
         raise NotImplementedError
 
+    def compute_motor_command_batch(self, ag_states):
+        """ Motor commands of a set of agent motor commands (array of shape (n, self.conf.m_ndims)).
+
+        Environments can override it with a vectorized version, by default compute_motor_command is called on each of them.
+        """
+        return array([self.compute_motor_command(ag_state) for ag_state in ag_states])
+
+    def compute_sensori_effect_batch(self, m_envs, reset=False):
+        """ Sensory effects of a set of motor commands, executed one after the other from the current state, or each one from a reset environment if reset is True.
+
+        Environments can override it with a vectorized version, by default compute_sensori_effect is called on each of them.
+        """
+        s = []
+        for m_env in m_envs:
+            if reset:
+                self.reset()
+            s.append(self.compute_sensori_effect(m_env))
+        return array(s)
+
     def random_motors(self, n=1):
         return rand_bounds(self.conf.bounds[:, self.conf.m_dims], n)
 
@@ -63,6 +63,17 @@ class FlatEnvironment(Environment):
                 result.append(self.combined_s([si for env_results in results_envs for si in env_results[i]]))
         assert len(result) == self.conf.s_ndims
         return result
+
+    def compute_motor_command_batch(self, ms):
+        assert np.shape(ms)[1] == self.conf.m_ndims
+        return np.array(ms)
+
+    def compute_sensori_effect_batch(self, ms, reset=False):
+        # The environments are independent: each one runs its part of all the motor commands
+        results_envs = [env.compute_sensori_effect_batch(env.compute_motor_command_batch(self.get_m_env(ms, i)), reset)
+                        for i, env in enumerate(self.envs)]
+        return np.array([self.combined_s([si for env_results in results for si in env_results])
+                         for results in zip(*results_envs)])
     
     def plot(self, ax, i, **kwargs_plot):
         for env in self.envs:
@@ -151,6 +162,22 @@ class HierarchicalEnvironment(Environment):
         
         assert len(s) == self.conf.s_ndims
         return s
+
+    def compute_motor_command_batch(self, ms):
+        assert np.shape(ms)[1] == self.conf.m_ndims
+        return np.array(ms)
+
+    def compute_sensori_effect_batch(self, ms, reset=False):
+        ms_lower = np.array([self.fun_m_lower(m) for m in ms])
+        if ms_lower.ndim != 2:
+            # The lower environment takes trajectories as input
+            return Environment.compute_sensori_effect_batch(self, ms, reset)
+        # The lower environment does not depend on the top one: it runs all the motor commands first
+        ss_lower = self.lower_env.compute_sensori_effect_batch(self.lower_env.compute_motor_command_batch(ms_lower), reset)
+        ss_lower = [list(s_lower) for s_lower in ss_lower]
+        ss_lower_upd = np.array([self.fun_s_lower(m, s_lower) for m, s_lower in zip(ms, ss_lower)])
+        tops_upd = self.top_env.compute_sensori_effect_batch(self.top_env.compute_motor_command_batch(ss_lower_upd), reset)
+        return np.array([self.fun_s_top(m, s_lower, list(top_upd)) for m, s_lower, top_upd in zip(ms, ss_lower, tops_upd)])
     
     def plot(self, ax, i, **kwargs_plot):
         self.lower_env.plot(ax, i, **kwargs_plot)
@@ -1,4 +1,4 @@
-from numpy import pi, array, cos, sin
+from numpy import pi, array, cos, sin, tile, where
 from numpy import random
 from copy import copy
 
@@ -37,6 +37,24 @@ class PendulumEnvironment(Environment):
         res += self.noise * random.randn(*res.shape)
         return res
 
+    def compute_motor_command_batch(self, ag_states):
+        return bounds_min_max(ag_states, self.conf.m_mins, self.conf.m_maxs)
+
+    def compute_sensori_effect_batch(self, m_envs, reset=False):
+        if not reset:
+            return Environment.compute_sensori_effect_batch(self, m_envs, reset)
+        # Pendulums simulated in parallel from the initial state, one per motor command
+        theta, dtheta = tile(array(self.x0, dtype=float).reshape(2, 1), len(m_envs))
+        for u in self.bf.trajectory(m_envs).T:
+            acc = u + sin(theta)
+            theta, dtheta = theta + dtheta * self.dt + (self.dt * self.dt) / 2.0 * acc, dtheta + acc * self.dt
+            theta = where(theta > pi, theta - 2.0 * pi, where(theta < -pi, theta + 2.0 * pi, theta))
+        res = array([theta, dtheta]).T
+        if len(res):
+            self.x = list(res[-1])
+        res += self.noise * random.randn(*res.shape)
+        return res
+
     def plot_current_state(self, ax):
         ax.plot(0, 0, 'sk', ms=6)
         x, y = cos(self.x[0] + pi/2.), sin(self.x[0] + pi/2.)
@@ -7,41 +7,45 @@ from ...utils import bounds_min_max
 def forward(angles, lengths):
     """ Link object as defined by the standard DH representation.
 
-    :param list angles: angles of each joint
+    :param list angles: angles of each joint, or an array of shape (n, n_joints) of n angle vectors
 
     :param list lengths: length of each segment
 
-    :returns: a tuple (x, y) of the end-effector position
+    :returns: a tuple (x, y) of the end-effector position (of arrays of shape (n, ) for n angle vectors)
 
     .. warning:: angles and lengths should be the same size.
     """
-    x, y = joint_positions(angles, lengths)
-    return x[-1], y[-1]
+    a = _absolute_angles(angles, lengths)
+    return np.dot(np.cos(a), lengths), np.dot(np.sin(a), lengths)
 
 
 def joint_positions(angles, lengths, unit='rad'):
     """ Link object as defined by the standard DH representation.
 
-    :param list angles: angles of each joint
+    :param list angles: angles of each joint, or an array of shape (n, n_joints) of n angle vectors
 
     :param list lengths: length of each segment
 
-    :returns: x positions of each joint, y positions of each joints, except the first one wich is fixed at (0, 0)
+    :returns: x positions of each joint, y positions of each joints, except the first one wich is fixed at (0, 0) (arrays of shape (n, n_joints) for n angle vectors)
 
     .. warning:: angles and lengths should be the same size.
     """
-    if len(angles) != len(lengths):
+    a = _absolute_angles(angles, lengths, unit)
+    return np.cumsum(np.cos(a)*lengths, axis=-1), np.cumsum(np.sin(a)*lengths, axis=-1)
+
+
+def _absolute_angles(angles, lengths, unit='rad'):
+    if np.shape(angles)[-1] != len(lengths):
         raise ValueError('angles and lengths must be the same size!')
 
     if unit == 'rad':
-        a = np.array(angles)
+        a = np.asarray(angles, dtype=float)
     elif unit == 'std':
-        a = np.pi * np.array(angles)
+        a = np.pi * np.asarray(angles, dtype=float)
     else:
         raise NotImplementedError
-     
-    a = np.cumsum(a)
-    return np.cumsum(np.cos(a)*lengths), np.cumsum(np.sin(a)*lengths)
+
+    return np.cumsum(a, axis=-1)
 
 
 def lengths(n_dofs, ratio):
@@ -71,6 +75,14 @@ class SimpleArmEnvironment(Environment):
         hand_pos += self.noise * np.random.randn(*hand_pos.shape)
         return hand_pos
 
+    def compute_motor_command_batch(self, joint_pos_ags):
+        return bounds_min_max(joint_pos_ags, self.conf.m_mins, self.conf.m_maxs)
+
+    def compute_sensori_effect_batch(self, joint_pos_envs, reset=False):
+        hand_pos = np.column_stack(forward(joint_pos_envs, self.lengths))
+        hand_pos += self.noise * np.random.randn(*hand_pos.shape)
+        return hand_pos
+
     def plot(self, ax, m, s, **kwargs_plot):
         self.plot_arm(ax, m, **kwargs_plot)
 
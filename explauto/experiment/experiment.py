@@ -1,3 +1,4 @@
+import bisect
 import logging
 import threading
 import numpy as np
@@ -47,16 +48,21 @@ class Experiment(Observer):
         self.ag.subscribe('choice', self)
         self.ag.subscribe('inference', self)
         self.ag.subscribe('perception', self)
+        for topic in ['choice', 'inference', 'perception']:
+            self.ag.subscribe(topic + '_batch', self)
         self.env.subscribe('motor', self)
         self.env.subscribe('sensori', self)
+        for topic in ['motor', 'sensori']:
+            self.env.subscribe(topic + '_batch', self)
 
         self._running = threading.Event()
 
-    def run(self, n_iter=-1, bg=False):
+    def run(self, n_iter=-1, bg=False, batch_size=1):
         """ Run the experiment.
 
             :param int n_iter: Number of run iterations, by default will run until the last evaluation step.
             :param bool bg: whether to run in background (using a Thread)
+            :param int batch_size: number of iterations run at once with the batch paths of the agent and environment (without context only), the models being updated between batches. Evaluations still take place at their exact iteration.
 
         """
         if n_iter == -1:
@@ -68,10 +74,10 @@ class Experiment(Observer):
         self._running.set()
 
         if bg:
-            self._t = threading.Thread(target=lambda: self._run(n_iter))
+            self._t = threading.Thread(target=lambda: self._run(n_iter, batch_size))
             self._t.start()
         else:
-            self._run(n_iter)
+            self._run(n_iter, batch_size)
 
     def wait(self):
         """ Wait for the end of the run of the experiment. """
@@ -83,15 +89,36 @@ class Experiment(Observer):
 
     def fast_forward(self, log):
         self.log = copy(log)
+        ms_chosen, ms_reached = [], []
         for x, y, s in zip(*[log.logs[topic] for topic in ['choice', 'inference', 'perception']]):
             m, s_ag = self.ag.extract_ms(x, y)
             self.ag.sensorimotor_model.update(m, s)
-            self.ag.interest_model.update(hstack((m, s_ag)), hstack((m, s)))
+            ms_chosen.append(hstack((m, s_ag)))
+            ms_reached.append(hstack((m, s)))
+        # The interest model is updated at once with the whole log
+        if ms_chosen:
+            self.ag.interest_model.update_batch(np.array(ms_chosen), np.array(ms_reached))
 
-    def _run(self, n_iter):
+    def _run(self, n_iter, batch_size=1):
 
         self._init()
-        for _ in range(n_iter):
+
+        # Bootstrap stage, by batches between evaluations (see Agent.bootstrap)
+        n_bootstrap = min(self.ag.n_bootstrap, n_iter) if self.context_mode is None else 0
+        while n_iter > 0 and n_bootstrap > 0 and self._running.is_set():
+            n = self._steps_before_eval(n_bootstrap)
+            self._bootstrap_step(n)
+            n_bootstrap -= n
+            n_iter -= n
+
+        if batch_size > 1 and self.context_mode is None:
+            while n_iter > 0 and self._running.is_set():
+                n = self._steps_before_eval(min(batch_size, n_iter))
+                self._batch_step(n)
+                n_iter -= n
+            n_iter = 0
+
+        for _ in range(n_iter if self._running.is_set() else 0):
             self._step()
             if not self._running.is_set():
                 break
@@ -100,12 +127,69 @@ class Experiment(Observer):
 
     def _init(self, current_step=0):
         self.current_step = current_step
+        # Evaluation steps, as a set for membership tests and sorted for the next evaluation
+        self._eval_steps = set(self.eval_at)
+        self._sorted_eval_steps = sorted(self._eval_steps)
+
+    def _is_eval_step(self):
+        return self.current_step in self._eval_steps and self.evaluation is not None
+
+    def _steps_before_eval(self, n_max):
+        """ Number of iterations (at most n_max) that can be run at once from the current step: an evaluation can only take place at the first of them. """
+        i = bisect.bisect_right(self._sorted_eval_steps, self.current_step + 1)
+        if i < len(self._sorted_eval_steps):
+            n_max = min(n_max, self._sorted_eval_steps[i] - self.current_step - 1)
+        return n_max
+
+    def _batch_step(self, n):
+        """ Run n iterations at once with the batch paths of the agent and environment. """
+        self.current_step += 1
+
+        if self._is_eval_step():
+            self.log.eval_errors.append(self.evaluation.evaluate())
+
+        # Clear messages received from the evaluation
+        self.notifications.queue.clear()
+
+        try:
+            M = self.ag.produce_batch(n)
+            S = self.env.update_batch(M)
+            self.ag.perceive_batch(S)
+        except ExplautoEnvironmentUpdateError:
+            logger.warning('Environment update error at time %d with '
+                           'a batch of %d motor commands. '
+                           'These iterations wont be used to update agent models',
+                           self.current_step, n)
+
+        self.current_step += n - 1
+        self._update_logs()
+
+    def _bootstrap_step(self, n):
+        """ Run n bootstrap iterations at once (see Agent.bootstrap). """
+        self.current_step += 1
+
+        if self._is_eval_step():
+            self.log.eval_errors.append(self.evaluation.evaluate())
+
+        # Clear messages received from the evaluation
+        self.notifications.queue.clear()
+
+        try:
+            self.ag.bootstrap(self.env, n)
+        except ExplautoEnvironmentUpdateError:
+            logger.warning('Environment update error at time %d with '
+                           'a bootstrap batch of %d motor commands. '
+                           'These iterations wont be used to update agent models',
+                           self.current_step, n)
+
+        self.current_step += n - 1
+        self._update_logs()
 
     def _step(self):
 
         self.current_step += 1
 
-        if self.current_step in self.eval_at and self.evaluation is not None:
+        if self._is_eval_step():
             self.log.eval_errors.append(self.evaluation.evaluate())
 
         # Clear messages received from the evaluation
@@ -144,7 +228,10 @@ class Experiment(Observer):
     def _update_logs(self):
         while not self.notifications.empty():
             topic, msg = self.notifications.get()
-            self.log.add(topic, msg)
+            if topic.endswith('_batch'):
+                self.log.add_batch(topic[:-len('_batch')], msg)
+            else:
+                self.log.add(topic, msg)
 
     def evaluate_at(self, eval_at, testcases, mode=None):
         """ Sets the evaluation interation indices.
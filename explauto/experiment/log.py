@@ -22,6 +22,10 @@ class ExperimentLog(object):
         self._logs[topic].append(message)
         self.counts[topic] += 1
 
+    def add_batch(self, topic, messages):
+        self._logs[topic].extend(messages)
+        self.counts[topic] += len(messages)
+
     def purge(self):
         self._logs = defaultdict(list)
         self.n_purge += 1
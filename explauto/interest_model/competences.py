@@ -2,7 +2,10 @@ import numpy as np
 
 
 def competence_dist(target, reached, dist_min=0., dist_max=1.):
-    return max(- dist_max, min(- dist_min, - np.linalg.norm(target - reached)))
+    """ Competence as the opposite of the distance between target and reached, bounded in [-dist_max, -dist_min].
+    Vectorized over the rows of target and reached (arrays of shape (n, ndims)). """
+    dist = np.linalg.norm(np.asarray(target) - np.asarray(reached), axis=-1)
+    return np.maximum(- dist_max, np.minimum(- dist_min, - dist))
 
 
 def competence_exp(target, reached, dist_min=0., dist_max=1., power=1.):
@@ -10,4 +13,4 @@ def competence_exp(target, reached, dist_min=0., dist_max=1., power=1.):
 
 
 def competence_bool(target, reached):
-    return float((target == reached).all())
+    return np.all(np.atleast_1d(np.asarray(target) == np.asarray(reached)), axis=-1).astype(float)
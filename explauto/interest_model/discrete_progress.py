@@ -1,16 +1,22 @@
 import numpy
 
-from copy import deepcopy
-from collections import deque
-
 from ..utils.config import Space
 from .competences import competence_exp, competence_dist
-from ..utils import discrete_random_draw
+from ..utils.sampling import AliasSampler, categorical_draw
 from .interest_model import InterestModel
 
 
+def occurrence_ranks(indices):
+    """ Rank of each index among the occurrences of the same value (0 for its first occurrence, 1 for the second...). """
+    order = numpy.argsort(indices, kind='mergesort')
+    sorted_indices = indices[order]
+    ranks = numpy.empty(len(indices), dtype=int)
+    ranks[order] = numpy.arange(len(indices)) - numpy.searchsorted(sorted_indices, sorted_indices)
+    return ranks
+
+
 class DiscretizedProgress(InterestModel):
-    def __init__(self, conf, expl_dims, x_card, win_size, eps_random, measure):
+    def __init__(self, conf, expl_dims, x_card, win_size, eps_random, measure, sparse=False):
         InterestModel.__init__(self, expl_dims)
         self.conf = conf
         self.measure = measure
@@ -24,14 +30,18 @@ class DiscretizedProgress(InterestModel):
 
         self.comp_max = measure(numpy.array([0.]), numpy.array([0.]), dist_min=self.dist_min)
         self.comp_min = measure(numpy.array([0.]), numpy.array([numpy.linalg.norm(conf.s_mins - conf.s_maxs)]), dist_max=self.dist_max)
-        self.discrete_progress = DiscreteProgress(0, self.space.card, win_size, eps_random, measure)
+        # Only the visited cells are stored with sparse=True, for large grids (high-dimensional goal spaces)
+        discrete_progress_cls = SparseDiscreteProgress if sparse else DiscreteProgress
+        self.discrete_progress = discrete_progress_cls(0, self.space.card, win_size, eps_random, measure)
 
     def normalize_measure(self, measure):
         return (measure - self.comp_min)/(self.comp_max - self.comp_min)
 
-    def sample(self):
-        index = self.discrete_progress.sample()[0]
-        return self.space.rand_value(index).flatten()
+    def sample(self, n=None):
+        if n is None:
+            index = self.discrete_progress.sample()[0]
+            return self.space.rand_value(index).flatten()
+        return self.space.rand_value(self.discrete_progress.sample(n))
     
     def sample_given_context(self, c, c_dims):
         '''
@@ -55,11 +65,35 @@ class DiscretizedProgress(InterestModel):
             self.discrete_progress.update_from_index_and_competence(x_index, self.normalize_measure(comp))
             
         # Novelty bonus: if novel cell is reached, give it competence (= interest for win_size iterations)
-        if sum([qi for qi in self.discrete_progress.queues[ms_index]]) == 0.:
+        if self.discrete_progress.is_novel(ms_index):
             self.discrete_progress.update_from_index_and_competence(ms_index, self.normalize_measure(self.comp_max)) 
 
+    def update_batch(self, XY, MS):
+        XY, MS = numpy.asarray(XY), numpy.asarray(MS)
+        comps = self.normalize_measure(self.measure(XY, MS, dist_min=self.dist_min, dist_max=self.dist_max))
+        x_indices = self.space.index(XY[:, self.expl_dims])
+        ms_indices = self.space.index(MS[:, self.expl_dims])
+        rows = self.discrete_progress.rows(ms_indices)
+        novelty = self.normalize_measure(self.comp_max)
+
+        # A sample only changes the window of its reached cell: the samples reaching the same cell
+        # are applied in order, one per round, the cells of a round being updated at once
+        ranks = occurrence_ranks(ms_indices)
+        for rank in range(ranks.max() + 1 if len(ranks) else 0):
+            current = numpy.nonzero(ranks == rank)[0]
+            same = current[x_indices[current] == ms_indices[current]]
+            self.discrete_progress.push(rows[same], comps[same])
+            novel = current[self.discrete_progress.n_nonzero[rows[current]] == 0]
+            self.discrete_progress.push(rows[novel], numpy.full(len(novel), novelty))
+
 
 class DiscreteProgress(InterestModel):
+    """ Progress of x_card discrete cells, each one keeping its last win_size competences.
+
+    The competence windows are stored in a single (x_card, win_size) ring buffer with a head pointer per cell (pointing to its oldest competence), along with the running sums of each window and of its first (oldest) half. The progress of a cell, mean of the first half of its window minus mean of the second half, is thus updated in constant time, and is available for all cells as a vector.
+
+    As the progress changes after every update, single cells are drawn from the cumulative sum of the progress, and an alias table (sampler) is only built for batches of draws, once per batch.
+    """
     def __init__(self, expl_dims, x_card, win_size, eps_random, measure, measure_init=0.):
         InterestModel.__init__(self, expl_dims)
 
@@ -67,67 +101,234 @@ class DiscreteProgress(InterestModel):
         self.win_size = win_size
         self.eps_random = eps_random
 
-        queue = deque([measure_init for _ in range(win_size)], maxlen=win_size)
-        self.queues = [deepcopy(queue) for _ in range(x_card)]
+        self.queues = numpy.full((x_card, win_size), float(measure_init))
+        self.heads = numpy.zeros(x_card, dtype=int)
+        self.sums = self.queues.sum(axis=1)
+        self.half_sums = self.queues[:, :win_size // 2].sum(axis=1)
+        self.n_nonzero = numpy.count_nonzero(self.queues, axis=1)
         self.current_progress = numpy.zeros((x_card,))
+        self.sampler = AliasSampler()
+
+    def window(self, index):
+        """ Competences in the window of a cell, from the oldest to the newest. """
+        return numpy.roll(self.queues[index], - self.heads[index])
+
+    def is_novel(self, index):
+        """ Whether the window of a cell only holds zero competences. """
+        return self.n_nonzero[index] == 0
 
     def progress(self):
         return numpy.array(self.current_progress)
 
-    def sample(self):
-        if numpy.random.random() < self.eps_random:
-            # pick random cell
-            return [numpy.random.randint(len(self.queues))]
-        else:
-            # pick with probability proportional to absolute progress
-            self.w = abs(self.progress())
-            if numpy.sum(self.w) > 0:
-                self.w = self.w / numpy.sum(self.w)
-            return discrete_random_draw(self.w)
+    def sample(self, n=None):
+        """ Draw a cell (in a list), or an array of n cells if n is given. """
+        if n is None:
+            if numpy.random.random() < self.eps_random:
+                # pick random cell
+                return [numpy.random.randint(len(self.current_progress))]
+            else:
+                # pick with probability proportional to absolute progress
+                self.w = abs(self.progress())
+                if numpy.sum(self.w) > 0:
+                    self.w = self.w / numpy.sum(self.w)
+                return [categorical_draw(self.w)]
+
+        indices = numpy.zeros(n, dtype=int)
+        rand = numpy.random.random(n) < self.eps_random
+        indices[rand] = numpy.random.randint(len(self.current_progress), size=numpy.sum(rand))
+        self.w = abs(self.progress())
+        if numpy.sum(self.w) > 0:
+            self.w = self.w / numpy.sum(self.w)
+        self.sampler.set_weights(self.w)
+        indices[~rand] = self.sampler.sample(n - numpy.sum(rand))
+        return indices
     
     def sample_given_context(self, c, c_dims, space):
-        free_dims = list(set(range(len(space.cardinalities))) - set(c_dims))
-        free_cardinalities = tuple(numpy.array(list(space.cardinalities))[free_dims])
-        progress_array = numpy.zeros(free_cardinalities)
-        
+        free_dims = [d for d in range(len(space.cardinalities)) if d not in c_dims]
+
         # Get index of context on context dimensions as multi_context
         value = numpy.zeros(len(space.cardinalities))
         value[c_dims] = c
-        multi_context = tuple(space.discretize(value, c_dims)) 
-        
-        for i in range(len(self.queues)):
-            multi_old = space.index2multi(i)
-            # if that region is included in the context 
-            if tuple(numpy.array(list(multi_old))[c_dims]) == multi_context:
-                # Get the indices of the free dimensions of that region                           
-                multi_new = tuple(numpy.array(list(multi_old))[free_dims])
-                # Get progress in that region
-                p = self.current_progress[i]
-                progress_array[multi_new] = p
-        # Choose the region with max progress
+        multi_context = space.discretize(value, c_dims)
+
+        # Progress of the regions included in the context: slice of the progress grid at multi_context
+        grid_slice = [slice(None)] * len(space.cardinalities)
+        for d, i in zip(c_dims, multi_context):
+            grid_slice[d] = i
+        progress_array = self.current_progress.reshape(tuple(space.cardinalities))[tuple(grid_slice)]
+
+        # Choose a region with probability proportional to absolute progress (uniformly if no progress)
         self.w = abs(progress_array)
         if numpy.sum(self.w) > 0:
             self.w = self.w / numpy.sum(self.w)
-        index_new = discrete_random_draw(self.w.flatten())
+        index_new = categorical_draw(self.w)
+
         # Convert the index of the region from the free dims to all dims
-        multi_new = numpy.unravel_index(index_new, free_cardinalities)
         multi_old = numpy.zeros(len(space.cardinalities), dtype=numpy.int64)
         multi_old[c_dims] = multi_context
-        multi_old[free_dims] = [d[0] for d in multi_new]
+        multi_old[free_dims] = numpy.unravel_index(index_new, progress_array.shape)
         index = space.multi2index(tuple(multi_old))
         return index
-        
+
     def update(self, xy, ms):
         raise NotImplementedError
     
     def update_from_index_and_competence(self, index, competence):
-        self.queues[index].append(competence)
-        self.current_progress[index] = numpy.mean([self.queues[index][i] for i in range(0, self.win_size // 2)]) - numpy.mean([self.queues[index][i] for i in range(self.win_size // 2, self.win_size)])
-                            
+        self.update_from_indices_and_competences([index], [competence])
+
+    def update_from_indices_and_competences(self, indices, competences):
+        """ Push a batch of competences in the windows of the given cells (in order, a cell may appear several times). """
+        indices = self.rows(numpy.ravel(numpy.asarray(indices, dtype=int)))
+        competences = numpy.ravel(numpy.asarray(competences, dtype=float))
+        # Cells are updated once per round, with their competences in order
+        ranks = occurrence_ranks(indices)
+        for rank in range(ranks.max() + 1 if len(ranks) else 0):
+            current = ranks == rank
+            self.push(indices[current], competences[current])
+
+    def rows(self, indices):
+        """ Rows of the windows of the given cells (the cells themselves). """
+        return indices
+
+    def push(self, indices, competences):
+        """ Push competences in distinct rows of the windows, replacing their oldest ones. """
+        w, half = self.win_size, self.win_size // 2
+        heads = self.heads[indices]
+        oldest = self.queues[indices, heads]
+        self.half_sums[indices] += self.queues[indices, (heads + half) % w] - oldest
+        self.sums[indices] += competences - oldest
+        self.n_nonzero[indices] += (competences != 0).astype(int) - (oldest != 0)
+        self.queues[indices, heads] = competences
+        self.heads[indices] = (heads + 1) % w
+
+        # Resynchronize the running sums once per window to avoid drift
+        resync = indices[self.heads[indices] == 0]
+        if len(resync):
+            self.sums[resync] = self.queues[resync].sum(axis=1)
+            self.half_sums[resync] = self.queues[resync, :half].sum(axis=1)
+
+        self.current_progress[indices] = (self.half_sums[indices] / half -
+                                          (self.sums[indices] - self.half_sums[indices]) / (w - half))
+
+
+class SparseDiscreteProgress(DiscreteProgress):
+    """ DiscreteProgress storing only the windows of visited cells.
+
+    A row of the window arrays is allocated to a cell (in a dict from cell index to row) the first time it is updated, the arrays doubling their capacity when full. Unvisited cells have a window full of measure_init, hence a zero progress: they are only drawn by uniform draws over the whole grid (or a context slice of it), which need not enumerate them.
+    """
+    def __init__(self, expl_dims, x_card, win_size, eps_random, measure, measure_init=0.):
+        InterestModel.__init__(self, expl_dims)
+
+        self.measure = measure
+        self.win_size = win_size
+        self.eps_random = eps_random
+        self.x_card = x_card
+        self.measure_init = float(measure_init)
+
+        capacity = 16
+        self.slots = {}
+        self.n_slots = 0
+        self.cells = numpy.zeros(capacity, dtype=int)
+        self.queues = numpy.full((capacity, win_size), self.measure_init)
+        self.heads = numpy.zeros(capacity, dtype=int)
+        self.sums = self.queues.sum(axis=1)
+        self.half_sums = self.queues[:, :win_size // 2].sum(axis=1)
+        self.n_nonzero = numpy.count_nonzero(self.queues, axis=1)
+        self.current_progress = numpy.zeros((capacity,))
+        self.sampler = AliasSampler()
+
+    def rows(self, indices):
+        """ Rows of the windows of the given cells, allocating the rows of unvisited cells. """
+        rows = numpy.zeros(len(indices), dtype=int)
+        for i, index in enumerate(indices):
+            if index not in self.slots:
+                if self.n_slots == len(self.cells):
+                    for name in ['cells', 'queues', 'heads', 'sums', 'half_sums', 'n_nonzero', 'current_progress']:
+                        a = getattr(self, name)
+                        setattr(self, name, numpy.concatenate((a, a)))
+                    # New rows are those of unvisited cells
+                    self.queues[self.n_slots:] = self.measure_init
+                    self.heads[self.n_slots:] = 0
+                    self.sums[self.n_slots:] = self.win_size * self.measure_init
+                    self.half_sums[self.n_slots:] = self.win_size // 2 * self.measure_init
+                    self.n_nonzero[self.n_slots:] = self.win_size if self.measure_init != 0 else 0
+                    self.current_progress[self.n_slots:] = 0.
+                self.slots[index] = self.n_slots
+                self.cells[self.n_slots] = index
+                self.n_slots += 1
+            rows[i] = self.slots[index]
+        return rows
+
+    def window(self, index):
+        if index not in self.slots:
+            return numpy.full(self.win_size, self.measure_init)
+        return DiscreteProgress.window(self, self.slots[index])
+
+    def is_novel(self, index):
+        if index not in self.slots:
+            return self.measure_init == 0
+        return DiscreteProgress.is_novel(self, self.slots[index])
+
+    def progress(self):
+        progress = numpy.zeros((self.x_card,))
+        progress[self.cells[:self.n_slots]] = self.current_progress[:self.n_slots]
+        return progress
+
+    def sample(self, n=None):
+        self.w = abs(self.current_progress[:self.n_slots])
+        if n is None:
+            if numpy.random.random() < self.eps_random or not numpy.sum(self.w) > 0:
+                # pick random cell
+                return [numpy.random.randint(self.x_card)]
+            else:
+                # pick with probability proportional to absolute progress (among visited cells)
+                self.w = self.w / numpy.sum(self.w)
+                return [self.cells[categorical_draw(self.w)]]
+
+        rand = numpy.random.random(n) < self.eps_random
+        if not numpy.sum(self.w) > 0:
+            rand[:] = True
+        indices = numpy.zeros(n, dtype=int)
+        indices[rand] = numpy.random.randint(self.x_card, size=numpy.sum(rand))
+        if not rand.all():
+            self.w = self.w / numpy.sum(self.w)
+            self.sampler.set_weights(self.w)
+            indices[~rand] = self.cells[self.sampler.sample(n - numpy.sum(rand))]
+        return indices
+
+    def sample_given_context(self, c, c_dims, space):
+        free_dims = [d for d in range(len(space.cardinalities)) if d not in c_dims]
+
+        # Get index of context on context dimensions as multi_context
+        value = numpy.zeros(len(space.cardinalities))
+        value[c_dims] = c
+        multi_context = space.discretize(value, c_dims)
+
+        # Visited regions included in the context
+        multi = numpy.array(space.index2multi(self.cells[:self.n_slots])).reshape(len(space.cardinalities), -1)
+        in_context = numpy.all(multi[c_dims] == numpy.reshape(multi_context, (-1, 1)), axis=0)
+        self.w = abs(self.current_progress[:self.n_slots][in_context])
+
+        if numpy.sum(self.w) > 0:
+            # Choose a region with probability proportional to absolute progress
+            self.w = self.w / numpy.sum(self.w)
+            return self.cells[:self.n_slots][in_context][categorical_draw(self.w)]
+
+        # Choose a region of the context uniformly
+        multi_old = numpy.zeros(len(space.cardinalities), dtype=numpy.int64)
+        multi_old[c_dims] = multi_context
+        multi_old[free_dims] = [numpy.random.randint(space.cardinalities[d]) for d in free_dims]
+        return space.multi2index(tuple(multi_old))
 
 
 interest_models = {'discretized_progress': (DiscretizedProgress,
                                             {'default': {'x_card': 400,
                                                          'win_size': 10,
                                                          'eps_random': 0.3,
-                                                         'measure': competence_dist}})}
+                                                         'measure': competence_dist,
+                                                         'sparse': False},
+                                             'high_dimensional': {'x_card': 10 ** 6,
+                                                                  'win_size': 10,
+                                                                  'eps_random': 0.3,
+                                                                  'measure': competence_dist,
+                                                                  'sparse': True}})}
@@ -1,7 +1,5 @@
 import numpy
 
-from sklearn.preprocessing import StandardScaler
-
 from ..utils import rand_bounds
 from ..models.gmminf import GMM
 from .competences import competence_exp
@@ -9,12 +7,21 @@ from .interest_model import InterestModel
 
 
 class GmmInterest(InterestModel):
-    def __init__(self, conf, expl_dims, measure, n_samples=40, n_components=6):
+    """ Interest model based on a GMM fitted on (time, goal, competence) samples of a sliding window.
+
+    The GMM is refitted every n_samples / 4 updates with n_em_iter EM iterations warm-started from the previous parameters (only the first fit is performed from scratch), covariances being shrunk towards the covariance of the window with a weight of prior_weight samples. The data are standardized with statistics maintained incrementally over the window, and goals are drawn from the interest GMM in batches of n_samples / 4.
+
+    covariance_type can be 'full', or 'lowrank' (with the given rank) for high-dimensional goal spaces. With 'diag', the time-competence covariance used to weight the components is always zero, so that all components are equally interesting.
+    """
+    def __init__(self, conf, expl_dims, measure, n_samples=40, n_components=6, n_em_iter=3, prior_weight=1.,
+                 covariance_type='full', rank=1):
         InterestModel.__init__(self, expl_dims)
 
         self.measure = measure
         self.bounds = conf.bounds[:, expl_dims]
         self.n_components = n_components
+        self.n_em_iter = n_em_iter
+        self.prior_weight = prior_weight
         self.scale_t = 1  # 1. / n_samples
         self.t = - self.scale_t * n_samples
         self.scale_x = conf.bounds[1, expl_dims] - conf.bounds[0, expl_dims]
@@ -23,23 +30,50 @@ class GmmInterest(InterestModel):
 
         self.data = numpy.zeros((n_samples, len(expl_dims) + 2))
         self.n_samples = n_samples
-        self.scaler = StandardScaler()
-
-        for _ in range(n_samples):
-            self.update(rand_bounds(conf.bounds), rand_bounds(conf.bounds))
-
-    def sample(self):
-        x = self.gmm_choice.sample()
-        x = self.scaler.inverse_transform(numpy.hstack(([0.], x.flatten(), [0.])))[1:-1]
+        self.batch_size = max(1, n_samples // 4)
+
+        # Running sums over the window, used to standardize the data
+        self.data_sum = numpy.zeros(self.data.shape[1])
+        self.data_sq_sum = numpy.zeros(self.data.shape[1])
+        self.mean = numpy.zeros(self.data.shape[1])
+        self.std = numpy.ones(self.data.shape[1])
+
+        self.gmm = GMM(n_components=self.n_components, covariance_type=covariance_type, rank=rank)
+        self.goals = numpy.zeros((0, len(expl_dims)))
+
+        self.update_batch(rand_bounds(conf.bounds, n_samples), rand_bounds(conf.bounds, n_samples))
+
+    def sample(self, n=None):
+        if n is None:
+            if not len(self.goals):
+                self.goals = self.sample_goals(self.batch_size)
+            x, self.goals = self.goals[0], self.goals[1:]
+            return x
+        # Goals left from the current batch first, then new goals drawn at once
+        x, self.goals = self.goals[:n], self.goals[n:]
+        if len(x) < n:
+            x = numpy.vstack((x, self.sample_goals(n - len(x))))
+        return x
+
+    def sample_goals(self, n):
+        """ Draw n goals from the interest GMM, shape (n, len(expl_dims)). """
+        x = self.gmm_choice.conditioner([], list(range(len(self.expl_dims)))).sample(numpy.zeros((n, 0)))
+        x = x * self.std[1:-1] + self.mean[1:-1]
         x = numpy.maximum(x, self.bounds[0, :])
         x = numpy.minimum(x, self.bounds[1, :])
-        return x.T
+        return x
 
     def update(self, xy, ms):
         measure = self.measure(xy, ms)
-        self.data[self.t % self.n_samples, 0] = self.t
-        self.data[self.t % self.n_samples, -1] = measure
-        self.data[self.t % self.n_samples, 1:-1] = xy.flatten()[self.expl_dims]
+        i = self.t % self.n_samples
+        row = numpy.hstack(([self.t], xy.flatten()[self.expl_dims], [measure]))
+        self.data_sum += row - self.data[i, :]
+        self.data_sq_sum += row ** 2 - self.data[i, :] ** 2
+        self.data[i, :] = row
+        if i == self.n_samples - 1:
+            # Resynchronize the running sums once per window to avoid drift
+            self.data_sum = self.data.sum(axis=0)
+            self.data_sq_sum = (self.data ** 2).sum(axis=0)
 
         self.t += self.scale_t
         if abs(self.t % (self.n_samples * self.scale_t / 4.)) < self.scale_t:
@@ -47,16 +81,58 @@ class GmmInterest(InterestModel):
 
         return self.t, xy.flatten()[self.expl_dims], measure
 
+    def update_batch(self, XY, MS):
+        """ Same as calling update on each sample, the rows being written by blocks in the window (up to its end or to the next GMM update). """
+        XY, MS = numpy.asarray(XY), numpy.asarray(MS)
+        measures = numpy.ravel(self.measure(XY, MS))
+        rows = numpy.column_stack((self.t + self.scale_t * numpy.arange(len(XY)), XY[:, self.expl_dims], measures))
+        gmm_updates = abs((rows[:, 0] + self.scale_t) % (self.n_samples * self.scale_t / 4.)) < self.scale_t
+
+        start = 0
+        while start < len(rows):
+            i = int(self.t % self.n_samples)
+            end = min(len(rows), start + self.n_samples - i)
+            update_gmm = numpy.nonzero(gmm_updates[start:end])[0]
+            if len(update_gmm):
+                end = start + update_gmm[0] + 1
+            block = rows[start:end]
+            j = i + len(block)
+            self.data_sum += block.sum(axis=0) - self.data[i:j, :].sum(axis=0)
+            self.data_sq_sum += (block ** 2).sum(axis=0) - (self.data[i:j, :] ** 2).sum(axis=0)
+            self.data[i:j, :] = block
+            if j == self.n_samples:
+                # Resynchronize the running sums once per window to avoid drift
+                self.data_sum = self.data.sum(axis=0)
+                self.data_sq_sum = (self.data ** 2).sum(axis=0)
+
+            self.t += self.scale_t * len(block)
+            if len(update_gmm):
+                self.update_gmm()
+            start = end
+
+        return rows[:, 0] + self.scale_t, rows[:, 1:-1], measures
+
+    def update_scaling(self):
+        """ Update the standardization statistics from the running sums and express the current GMM parameters in the new scale. """
+        old_mean, old_std = self.mean, self.std
+        self.mean = self.data_sum / self.n_samples
+        var = numpy.maximum(self.data_sq_sum / self.n_samples - self.mean ** 2, 0.)
+        self.std = numpy.sqrt(var)
+        self.std[self.std == 0.] = 1.
+
+        if hasattr(self.gmm, 'means_'):
+            self.gmm.scale(old_std / self.std, (old_mean - self.mean) / self.std)
+
     def update_gmm(self):
-        scaled_data = self.scaler.fit_transform(self.data)
+        self.update_scaling()
+        scaled_data = (self.data - self.mean) / self.std
 
-        self.gmm = GMM(n_components=self.n_components, covariance_type='full')
-        self.gmm.fit(numpy.array(scaled_data))
+        self.gmm.partial_fit(scaled_data, self.n_em_iter, self.prior_weight)
         self.gmm_choice = self.gmm_interest()
+        self.goals = numpy.zeros((0, len(self.expl_dims)))
 
     def gmm_interest(self):
-        cov_t_c = numpy.array([self.gmm.covariances_[k, 0, -1]
-                               for k in range(self.gmm.n_components)])
+        cov_t_c = self.gmm.covariance_between(0, -1)
         cov_t_c = numpy.exp(cov_t_c)
         # cov_t_c[cov_t_c <= 1e-100] = 1e-100
 
@@ -69,4 +145,15 @@ class GmmInterest(InterestModel):
 interest_models = {'gmm_progress_beta': (GmmInterest,
                                          {'default': {'measure': competence_exp,
                                                       'n_samples': 40,
-                                                      'n_components': 6}})}
+                                                      'n_components': 6,
+                                                      'n_em_iter': 3,
+                                                      'prior_weight': 1.,
+                                                      'covariance_type': 'full',
+                                                      'rank': 1},
+                                          'high_dimensional': {'measure': competence_exp,
+                                                               'n_samples': 40,
+                                                               'n_components': 6,
+                                                               'n_em_iter': 3,
+                                                               'prior_weight': 1.,
+                                                               'covariance_type': 'lowrank',
+                                                               'rank': 2}})}
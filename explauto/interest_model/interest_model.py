@@ -12,9 +12,17 @@ class InterestModel(object, metaclass=ABCMeta):
         return im_cls(conf, expl_dims, **im_configs[config_name])
 
     @abstractmethod
-    def sample(self):
+    def sample(self, n=None):
+        """ Sample a goal in the exploration space (array of shape (len(expl_dims),)),
+        or n goals at once (array of shape (n, len(expl_dims))) if n is given. """
         pass
 
     @abstractmethod
     def update(self, xy, ms):
         pass
+
+    def update_batch(self, XY, MS):
+        """ Update the model with a batch of samples (rows of XY and MS), in order.
+        Models override it with a vectorized update, the default one calling update on each sample. """
+        for xy, ms in zip(XY, MS):
+            self.update(xy, ms)
@@ -1,4 +1,4 @@
-from numpy import array
+from numpy import array, tile
 
 from .interest_model import InterestModel
 from ..io.mouse_pointer import MousePointer as MP
@@ -9,10 +9,15 @@ class MousePointer(InterestModel):
         InterestModel.__init__(self, expl_dims)
         self.pointer = MP(width, height)
 
-    def sample(self):
-        return array(self.pointer.xy)
+    def sample(self, n=None):
+        if n is None:
+            return array(self.pointer.xy)
+        return tile(self.pointer.xy, (n, 1))
 
-    def update(xy, ms):
+    def update(self, xy, ms):
+        pass
+
+    def update_batch(self, XY, MS):
         pass
 
 interest_models = {'mouse_pointer_beta': (MousePointer,
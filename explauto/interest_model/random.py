@@ -1,5 +1,7 @@
 import numpy as np
 
+from scipy.spatial import cKDTree
+
 from ..utils import rand_bounds
 from .interest_model import InterestModel
 from .competences import competence_exp, competence_dist
@@ -13,12 +15,17 @@ class RandomInterest(InterestModel):
         self.bounds = conf.bounds[:, expl_dims]
         self.ndims = self.bounds.shape[1]
 
-    def sample(self):
-        return rand_bounds(self.bounds).flatten()
+    def sample(self, n=None):
+        if n is None:
+            return rand_bounds(self.bounds).flatten()
+        return rand_bounds(self.bounds, n)
 
     def update(self, xy, ms):
         pass
 
+    def update_batch(self, XY, MS):
+        pass
+
     def sample_given_context(self, c, c_dims):
         '''
         Sample randomly on dimensions not in context
@@ -51,11 +58,37 @@ class MiscRandomInterest(RandomInterest):
         self.dist_max = np.linalg.norm(self.bounds[0,:] - self.bounds[1,:])
         self.data_xc = Dataset(len(expl_dims), 1)
         self.data_sr = Dataset(len(expl_dims), 0)
+        # Ring buffer of the last win_size competences, with the running sums of the window, of its squares
+        # and of its first (oldest) half, and the sum of all competences, so that window statistics cost O(1)
+        self.window_c = np.zeros(win_size)
+        self.window_sum = 0.
+        self.window_sq_sum = 0.
+        self.window_half_sum = 0.
+        self.c_sum = 0.
         self.current_progress = 0.
         self.current_interest = 0.
 
-
     def add_xc(self, x, c):
+        n = self.n_points()
+        i = n % self.win_size
+        if n < self.win_size:
+            # The first half of the window grows by one competence every two points
+            if n % 2 == 1:
+                self.window_half_sum += self.window_c[n // 2]
+            oldest = 0.
+        else:
+            # The oldest competence leaves the window, and the middle one moves to its first half
+            oldest = self.window_c[i]
+            self.window_half_sum += self.window_c[(i + self.win_size // 2) % self.win_size] - oldest
+        self.window_sum += c - oldest
+        self.window_sq_sum += c ** 2 - oldest ** 2
+        self.window_c[i] = c
+        if i == self.win_size - 1:
+            # Resynchronize the running sums once per window to avoid drift
+            self.window_sum = self.window_c.sum()
+            self.window_sq_sum = (self.window_c ** 2).sum()
+            self.window_half_sum = self.window_c[:self.win_size // 2].sum()
+        self.c_sum += c
         self.data_xc.add_xy(x, [c])
 
     def add_sr(self, x):
@@ -73,16 +106,49 @@ class MiscRandomInterest(RandomInterest):
         self.add_sr(ms[self.expl_dims])
         return interest
 
+    def update_batch(self, XY, MS, block_size=1000):
+        """ Same as calling update on each sample, the nearest previous goals being found by blocks of samples:
+        among the goals collected before the block with a kd-tree, and among the previous goals of the block by brute force. """
+        X = np.asarray(XY)[:, self.expl_dims]
+        S = np.asarray(MS)[:, self.expl_dims]
+        C = self.competence_measure(X, S, dist_max=self.dist_max)
+        interests = np.zeros(len(X))
+        for start in range(0, len(X), block_size):
+            x, s, c = X[start:start + block_size], S[start:start + block_size], C[start:start + block_size]
+            n_points = self.n_points()
+            dists, sr_NN = np.full(len(x), np.inf), np.zeros_like(s)
+            if n_points > 0:
+                dists, idxs = cKDTree(np.array(list(self.data_xc.iter_x()))).query(x)
+                sr_NN = np.array(list(self.data_sr.iter_x()))[idxs]
+            block_dists = np.linalg.norm(x[:, np.newaxis, :] - x[np.newaxis, :, :], axis=-1)
+            block_dists[np.triu_indices(len(x))] = np.inf
+            if len(x) > 1:
+                idxs = np.argmin(block_dists, axis=1)
+                closer = block_dists[np.arange(len(x)), idxs] < dists
+                sr_NN[closer] = s[idxs[closer]]
+            c_old = competence_dist(x, sr_NN, dist_max=self.dist_max)
+            interests[start:start + len(x)] = np.where(n_points + np.arange(len(x)) > 0, c - c_old, 0.)
+            for xi, ci, si in zip(x, c, s):
+                self.add_xc(xi, ci)
+                self.add_sr(si)
+
+        # Interest moving average, in closed form
+        decay = 1. - 1. / self.win_size
+        weights = decay ** np.arange(len(X) - 1, -1, -1) / self.win_size
+        self.current_progress = decay ** len(X) * self.current_progress + np.dot(weights, interests)
+        self.current_interest = abs(self.current_progress)
+        return interests
+
     def n_points(self):
         return len(self.data_xc)
 
     def competence_global(self, mode='sw'):
-        if self.n_points() > 0:
+        n_points = self.n_points()
+        if n_points > 0:
             if mode == 'all':
-                return np.mean(self.data_c)
+                return self.c_sum / n_points
             elif mode == 'sw':
-                idxs = list(range(self.n_points()))[- self.win_size:]
-                return np.mean([self.data_xc.get_y(idx) for idx in idxs])
+                return self.window_sum / min(n_points, self.win_size)
             else:
                 raise NotImplementedError
         else:
@@ -101,8 +167,7 @@ class MiscRandomInterest(RandomInterest):
     def interest_pt(self, x):
         if self.n_points() > self.k:
             _, idxs = self.data_xc.nn_x(x, k=self.k)
-            idxs = sorted(idxs)
-            v = [self.data_xc.get_y(idx) for idx in idxs]
+            v = [self.data_xc.get_y(idx) for idx in sorted(idxs)]
             n = len(v)
             comp_beg = np.mean(v[:int(float(n)/2.)])
             comp_end = np.mean(v[int(float(n)/2.):])
@@ -111,16 +176,25 @@ class MiscRandomInterest(RandomInterest):
             return self.interest_global()
 
     def interest_global(self): 
-        if self.n_points() < 2:
+        n_points = self.n_points()
+        if n_points < 2:
             return 0.
         else:
-            idxs = list(range(self.n_points()))[- self.win_size:]
-            v = [self.data_xc.get_y(idx) for idx in idxs]
-            n = len(v)
-            comp_beg = np.mean(v[:int(float(n)/2.)])
-            comp_end = np.mean(v[int(float(n)/2.):])
+            # Means of the first and last halves of the window, from the running sums
+            n = min(n_points, self.win_size)
+            half = n // 2
+            comp_beg = self.window_half_sum / half
+            comp_end = (self.window_sum - self.window_half_sum) / (n - half)
             return np.abs(comp_end - comp_beg)
 
+    def competence_std(self):
+        """ Standard deviation of the competences over the sliding window. """
+        n = min(self.n_points(), self.win_size)
+        if n > 0:
+            return np.sqrt(max(self.window_sq_sum / n - (self.window_sum / n) ** 2, 0.))
+        else:
+            return 0.
+
     def competence(self): return self.competence_global()
 
     def interest(self): return self.current_interest
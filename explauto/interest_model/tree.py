@@ -4,9 +4,6 @@ import time
 import numpy as np
 import matplotlib.pyplot as plt
 
-from heapq import heappop, heappush
-from scipy.spatial.kdtree import minkowski_distance_p
-
 from ..utils.utils import rand_bounds
 from ..utils.config import make_configuration
 from .interest_model import InterestModel
@@ -37,8 +34,10 @@ class InterestTree(InterestModel):
         if progress_win_size >= max_points_per_region:
             raise ValueError("WARNING: progress_win_size should be < max_points_per_region")
         
-        self.data_x = None
-        self.data_c = None
+        # Preallocated buffers, doubled when full (see add_data)
+        self.n_points = 0
+        self.data_x_buffer = np.zeros((16, len(expl_dims)))
+        self.data_c_buffer = np.zeros(16)
 
         self.tree = Tree(lambda:self.data_x, 
                          np.array(self.bounds, dtype=np.float), 
@@ -53,8 +52,28 @@ class InterestTree(InterestModel):
         
         InterestModel.__init__(self, expl_dims)
 
-    def sample(self):
-        return self.tree.sample()
+    @property
+    def data_x(self):
+        """ Points of the exploration space collected so far (a view of the filled part of the buffer), None if empty. """
+        return self.data_x_buffer[:self.n_points] if self.n_points else None
+
+    @property
+    def data_c(self):
+        """ Competences collected so far (a view of the filled part of the buffer), None if empty. """
+        return self.data_c_buffer[:self.n_points] if self.n_points else None
+
+    def add_data(self, x, c):
+        """ Append a point and its competence to the buffers, doubling their capacity when full, and return its index. """
+        if self.n_points == len(self.data_c_buffer):
+            self.data_x_buffer = np.concatenate((self.data_x_buffer, np.zeros_like(self.data_x_buffer)))
+            self.data_c_buffer = np.concatenate((self.data_c_buffer, np.zeros_like(self.data_c_buffer)))
+        self.data_x_buffer[self.n_points] = x
+        self.data_c_buffer[self.n_points] = c
+        self.n_points += 1
+        return self.n_points - 1
+
+    def sample(self, n=None):
+        return self.tree.sample(n=n)
     
     def progress(self):
         return self.tree.progress
@@ -63,28 +82,272 @@ class InterestTree(InterestModel):
         return self.tree.max_leaf_progress
     
     def update(self, xy, ms):
-        # print np.shape(self.data_x), np.shape(np.array([xy[self.expl_dims]]))
-        if self.data_x is None:
-            self.data_x = np.array([xy[self.expl_dims]])
-        else:
-            self.data_x = np.append(self.data_x, np.array([xy[self.expl_dims]]), axis=0)
-        if self.data_c is None:
-            self.data_c = np.array([self.competence_measure(xy, ms)]) # Either prediction error or competence error
-        else:
-            self.data_c = np.append(self.data_c, self.competence_measure(xy, ms)) 
-        self.tree.add(np.shape(self.data_x)[0] - 1)
+        # Either prediction error or competence error
+        idx = self.add_data(xy[self.expl_dims], self.competence_measure(xy, ms))
+        self.tree.add(idx)
+
+    def update_batch(self, XY, MS):
+        XY = np.asarray(XY)
+        self.bulk_update(XY[:, self.expl_dims], self.competence_measure(XY, np.asarray(MS)))
 
+    def bulk_update(self, X, C):
+        """ Add points X of the exploration space (shape (n, len(expl_dims))) and their competences C (shape (n,)) at once, building the tree top-down (see Tree.bulk_add). """
+        X = np.reshape(X, (-1, self.data_x_buffer.shape[1]))
+        C = np.ravel(C)
+        n_points = self.n_points + len(C)
+        if n_points > len(self.data_c_buffer):
+            capacity = len(self.data_c_buffer)
+            while capacity < n_points:
+                capacity *= 2
+            self.data_x_buffer = np.concatenate((self.data_x_buffer, np.zeros((capacity - len(self.data_x_buffer), X.shape[1]))))
+            self.data_c_buffer = np.concatenate((self.data_c_buffer, np.zeros(capacity - len(self.data_c_buffer))))
+        self.data_x_buffer[self.n_points:n_points] = X
+        self.data_c_buffer[self.n_points:n_points] = C
+        idxs = np.arange(self.n_points, n_points)
+        self.n_points = n_points
+        self.tree.bulk_add(idxs)
 
+    @classmethod
+    def from_data(cls, conf, expl_dims, X, C, **kwargs):
+        """ Interest tree built from points X of the exploration space and their competences C (e.g. from a log), see bulk_update. """
+        interest_model = cls(conf, expl_dims, **kwargs)
+        interest_model.bulk_update(X, C)
+        return interest_model
 
 
 
-class Tree(object):
+
+
+def minkowski_distance_p(d, p=2):
     """
-        Competence Progress Tree (recursive)
-        
+    Minkowski p-norms (to the power p, except for p=infinity) of the vectors in the last dimension of d.
+
+    """
+    d = np.abs(d)
+    if p == np.inf:
+        return np.amax(d, axis=-1)
+    elif p == 1:
+        return np.sum(d, axis=-1)
+    else:
+        return np.sum(d**p, axis=-1)
+
+
+
+class SumTree(object):
+    """
+        Sum-tree over an array of non-negative weights
+
+        Complete binary tree whose leaves are the weights and whose internal nodes are the sums of their children,
+        used to draw indices with probabilities proportional to their weights in O(log n).
+        The weights array grows (doubling its capacity) when an index beyond it is updated.
+
+        Parameters
+        ----------
+        weights : array_like
+            Initial weights
+        op : ufunc
+            Reduction of the children (np.add, or np.maximum to maintain the max of the weights)
+
+    """
+    def __init__(self, weights=(), op=np.add):
+        self.op = op
+        weights = np.asarray(weights, dtype=np.float64)
+        self.depth = 0
+        while 2 ** self.depth < len(weights):
+            self.depth += 1
+        self.capacity = 2 ** self.depth
+        self.nodes = np.zeros(2 * self.capacity)
+        self.nodes[self.capacity:self.capacity + len(weights)] = weights
+        for level in reversed(range(self.depth)):
+            lo, hi = 2 ** level, 2 ** (level + 1)
+            self.nodes[lo:hi] = self.op(self.nodes[2 * lo:2 * hi:2], self.nodes[2 * lo + 1:2 * hi:2])
+
+
+    def total(self):
+        """
+        Reduction of all the weights (their sum for a sum-tree).
+
+        """
+        return self.nodes[1]
+
+
+    def update(self, idxs, weights):
+        """
+        Set the weights of the given indices.
+
+        """
+        idxs = np.asarray(idxs, dtype=int)
+        if len(idxs) == 0:
+            return
+        if idxs.max() >= self.capacity:
+            capacity = self.capacity
+            while capacity <= idxs.max():
+                capacity *= 2
+            all_weights = np.zeros(capacity)
+            all_weights[:self.capacity] = self.nodes[self.capacity:]
+            self.__init__(all_weights, self.op)
+        nodes = idxs + self.capacity
+        self.nodes[nodes] = weights
+        for _ in range(self.depth):
+            # (the same parent may appear several times, being set to the same value)
+            nodes = nodes // 2
+            self.nodes[nodes] = self.op(self.nodes[2 * nodes], self.nodes[2 * nodes + 1])
+
+
+    def sample(self, n=1):
+        """
+        Draw n indices with probabilities proportional to their weights.
+
+        """
+        u = np.random.rand(n) * self.nodes[1]
+        nodes = np.ones(n, dtype=int)
+        for _ in range(self.depth):
+            left = self.nodes[2 * nodes]
+            right = u >= left
+            u = np.where(right, u - left, u)
+            nodes = 2 * nodes + right
+        return nodes - self.capacity
+
+
+
+class TreeNode(object):
+    """
+        View on a node of a Tree
+
+        Gives access to the region, points and progress of the node with id node in tree.
+
+    """
+    def __init__(self, tree, node):
+        self.tree = tree
+        self.node = node
+
+
+    @property
+    def leafnode(self):
+        return self.tree.lowers[self.node] < 0
+
+    @property
+    def lower(self):
+        return None if self.leafnode else TreeNode(self.tree, self.tree.lowers[self.node])
+
+    @property
+    def greater(self):
+        return None if self.leafnode else TreeNode(self.tree, self.tree.greaters[self.node])
+
+    @property
+    def split_dim(self):
+        return self.tree.split_dims[self.node]
+
+    @property
+    def split_value(self):
+        return None if self.leafnode else self.tree.split_values[self.node]
+
+    @property
+    def bounds_x(self):
+        return self.tree.bounds[self.node]
+
+    @property
+    def volume(self):
+        return self.tree.volumes[self.node]
+
+    @property
+    def children(self):
+        return self.tree.counts[self.node]
+
+    @property
+    def idxs(self):
+        return self.tree.node_idxs(self.node)
+
+    @property
+    def progress(self):
+        return self.tree.progresses[self.node]
+
+    @property
+    def max_leaf_progress(self):
+        return self.tree.max_leaf_progresses[self.node]
+
+
+    def get_nodes(self):
+        """
+        Get the list of all nodes.
+
+        """
+        return [TreeNode(self.tree, node) for node in self.tree.subtree(self.node)]
+
+
+    def get_leaves(self):
+        """
+        Get the list of all leaves.
+
+        """
+        return [TreeNode(self.tree, node) for node in self.tree.leaves(self.node)]
+
+
+    def depth(self):
+        """
+        Compute the depth of the tree (depth of a leaf=0).
+
+        """
+        return max(self.tree.levels[self.tree.leaves(self.node)]) - self.tree.levels[self.node]
+
+
+    def density(self):
+        """
+        Compute the density of the node.
+
+        """
+        return self.children / self.volume
+
+
+    def pt2leaf(self, x):
+        """
+        Get the leaf which domain contains x.
+
+        """
+        return TreeNode(self.tree, self.tree.pt2leaf_id(x, self.node))
+
+
+    def sample_bounds(self):
+        """
+        Sample a point in the region of this node.
+
+        """
+        return self.tree.sample_node(self.node)
+
+
+    def fold_up(self, f_inter, f_leaf):
+        """
+        Apply the function f_inter from leaves to root, begining with function f_leaf on leaves.
+
+        """
+        values = {}
+        for node in reversed(self.tree.subtree(self.node)):
+            if self.tree.lowers[node] < 0:
+                values[node] = f_leaf(TreeNode(self.tree, node))
+            else:
+                values[node] = f_inter(TreeNode(self.tree, node),
+                                       values.pop(self.tree.lowers[node]),
+                                       values.pop(self.tree.greaters[node]))
+        return values[self.node]
+
+
+
+class Tree(TreeNode):
+    """
+        Competence Progress Tree
+
         This class provides an index into a set of k-dimensional points which
         can be used to rapidly look up the nearest neighbors of any point.
-    
+
+        The nodes are stored in flat arrays indexed by node id (the root having id 0,
+        and the children ids of a leaf being -1). Point indices are only stored in the leaves,
+        those of an internal node being gathered from its leaves when needed.
+        The tree is also the view on its root node (see TreeNode).
+
+        Each node keeps the competences of its last progress_win_size points in a ring buffer,
+        with running sums from which its progress is computed in constant time.
+        Points are thus expected to be added in increasing index order (as done by InterestTree).
+
         Parameters
         ----------
         get_data_x : (N,K) array
@@ -98,66 +361,56 @@ class Tree(object):
         max_depth : int
             Maximum depth of the tree
         split_mode : string
-            Mode to split a region: 
-                'random': random value between first and last points, 
-                'median': median of the points in the region on the split dimension, 
-                'middle': middle of the region on the split dimension, 
-                'best_interest_diff': 
+            Mode to split a region:
+                'random': random value between first and last points,
+                'median': median of the points in the region on the split dimension,
+                'middle': middle of the region on the split dimension,
+                'best_interest_diff':
                     value that maximize the difference of progress in the 2 sub-regions
-                    (described in Baranes2012: Active Learning of Inverse Models 
+                    (described in Baranes2012: Active Learning of Inverse Models
                     with Intrinsically Motivated Goal Exploration in Robots)
         progress_win_size : int
             Number of last points taken into account for progress computation (should be < max_points_per_region)
         progress_measure : string
-            How to compute progress: 
+            How to compute progress:
                 'abs_deriv_cov': approach from explauto's discrete progress interest model
-                'abs_deriv': absolute difference between first and last points in the window, 
-                'abs_deriv_smooth', absolute difference between first and last half of the window 
-        sampling_mode : list 
-            How to sample a point in the tree: 
-                dict(multiscale=bool, 
-                    volume=bool, 
-                    mode=greedy'|'random'|'epsilon_greedy'|'softmax', 
-                    param=float)                    
+                'abs_deriv': absolute difference between first and last points in the window,
+                'abs_deriv_smooth', absolute difference between first and last half of the window
+        sampling_mode : list
+            How to sample a point in the tree:
+                dict(multiscale=bool,
+                    volume=bool,
+                    mode=greedy'|'random'|'epsilon_greedy'|'proportional'|'softmax',
+                    param=float)
                 multiscale: if we choose between all the nodes of the tree to sample a goal, leading to a multi-scale resolution
-                            (described in Baranes2012: Active Learning of Inverse Models 
+                            (described in Baranes2012: Active Learning of Inverse Models
                             with Intrinsically Motivated Goal Exploration in Robots)
                 volume: if we weight the progress of nodes with their volume to choose between them
                         (new approach)
-                mode: sampling mode
-                param: a parameter of the sampling mode: eps for eps_greedy, temperature for softmax.                                                 
-        idxs : list 
+                mode: sampling mode ('proportional': with probabilities proportional to progress)
+                param: a parameter of the sampling mode: eps for eps_greedy, temperature for softmax.
+        idxs : list
             List of indices to start with
         split_dim : int
-            Dimension on which the next split will take place
-        
-        Raises
-        ------
-        RuntimeError
-            The maximum recursion limit can be exceeded for large data
-            sets.  If this happens, either increase the value for the `max_points_per_region`
-            parameter or increase the recursion limit by::
-    
-                >>> import sys
-                >>> sys.setrecursionlimit(10000)
-    
+            Dimension on which the first split will take place
 
     """
-    def __init__(self, 
-                 get_data_x, 
-                 bounds_x, 
-                 get_data_c, 
-                 max_points_per_region, 
+    def __init__(self,
+                 get_data_x,
+                 bounds_x,
+                 get_data_c,
+                 max_points_per_region,
                  max_depth,
-                 split_mode, 
-                 progress_win_size, 
-                 progress_measure, 
-                 sampling_mode, 
-                 idxs=None, 
+                 split_mode,
+                 progress_win_size,
+                 progress_measure,
+                 sampling_mode,
+                 idxs=None,
                  split_dim=0):
-        
+
+        TreeNode.__init__(self, self, 0)
+
         self.get_data_x = get_data_x
-        self.bounds_x = np.array(bounds_x, dtype=np.float64)
         self.get_data_c = get_data_c
         self.max_points_per_region = max_points_per_region
         self.max_depth = max_depth
@@ -166,222 +419,444 @@ class Tree(object):
         self.progress_measure = progress_measure
         self.sampling_mode = sampling_mode
 
-        self.split_dim = split_dim
-        self.split_value = None
-        self.lower = None
-        self.greater = None
-        if idxs == None:
-            self.idxs = []
-        else:
-            self.idxs = idxs
-        self.children = len(self.idxs)
-        self.volume = np.prod(self.bounds_x[1,:] - self.bounds_x[0,:])
-        
-        self.leafnode = True
-        self.progress = 0
-        self.max_leaf_progress = 0
-        
-        if self.children > self.max_points_per_region:
-            self.split()
-        self.update_max_progress()
-            
-        
-    def get_nodes(self):
+        if progress_win_size < 1:
+            raise ValueError("progress_win_size should be >= 1")
+
+        bounds_x = np.array(bounds_x, dtype=np.float64)
+
+        # Node arrays, indexed by node id and doubled when full (see new_node)
+        capacity = 16
+        self.n_nodes = 0
+        self.split_dims = np.zeros(capacity, dtype=int)
+        self.split_values = np.zeros(capacity)
+        self.lowers = - np.ones(capacity, dtype=int)
+        self.greaters = - np.ones(capacity, dtype=int)
+        self.levels = np.zeros(capacity, dtype=int)
+        self.bounds = np.zeros((capacity,) + bounds_x.shape)
+        self.volumes = np.zeros(capacity)
+        self.counts = np.zeros(capacity, dtype=int)
+        self.progresses = np.zeros(capacity)
+        self.max_leaf_progresses = np.zeros(capacity)
+        self.leaf_idxs = [] # point indices of each leaf (None for internal nodes)
+
+        # Competence windows: ring buffers of the last progress_win_size competences of each node,
+        # with the sum of the window, of its first half, and of competences weighted by their position
+        self.windows = np.zeros((capacity, progress_win_size))
+        self.window_lens = np.zeros(capacity, dtype=int)
+        self.window_heads = np.zeros(capacity, dtype=int)
+        self.window_sums = np.zeros(capacity)
+        self.window_half_sums = np.zeros(capacity)
+        self.window_time_sums = np.zeros(capacity)
+
+        # Sum-trees of the sampling weights of the nodes (see weight_tree),
+        # and nodes which weights changed since the last update of each sum-tree
+        self.weight_trees = {}
+        self.changed_nodes = {}
+        self.max_exponent_drift = 500. # max distance between the softmax exponents and their offset (exp(709) overflows)
+
+        self.new_node(bounds_x, split_dim, 0, [] if idxs is None else list(idxs))
+        self.grow_subtree(0)
+
+
+    def new_node(self, bounds_x, split_dim, level, idxs):
         """
-        Get the list of all nodes.
-        
+        Add a leaf to the node arrays and return its id.
+
         """
-        return self.fold_up(lambda n, fl, fg: [n] + fl + fg, lambda leaf: [leaf])
-    
-    
-    def get_leaves(self):
+        if self.n_nodes == len(self.counts):
+            for name in ['split_dims', 'split_values', 'lowers', 'greaters', 'levels',
+                         'bounds', 'volumes', 'counts', 'progresses', 'max_leaf_progresses',
+                         'windows', 'window_lens', 'window_heads', 'window_sums',
+                         'window_half_sums', 'window_time_sums']:
+                a = getattr(self, name)
+                setattr(self, name, np.concatenate((a, np.zeros_like(a))))
+        node = self.n_nodes
+        self.n_nodes += 1
+        self.split_dims[node] = split_dim
+        self.split_values[node] = 0.
+        self.lowers[node] = -1
+        self.greaters[node] = -1
+        self.levels[node] = level
+        self.bounds[node] = bounds_x
+        self.volumes[node] = np.prod(bounds_x[1,:] - bounds_x[0,:])
+        self.counts[node] = len(idxs)
+        self.progresses[node] = 0.
+        self.max_leaf_progresses[node] = 0.
+        self.leaf_idxs.append(idxs)
+        self.init_window(node, idxs)
+        return node
+
+
+    def init_window(self, node, idxs):
         """
-        Get the list of all leaves.
-        
+        Fill the competence window of a node with the last points of idxs.
+
         """
-        return self.fold_up(lambda n, fl, fg: fl + fg, lambda leaf: [leaf])
-    
-    
-    def depth(self):
+        idxs = sorted(idxs)[- self.progress_win_size:]
+        n = len(idxs)
+        self.windows[node] = 0.
+        if n > 0:
+            self.windows[node, :n] = np.ravel(self.get_data_c()[idxs])
+        self.window_lens[node] = n
+        self.window_heads[node] = 0
+        self.resync_window(node)
+
+
+    def window(self, node):
         """
-        Compute the depth of the tree (depth of a leaf=0).
-        
+        Competences in the window of a node, from the oldest to the newest.
+
         """
-        return self.fold_up(lambda n, fl, fg: max(fl + 1, fg + 1), lambda leaf: 0)
-    
-    
-    def density(self):
+        positions = (self.window_heads[node] + np.arange(self.window_lens[node])) % self.progress_win_size
+        return self.windows[node, positions]
+
+
+    def resync_window(self, node):
         """
-        Compute the density of the node.
-        
+        Recompute the running sums of the window of a node (to avoid accumulating rounding errors).
+
         """
-        return self.children / self.volume
-    
-    
-    def pt2leaf(self, x):
+        v = self.window(node)
+        n = len(v)
+        self.window_sums[node] = np.sum(v)
+        self.window_half_sums[node] = np.sum(v[:n // 2])
+        self.window_time_sums[node] = np.dot(np.arange(n), v)
+
+
+    def push_competence(self, node, c):
         """
-        Get the leaf which domain contains x.
-        
+        Push the competence of a new point in the window of a node, dropping the oldest one if the window is full.
+
         """
-        if self.leafnode:
-            return self
+        w = self.progress_win_size
+        n = self.window_lens[node]
+        head = self.window_heads[node]
+        if n < w:
+            self.windows[node, (head + n) % w] = c
+            self.window_sums[node] += c
+            self.window_time_sums[node] += n * c
+            n += 1
+            self.window_lens[node] = n
+            if n // 2 > (n - 1) // 2: # first half grows by one
+                self.window_half_sums[node] += self.windows[node, (head + (n - 1) // 2) % w]
         else:
-            if x[self.split_dim] < self.split_value:
-                return self.lower.pt2leaf(x)
+            oldest = self.windows[node, head]
+            self.window_time_sums[node] += (w - 1) * c - (self.window_sums[node] - oldest)
+            self.window_sums[node] += c - oldest
+            if w // 2 > 0:
+                self.window_half_sums[node] += self.windows[node, (head + w // 2) % w] - oldest
+            self.windows[node, head] = c
+            self.window_heads[node] = (head + 1) % w
+            if self.window_heads[node] == 0:
+                self.resync_window(node)
+
+
+    def grow_subtree(self, node):
+        """
+        Split the leaves of the subtree rooted at node until they have at most max_points_per_region points,
+        and compute the progress of the subtree's nodes.
+
+        """
+        stack = [node]
+        nodes = []
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            if self.counts[node] > self.max_points_per_region and self.levels[node] < self.max_depth:
+                self.split(node)
+                stack.extend([self.greaters[node], self.lowers[node]])
+        for node in reversed(nodes):
+            self.update_max_progress(node)
+
+
+    def subtree(self, node=0):
+        """
+        Ids of the nodes of the subtree rooted at node, in depth-first order (lower before greater).
+
+        """
+        nodes = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            if self.lowers[node] >= 0:
+                stack.extend([self.greaters[node], self.lowers[node]])
+        return nodes
+
+
+    def leaves(self, node=0):
+        """
+        Ids of the leaves of the subtree rooted at node, from lower to greater.
+
+        """
+        return [n for n in self.subtree(node) if self.lowers[n] < 0]
+
+
+    def node_idxs(self, node):
+        """
+        Indices of the points of a node, gathered from its leaves.
+
+        """
+        if self.lowers[node] < 0:
+            return list(self.leaf_idxs[node])
+        idxs = []
+        for leaf in self.leaves(node):
+            idxs.extend(self.leaf_idxs[leaf])
+        return idxs
+
+
+    def pt2leaf_id(self, x, node=0):
+        """
+        Get the id of the leaf which domain contains x, starting from the given node.
+
+        """
+        while self.lowers[node] >= 0:
+            if x[self.split_dims[node]] < self.split_values[node]:
+                node = self.lowers[node]
             else:
-                return self.greater.pt2leaf(x)
-        
-        
-    def sample_bounds(self):
+                node = self.greaters[node]
+        return node
+
+
+    def pt2leaf_ids(self, x, node=0):
         """
-        Sample a point in the region of this node.
-        
+        Get the ids of the leaves which domains contain the points x (array of shape (n, K)), starting from the given node.
+
+        """
+        x = np.atleast_2d(x)
+        nodes = np.full(len(x), node, dtype=int)
+        inter = np.nonzero(self.lowers[nodes] >= 0)[0]
+        while len(inter):
+            n = nodes[inter]
+            lower = x[inter, self.split_dims[n]] < self.split_values[n]
+            nodes[inter] = np.where(lower, self.lowers[n], self.greaters[n])
+            inter = inter[self.lowers[nodes[inter]] >= 0]
+        return nodes
+
+
+    def sample_node(self, node):
         """
-        s = rand_bounds(self.bounds_x).flatten()
+        Sample a point in the region of a node.
+
+        """
+        s = rand_bounds(self.bounds[node]).flatten()
         return s
-    
-    
-    def sample_random(self):
+
+
+    def sample_nodes(self, nodes):
+        """
+        Sample a point in the region of each of the given nodes.
+
+        """
+        mins = self.bounds[nodes, 0]
+        return mins + np.random.rand(*np.shape(mins)) * (self.bounds[nodes, 1] - mins)
+
+
+    def sampling_weights(self, nodes, weights, scale=None, offset=0.):
+        """
+        Weights of the given nodes used to sample them:
+            'leaves': 1 for leaves, 0 for internal nodes,
+            'progress': progress (times volume if sampling_mode['volume']),
+            'softmax': exp(progress / scale - offset) (progress times volume if sampling_mode['volume']),
+        for the nodes that can be sampled (all nodes if sampling_mode['multiscale'], leaves otherwise), 0 for the others.
+
+        """
+        if weights == 'leaves':
+            return (self.lowers[nodes] < 0).astype(float)
+        w = self.progresses[nodes]
+        if self.sampling_mode['volume']:
+            w = w * self.volumes[nodes]
+        if not self.sampling_mode['multiscale']:
+            w = np.where(self.lowers[nodes] < 0, w, -np.inf if weights == 'softmax' else 0.)
+        if weights == 'softmax':
+            w = np.exp(w / scale - offset)
+        elif weights != 'progress':
+            raise NotImplementedError(weights)
+        return w
+
+
+    def weight_tree(self, weights, op=np.add, scale=None):
+        """
+        Sum-tree (or max-tree with op=np.maximum) over the sampling weights of all nodes.
+        It is updated with the nodes changed since last call, and rebuilt if scale changes.
+
+        The 'softmax' weights exp(progress / scale - offset) do not depend on the other nodes: the offset is only
+        a reference exponent preventing overflows and underflows, set to the max exponent when the tree is built.
+        The tree is rebuilt (rebased) only when the max exponent moves more than max_exponent_drift away from it.
+
+        """
+        key = (weights, op)
+        offset = 0.
+        if weights == 'softmax':
+            exponent = self.weight_tree('progress', np.maximum).total() / scale
+            if (key in self.weight_trees and self.weight_trees[key][1] == scale and
+                    abs(exponent - self.weight_trees[key][2]) < self.max_exponent_drift):
+                offset = self.weight_trees[key][2]
+            else:
+                offset = exponent
+        if key not in self.weight_trees or self.weight_trees[key][1:] != (scale, offset):
+            weight_tree = SumTree(self.sampling_weights(np.arange(self.n_nodes), weights, scale, offset), op)
+            self.weight_trees[key] = (weight_tree, scale, offset)
+            self.changed_nodes[key] = set()
+        weight_tree = self.weight_trees[key][0]
+        if self.changed_nodes[key]:
+            nodes = np.array(sorted(self.changed_nodes[key]), dtype=int)
+            weight_tree.update(nodes, self.sampling_weights(nodes, weights, scale, offset))
+            self.changed_nodes[key].clear()
+        return weight_tree
+
+
+    def sample_random(self, n=None):
         """
         Sample a point in a random leaf.
-        
+
         """
-        if self.sampling_mode['volume']:  
+        if self.sampling_mode['volume']:
             # Choose a leaf weighted by volume, randomly
-            if self.leafnode:
-                return self.sample_bounds()
-            else:
-                split_ratio = ((self.split_value - self.bounds_x[0,self.split_dim]) / 
-                               (self.bounds_x[1,self.split_dim] - self.bounds_x[0,self.split_dim]))
-                if split_ratio > np.random.random():
-                    return self.lower.sample(sampling_mode=['random'])
-                else:
-                    return self.greater.sample(sampling_mode=['random'])
-        else: 
+            nodes = np.zeros(1 if n is None else n, dtype=int)
+            inter = np.nonzero(self.lowers[nodes] >= 0)[0]
+            while len(inter):
+                node = nodes[inter]
+                dim = self.split_dims[node]
+                split_ratio = ((self.split_values[node] - self.bounds[node, 0, dim]) /
+                               (self.bounds[node, 1, dim] - self.bounds[node, 0, dim]))
+                lower = split_ratio > np.random.random(len(inter))
+                nodes[inter] = np.where(lower, self.lowers[node], self.greaters[node])
+                inter = inter[self.lowers[nodes[inter]] >= 0]
+        else:
             # Choose a leaf randomly
-            return np.random.choice(self.get_leaves()).sample_bounds()
-        
-        
-    def sample_greedy(self):
-        """        
+            nodes = self.weight_tree('leaves').sample(1 if n is None else n)
+        s = self.sample_nodes(nodes)
+        return s[0] if n is None else s
+
+
+    def sample_greedy(self, n=None):
+        """
         Sample a point in the leaf with the max progress.
-        
-        """    
-        if self.leafnode:
-            return self.sample_bounds()
-        else:
-            lp = self.lower.max_leaf_progress
-            gp = self.greater.max_leaf_progress
+
+        """
+        node = 0
+        while self.lowers[node] >= 0:
+            lp = self.max_leaf_progresses[self.lowers[node]]
+            gp = self.max_leaf_progresses[self.greaters[node]]
             maxp = max(lp, gp)
-        
-            if self.sampling_mode['multiscale']:                
-                tp = self.progress        
-                if tp > maxp:
-                    return self.sample_bounds()
+
+            # A node often has the same window as one of its children: its progress is then only
+            # different by rounding errors of the running sums, and the leaf is prefered
+            tp = self.progresses[node]
+            if self.sampling_mode['multiscale'] and tp > maxp and not np.isclose(tp, maxp, rtol=1e-9, atol=1e-12):
+                break
             if gp == maxp:
-                sampling_mode = self.sampling_mode
-                sampling_mode['mode'] = 'greedy'
-                return self.greater.sample(sampling_mode=sampling_mode)
+                node = self.greaters[node]
             else:
-                sampling_mode = self.sampling_mode
-                sampling_mode['mode'] = 'greedy'
-                return self.lower.sample(sampling_mode=sampling_mode)
-        
-        
-    def sample_epsilon_greedy(self, epsilon=0.1):
+                node = self.lowers[node]
+        if n is None:
+            return self.sample_node(node)
+        return self.sample_nodes(np.repeat(node, n))
+
+
+    def sample_epsilon_greedy(self, epsilon=0.1, n=None):
         """
         Sample a point in the leaf with the max progress with probability (1-eps) and a random leaf with probability (eps).
-        
+
         Parameters
         ----------
-        epsilon : float 
-            
+        epsilon : float
+
         """
-        if epsilon > np.random.random():
-            sampling_mode = self.sampling_mode
-            sampling_mode['mode'] = 'random'
-            return self.sample(sampling_mode=sampling_mode)
-        else:
-            sampling_mode = self.sampling_mode
-            sampling_mode['mode'] = 'greedy'
-            return self.sample(sampling_mode=sampling_mode)
-        
-        
-    def sample_softmax(self, temperature=1.):
+        if n is None:
+            if epsilon > np.random.random():
+                return self.sample_random()
+            else:
+                return self.sample_greedy()
+        rand = epsilon > np.random.random(n)
+        s = np.zeros((n, np.shape(self.bounds)[2]))
+        s[rand] = self.sample_random(np.sum(rand))
+        s[~rand] = self.sample_greedy(n - np.sum(rand))
+        return s
+
+
+    def sample_proportional(self, n=None):
         """
-        Sample leaves with probabilities progress*volume and a softmax exploration (with a temperature parameter).
-        
+        Sample nodes with probabilities proportional to their progress (times volume if sampling_mode['volume']).
+
+        """
+        weight_tree = self.weight_tree('progress')
+        if not weight_tree.total() > 0: # if all progresses are 0 or nan value in dataset, eps-greedy sample
+            return self.sample_epsilon_greedy(n=n)
+        s = self.sample_nodes(weight_tree.sample(1 if n is None else n))
+        return s[0] if n is None else s
+
+
+    def sample_softmax(self, temperature=1., n=None):
+        """
+        Sample leaves with probabilities proportional to exp(progress*volume / temperature).
+        The nodes are drawn in O(log L) from a sum-tree of their weights, which is updated in O(log L) for each
+        node whose progress changed (see weight_tree).
+
         Parameters
         ----------
-        temperature : float 
-        
+        temperature : float
+
         """
         if self.leafnode:
-            return self.sample_bounds()
+            nodes = np.zeros(1 if n is None else n, dtype=int)
         else:
-            if self.sampling_mode['multiscale']:
-                nodes = self.get_nodes()
-            else:
-                nodes = self.get_leaves()
-                
-            if  self.sampling_mode['volume']:
-                progresses = np.array([node.progress*node.volume for node in nodes]) #by volume
-            else:
-                progresses = np.array([node.progress for node in nodes]) #by volume
-                
-            progress_max = max(progresses)
-            probas = np.exp(progresses / (progress_max*temperature))
-            probas = probas / np.sum(probas)
-            
-            if np.isnan(np.sum(probas)): # if progress_max = 0 or nan value in dataset, eps-greedy sample
-                return self.sample_epsilon_greedy()
-            else:
-                node = nodes[np.where(np.random.multinomial(1, probas) == 1)[0][0]]
-                return node.sample_bounds()
-        
-            
-    def sample(self, sampling_mode=None):
+            progress_max = self.weight_tree('progress', np.maximum).total()
+            if not progress_max > 0: # if progress_max = 0 or nan value in dataset, eps-greedy sample
+                return self.sample_epsilon_greedy(n=n)
+            nodes = self.weight_tree('softmax', scale=temperature).sample(1 if n is None else n)
+        s = self.sample_nodes(nodes)
+        return s[0] if n is None else s
+
+
+    def sample(self, sampling_mode=None, n=None):
         """
-        Sample a point in the leaf region with max competence progress (recursive).
-        
+        Sample a point in the leaf region with max competence progress.
+
         Parameters
         ----------
         sampling_mode : dict
             How to sample a point in the tree: {'multiscale':bool, 'mode':string, 'param':float}
-            
+        n : int
+            Number of points to sample: if given, an (n,K) array is returned instead of a single point.
+
         """
         if sampling_mode is None:
             sampling_mode = self.sampling_mode
 
         if sampling_mode['mode'] == 'random':
-            return self.sample_random()
-                
+            return self.sample_random(n)
+
         elif sampling_mode['mode'] == 'greedy':
-            return self.sample_greedy()
-            
+            return self.sample_greedy(n)
+
         elif sampling_mode['mode'] == 'epsilon_greedy':
-            return self.sample_epsilon_greedy(sampling_mode['param'])
-            
+            return self.sample_epsilon_greedy(sampling_mode['param'], n)
+
+        elif sampling_mode['mode'] == 'proportional':
+            return self.sample_proportional(n)
+
         elif sampling_mode['mode'] == 'softmax':
-            return self.sample_softmax(sampling_mode['param'])
-            
+            return self.sample_softmax(sampling_mode['param'], n)
+
         else:
             raise NotImplementedError(sampling_mode)
-            
-            
+
+
     def progress_all(self):
         """
         Competence progress of the overall tree.
-        
+
         """
-        return self.progress_idxs(list(range(np.shape(self.get_data_x())[0] - self.progress_win_size, 
+        return self.progress_idxs(list(range(np.shape(self.get_data_x())[0] - self.progress_win_size,
                                         np.shape(self.get_data_x())[0])))
-    
-            
+
+
     def progress_idxs(self, idxs):
         """
         Competence progress on points of given indexes.
-        
+
         """
         if self.progress_measure == 'abs_deriv_cov':
             if len(idxs) <= 1:
@@ -389,7 +864,7 @@ class Tree(object):
             else:
                 idxs = sorted(idxs)[- self.progress_win_size:]
                 return abs(np.cov(list(zip(list(range(len(idxs))), self.get_data_c()[idxs])), rowvar=0)[0, 1])
-            
+
         elif self.progress_measure == 'abs_deriv':
             if len(idxs) <= 1:
                 return 0
@@ -409,168 +884,271 @@ class Tree(object):
                 return np.abs(comp_end - comp_beg)
         else:
             raise NotImplementedError(self.progress_measure)
-        
-        
-    def update_progress(self):
+
+
+    def progress_masks(self, c, masks):
         """
-        Update progress of sub-trees (not recursive).
-        
+        Competence progress of several subsets of points (vectorized progress_idxs).
+
+        Parameters
+        ----------
+        c : (N,) array
+            Competences of the points, sorted by index.
+        masks : (M,N) bool array
+            Each row selects a subset of the points.
+
+        Returns
+        -------
+        progress : (M,) array
+
         """
-        self.progress = self.progress_idxs(self.idxs)
-            
-    
-    def update_max_progress(self):
+        # Last progress_win_size points of each subset, and their position in the window
+        n_after = np.cumsum(masks[:, ::-1], axis=1)[:, ::-1]
+        in_win = masks & (n_after <= self.progress_win_size)
+        pos = np.cumsum(in_win, axis=1) - 1
+        n_win = in_win.sum(axis=1)
+        v = np.where(in_win, c, 0.)
+
+        progress = np.zeros(len(masks))
+        ok = n_win > 1
+        n = n_win[ok]
+        half = n // 2
+        if self.progress_measure == 'abs_deriv_cov':
+            sums = v.sum(axis=1)[ok]
+            time_sums = (pos * v).sum(axis=1)[ok]
+            progress[ok] = abs(time_sums - (n - 1) / 2. * sums) / (n - 1)
+
+        elif self.progress_measure == 'abs_deriv':
+            rows = np.arange(len(masks))
+            first = v[rows, np.argmax(in_win, axis=1)]
+            last = v[rows, np.shape(masks)[1] - 1 - np.argmax(in_win[:, ::-1], axis=1)]
+            progress[ok] = abs(last - first)[ok] / (n - 1)
+
+        elif self.progress_measure == 'abs_deriv_smooth':
+            sums = v.sum(axis=1)[ok]
+            half_sums = (v * (pos < (n_win // 2)[:, np.newaxis])).sum(axis=1)[ok]
+            progress[ok] = abs((sums - half_sums) / (n - half) - half_sums / half)
+
+        else:
+            raise NotImplementedError(self.progress_measure)
+
+        return progress
+
+
+    def update_progress(self, node=0):
         """
-        Compute progress of tree and max progress of sub-trees (not recursive).
-        
+        Update progress of a node from its competence window (not recursive).
+        Same as progress_idxs on the last progress_win_size points of the node.
+
         """
-        self.update_progress()
-        if self.leafnode:
-            self.max_leaf_progress = self.progress
+        n = self.window_lens[node]
+        if n <= 1:
+            progress = 0.
+
+        elif self.progress_measure == 'abs_deriv_cov':
+            # Covariance between positions in the window and competences
+            progress = abs(self.window_time_sums[node] - (n - 1) / 2. * self.window_sums[node]) / (n - 1)
+
+        elif self.progress_measure == 'abs_deriv':
+            # Mean of the differences between consecutive competences
+            head = self.window_heads[node]
+            first = self.windows[node, head]
+            last = self.windows[node, (head + n - 1) % self.progress_win_size]
+            progress = abs(last - first) / (n - 1)
+
+        elif self.progress_measure == 'abs_deriv_smooth':
+            half = n // 2
+            comp_beg = self.window_half_sums[node] / half
+            comp_end = (self.window_sums[node] - self.window_half_sums[node]) / (n - half)
+            progress = abs(comp_end - comp_beg)
+
         else:
-            self.max_leaf_progress = max(self.lower.max_leaf_progress, self.greater.max_leaf_progress)
-            
-        
-    def add(self, idx):
+            raise NotImplementedError(self.progress_measure)
+
+        self.progresses[node] = progress
+
+
+    def update_max_progress(self, node=0):
         """
-        Add an index to the tree (recursive).
-        
+        Compute progress of a node and max progress of its leaves (not recursive).
+
         """
-        if self.leafnode and self.children >= self.max_points_per_region and self.max_depth > 0:
-            self.split() 
-        self.idxs.append(idx)
-        if self.leafnode:
-            leaf_add = self
+        self.update_progress(node)
+        for changed_nodes in self.changed_nodes.values():
+            changed_nodes.add(node)
+        if self.lowers[node] < 0:
+            self.max_leaf_progresses[node] = self.progresses[node]
         else:
-            if self.get_data_x()[idx, self.split_dim] >= self.split_value:
-                leaf_add = self.greater.add(idx)            
+            self.max_leaf_progresses[node] = max(self.max_leaf_progresses[self.lowers[node]],
+                                                 self.max_leaf_progresses[self.greaters[node]])
+
+
+    def add(self, idx):
+        """
+        Add an index to the tree.
+
+        """
+        c = np.ravel(self.get_data_c()[idx])[0]
+        node = 0
+        path = []
+        while True:
+            if self.lowers[node] < 0 and self.counts[node] >= self.max_points_per_region and self.levels[node] < self.max_depth:
+                self.split(node)
+                self.grow_subtree(self.lowers[node])
+                self.grow_subtree(self.greaters[node])
+            path.append(node)
+            if self.lowers[node] < 0:
+                self.leaf_idxs[node].append(idx)
+                break
+            if self.get_data_x()[idx, self.split_dims[node]] >= self.split_values[node]:
+                node = self.greaters[node]
             else:
-                leaf_add = self.lower.add(idx)
-        self.update_max_progress()
-        self.children = self.children + 1
-        return leaf_add # return leaf on which the point has been added
-    
-    
-    def split(self):
+                node = self.lowers[node]
+        for node in reversed(path):
+            self.push_competence(node, c)
+            self.update_max_progress(node)
+            self.counts[node] += 1
+        return TreeNode(self, path[-1]) # return leaf on which the point has been added
+
+
+    def bulk_add(self, idxs):
         """
-        Split the leaf node.
-        
+        Add indices to the tree at once (in increasing order, after the indices already in the tree).
+
+        The new points are routed top-down by blocks: a leaf takes points until it is full, then it is split
+        on its current points and the remaining points are routed to its children.
+        This gives the same tree as adding the indices one by one with add() for the deterministic split modes
+        ('middle', 'median', and 'best_interest_diff' as leaves are split when they have max_points_per_region points),
+        and a tree with the same distribution for the random ones.
+        The counts, competence windows and progresses of all the nodes are then recomputed in one pass.
+
+        """
+        idxs = np.asarray(idxs, dtype=int)
+        if len(idxs) == 0:
+            return
+        data_x = self.get_data_x()
+        stack = [(0, idxs)]
+        while stack:
+            node, new = stack.pop()
+            if self.lowers[node] >= 0:
+                # Group the new points by leaf, keeping their order
+                leaves = self.pt2leaf_ids(data_x[new], node)
+                order = np.argsort(leaves, kind='mergesort')
+                leaves, starts = np.unique(leaves[order], return_index=True)
+                stack.extend(zip(leaves, np.split(new[order], starts[1:])))
+                continue
+            if self.levels[node] < self.max_depth:
+                n_fit = max(0, self.max_points_per_region - self.counts[node])
+            else:
+                n_fit = len(new)
+            self.leaf_idxs[node].extend(new[:n_fit].tolist())
+            self.counts[node] += n_fit
+            if n_fit < len(new):
+                self.split(node)
+                self.grow_subtree(self.lowers[node])
+                self.grow_subtree(self.greaters[node])
+                stack.append((node, new[n_fit:]))
+
+        # Last points of each node, from the leaves up
+        self.weight_trees = {}
+        self.changed_nodes = {}
+        recent = {}
+        for node in reversed(self.subtree(0)):
+            if self.lowers[node] < 0:
+                self.counts[node] = len(self.leaf_idxs[node])
+                recent[node] = self.leaf_idxs[node][- self.progress_win_size:]
+            else:
+                lower, greater = self.lowers[node], self.greaters[node]
+                self.counts[node] = self.counts[lower] + self.counts[greater]
+                recent[node] = sorted(recent.pop(lower) + recent.pop(greater))[- self.progress_win_size:]
+            self.init_window(node, recent[node])
+            self.update_max_progress(node)
+
+
+    def split(self, node):
         """
+        Split a leaf node.
+
+        """
+        idxs = np.array(self.leaf_idxs[node], dtype=int)
+        split_dim = self.split_dims[node]
+        bounds_x = self.bounds[node]
+
         if self.split_mode == 'random':
             # Split randomly between min and max of node's points on split dimension
-            split_dim_data = self.get_data_x()[self.idxs, self.split_dim] # data on split dim
+            split_dim_data = self.get_data_x()[idxs, split_dim] # data on split dim
             split_min = min(split_dim_data)
             split_max = max(split_dim_data)
             split_value = split_min + np.random.rand() * (split_max - split_min)
-            
+
         elif self.split_mode == 'median':
-            # Split on median (which fall on the middle of two points for even max_points_per_region) 
+            # Split on median (which fall on the middle of two points for even max_points_per_region)
             # of node's points on split dimension
-            split_dim_data = self.get_data_x()[self.idxs, self.split_dim] # data on split dim
+            split_dim_data = self.get_data_x()[idxs, split_dim] # data on split dim
             split_value = np.median(split_dim_data)
-            
+
         elif self.split_mode == 'middle':
             # Split on the middle of the region: might cause empty leaf
-            split_dim_data = self.get_data_x()[self.idxs, self.split_dim] # data on split dim
-            split_value = (self.bounds_x[0, self.split_dim] + self.bounds_x[1, self.split_dim]) / 2
-            
-        elif self.split_mode == 'best_interest_diff': 
+            split_dim_data = self.get_data_x()[idxs, split_dim] # data on split dim
+            split_value = (bounds_x[0, split_dim] + bounds_x[1, split_dim]) / 2
+
+        elif self.split_mode == 'best_interest_diff':
             # See Baranes2012: Active Learning of Inverse Models with Intrinsically Motivated Goal Exploration in Robots
             # if strictly more than self.max_points_per_region points: chooses between self.max_points_per_region points random split values
             # the one that maximizes card(lower)*card(greater)* progress difference between the two
-            # if equal or lower than self.max_points_per_region points: chooses between splits at the middle of each pair of consecutive points, 
+            # if equal or lower than self.max_points_per_region points: chooses between splits at the middle of each pair of consecutive points,
             # the one that maximizes card(lower)*card(greater)* progress difference between the two
-            split_dim_data = self.get_data_x()[self.idxs, self.split_dim] # data on split dim
+            split_dim_data = self.get_data_x()[idxs, split_dim] # data on split dim
             split_min = min(split_dim_data)
             split_max = max(split_dim_data)
-                        
-            if len(self.idxs) > self.max_points_per_region:
+
+            if len(idxs) > self.max_points_per_region:
                 m = self.max_points_per_region # Constant that might be tuned: number of random split values to choose between
-                rand_splits = split_min + np.random.rand(m) * (split_max - split_min)
-                splits_fitness = np.zeros(m)
-                for i in range(m):
-                    lower_idx = list(np.array(self.idxs)[np.nonzero(split_dim_data <= rand_splits[i])[0]])
-                    greater_idx = list(np.array(self.idxs)[np.nonzero(split_dim_data > rand_splits[i])[0]])
-                    splits_fitness[i] = len(lower_idx) * len(greater_idx) * abs(self.progress_idxs(lower_idx) - 
-                                                                               self.progress_idxs(greater_idx))
-                split_value = rand_splits[np.argmax(splits_fitness)]
-                
+                splits = split_min + np.random.rand(m) * (split_max - split_min)
             else:
-                m = self.max_points_per_region - 1
                 splits = (np.sort(split_dim_data)[0:-1] + np.sort(split_dim_data)[1:]) / 2
-                splits_fitness = np.zeros(m)
-                for i in range(m):
-                    lower_idx = list(np.array(self.idxs)[np.nonzero(split_dim_data <= splits[i])[0]])
-                    greater_idx = list(np.array(self.idxs)[np.nonzero(split_dim_data > splits[i])[0]])
-                    splits_fitness[i] = len(lower_idx) * len(greater_idx) * abs(self.progress_idxs(lower_idx) - 
-                                                                               self.progress_idxs(greater_idx))
-                split_value = splits[np.argmax(splits_fitness)]
-            
+
+            # All the candidate splits are evaluated at once on the points sorted by index
+            order = np.argsort(idxs, kind='mergesort')
+            c = np.ravel(self.get_data_c()[idxs[order]])
+            lower = split_dim_data[order][np.newaxis, :] <= splits[:, np.newaxis]
+            greater = ~lower
+            splits_fitness = (lower.sum(axis=1) * greater.sum(axis=1) *
+                              abs(self.progress_masks(c, lower) - self.progress_masks(c, greater)))
+            split_value = splits[np.argmax(splits_fitness)]
+
         else:
             raise NotImplementedError
-    
-        lower_idx = list(np.array(self.idxs)[np.nonzero(split_dim_data <= split_value)[0]])
-        greater_idx = list(np.array(self.idxs)[np.nonzero(split_dim_data > split_value)[0]])
 
-        self.leafnode = False
-        self.split_value = split_value
-        
-        split_dim = np.mod(self.split_dim + 1, np.shape(self.get_data_x())[1])
-        
-        l_bounds_x = np.array(self.bounds_x)
-        l_bounds_x[1, self.split_dim] = split_value
-        
-        g_bounds_x = np.array(self.bounds_x)
-        g_bounds_x[0, self.split_dim] = split_value
-        
-        self.lower = Tree(self.get_data_x, 
-                         l_bounds_x, 
-                         self.get_data_c, 
-                         self.max_points_per_region, 
-                         self.max_depth - 1,
-                         self.split_mode, 
-                         self.progress_win_size, 
-                         self.progress_measure, 
-                         self.sampling_mode, 
-                         idxs = lower_idx, 
-                         split_dim = split_dim)
-        
-        self.greater = Tree(self.get_data_x, 
-                            g_bounds_x, 
-                            self.get_data_c, 
-                            self.max_points_per_region, 
-                            self.max_depth - 1,
-                            self.split_mode, 
-                            self.progress_win_size, 
-                            self.progress_measure, 
-                            self.sampling_mode, 
-                            idxs = greater_idx, 
-                            split_dim = split_dim)
-        
-        
-    # Adapted from scipy.spatial.kdtree 
+        lower_idx = list(idxs[np.nonzero(split_dim_data <= split_value)[0]])
+        greater_idx = list(idxs[np.nonzero(split_dim_data > split_value)[0]])
+
+        child_split_dim = np.mod(split_dim + 1, np.shape(self.get_data_x())[1])
+
+        l_bounds_x = np.array(bounds_x)
+        l_bounds_x[1, split_dim] = split_value
+
+        g_bounds_x = np.array(bounds_x)
+        g_bounds_x[0, split_dim] = split_value
+
+        level = self.levels[node] + 1
+        self.split_values[node] = split_value
+        self.leaf_idxs[node] = None
+        self.lowers[node] = self.new_node(l_bounds_x, child_split_dim, level, lower_idx)
+        self.greaters[node] = self.new_node(g_bounds_x, child_split_dim, level, greater_idx)
+
+
     def __query(self, x, k=1, eps=0, p=2, distance_upper_bound=np.inf):
+        """
+        Nearest neighbors of the points x (array of shape (Q, K)), vectorized over the points.
+        The search radius of each point is first bounded by its k-th neighbor among the points of the deepest node
+        on its path holding at least k points. The tree is then descended level by level with all (point, node) pairs,
+        pruning the nodes which bounds are out of the radius, and the points of the reached leaves are compared at once.
 
-        side_distances = np.maximum(0,np.maximum(x-self.bounds_x[1],self.bounds_x[0]-x))
-        if p != np.inf:
-            side_distances **= p
-            min_distance = np.sum(side_distances)
-        else:
-            min_distance = np.amax(side_distances)
-
-        # priority queue for chasing nodes
-        # entries are:
-        #  minimum distance between the cell and the target
-        #  distances between the nearest side of the cell and the target
-        #  the head node of the cell
-        q = [(min_distance,
-              tuple(side_distances),
-              self)]
-        # priority queue for the nearest neighbors
-        # furthest known neighbor first
-        # entries are (-distance**p, i)
-        neighbors = []
+        Returns the flat arrays (query, distance, index, rank) of the neighbors, rank being the order of the neighbor
+        (nearest first) for its query point.
 
+        """
         if eps == 0:
             epsfac = 1
         elif p == np.inf:
@@ -581,58 +1159,69 @@ class Tree(object):
         if p != np.inf and distance_upper_bound != np.inf:
             distance_upper_bound = distance_upper_bound**p
 
-        while q:
-            min_distance, side_distances, node = heappop(q)
-            if node.leafnode:
-                # brute-force
-                data = self.get_data_x()[node.idxs]
-                ds = minkowski_distance_p(data,x[np.newaxis,:],p)
-                for i in range(len(ds)):
-                    if ds[i] < distance_upper_bound:
-                        if len(neighbors) == k:
-                            heappop(neighbors)
-                        heappush(neighbors, (-ds[i], node.idxs[i]))
-                        if len(neighbors) == k:
-                            distance_upper_bound = -neighbors[0][0]
-            else:
-                # we don't push cells that are too far onto the queue at all,
-                # but since the distance_upper_bound decreases, we might get
-                # here even if the cell's too far
-                if min_distance > distance_upper_bound*epsfac:
-                    # since this is the nearest cell, we're done, bail out
-                    break
-                # compute minimum distances to the children and push them on
-                if x[node.split_dim] < node.split_value:
-                    near, far = node.lower, node.greater
-                else:
-                    near, far = node.greater, node.lower
-
-                # near child is at the same distance as the current node
-                heappush(q,(min_distance, side_distances, near))
-
-                # far child is further by an amount depending only
-                # on the split value
-                sd = list(side_distances)
-                if p == np.inf:
-                    min_distance = max(min_distance, abs(node.split_value-x[node.split_dim]))
-                elif p == 1:
-                    sd[node.split_dim] = np.abs(node.split_value-x[node.split_dim])
-                    min_distance = min_distance - side_distances[node.split_dim] + sd[node.split_dim]
-                else:
-                    sd[node.split_dim] = np.abs(node.split_value-x[node.split_dim])**p
-                    min_distance = min_distance - side_distances[node.split_dim] + sd[node.split_dim]
+        data_x = self.get_data_x()
+        # Point indices sorted by leaf: the points of a leaf are points[starts[leaf]:starts[leaf] + counts[leaf]]
+        leaves = np.nonzero(self.lowers[:self.n_nodes] < 0)[0]
+        counts = self.counts[:self.n_nodes]
+        starts = np.zeros(self.n_nodes, dtype=int)
+        starts[leaves] = np.cumsum(counts[leaves]) - counts[leaves]
+        points = np.array([idx for leaf in leaves for idx in self.leaf_idxs[leaf]], dtype=int)
+
+        def search(queries, nodes, radius):
+            # (query, leaf) pairs of the leaves below the given nodes which bounds are within the radius of the query
+            found_queries, found_leaves = [], []
+            while len(queries):
+                side_distances = np.maximum(0, np.maximum(x[queries] - self.bounds[nodes, 1],
+                                                          self.bounds[nodes, 0] - x[queries]))
+                near = minkowski_distance_p(side_distances, p) <= radius[queries]
+                queries, nodes = queries[near], nodes[near]
+                leaf = self.lowers[nodes] < 0
+                found_queries.append(queries[leaf])
+                found_leaves.append(nodes[leaf])
+                queries, nodes = np.repeat(queries[~leaf], 2), nodes[~leaf]
+                nodes = np.column_stack((self.lowers[nodes], self.greaters[nodes])).flatten()
+            return np.concatenate(found_queries), np.concatenate(found_leaves)
+
+        def nearest(queries, leaves, n_max):
+            # The n_max nearest points within the upper bound among the points of the given (query, leaf) pairs,
+            # sorted by query and distance, with their rank
+            n = counts[leaves]
+            offsets = np.arange(np.sum(n)) - np.repeat(np.cumsum(n) - n, n)
+            queries, idxs = np.repeat(queries, n), points[np.repeat(starts[leaves], n) + offsets]
+            dists = minkowski_distance_p(data_x[idxs] - x[queries], p)
+            close = dists < distance_upper_bound
+            queries, dists, idxs = queries[close], dists[close], idxs[close]
+            order = np.lexsort((dists, queries))
+            queries, dists, idxs = queries[order], dists[order], idxs[order]
+            ranks = np.arange(len(queries)) - np.searchsorted(queries, queries)
+            keep = ranks < n_max
+            return queries[keep], dists[keep], idxs[keep], ranks[keep]
+
+        all_queries = np.arange(len(x))
+        radius = np.full(len(x), distance_upper_bound)
+        if k is not None:
+            anchors = np.zeros(len(x), dtype=int)
+            inter = all_queries[self.lowers[anchors] >= 0]
+            while len(inter):
+                node = anchors[inter]
+                lower = x[inter, self.split_dims[node]] < self.split_values[node]
+                child = np.where(lower, self.lowers[node], self.greaters[node])
+                deeper = self.counts[child] >= k
+                inter, child = inter[deeper], child[deeper]
+                anchors[inter] = child
+                inter = inter[self.lowers[child] >= 0]
+            queries, dists, _, ranks = nearest(*search(all_queries, anchors, np.full(len(x), np.inf)), n_max=k)
+            kth = ranks == k - 1
+            radius[queries[kth]] = dists[kth]
+
+        queries, dists, idxs, ranks = nearest(*search(all_queries, np.zeros(len(x), dtype=int), radius * epsfac),
+                                              n_max=np.inf if k is None else k)
+
+        if p != np.inf:
+            dists = dists**(1./p)
+        return queries, dists, idxs, ranks
 
-                # far child might be too far, if so, don't bother pushing it
-                if min_distance <= distance_upper_bound*epsfac:
-                    heappush(q,(min_distance, tuple(sd), far))
 
-        if p == np.inf:
-            return sorted([(-d,i) for (d,i) in neighbors])
-        else:
-            return sorted([((-d)**(1./p),i) for (d,i) in neighbors])
-        
-        
-    # Adapted from scipy.spatial.kdtree 
     def nn(self, x, k=1, eps=0, p=2, distance_upper_bound=np.inf):
         """
         Query the tree for nearest neighbors
@@ -675,75 +1264,38 @@ class Tree(object):
 
         """
         self.n, self.m = np.shape(self.get_data_x())
-        x = np.asarray(x)
+        x = np.asarray(x, dtype=np.float64)
         if np.shape(x)[-1] != self.m:
             raise ValueError("x must consist of vectors of length %d but has shape %s" % (self.m, np.shape(x)))
         if p < 1:
             raise ValueError("Only p-norms with 1<=p<=infinity permitted")
+        if k is not None and k < 1:
+            raise ValueError("Requested %s nearest neighbors; acceptable numbers are integers greater than or equal to one, or None" % k)
+
         retshape = np.shape(x)[:-1]
-        if retshape != ():
-            if k is None:
-                dd = np.empty(retshape,dtype=np.object)
-                ii = np.empty(retshape,dtype=np.object)
-            elif k > 1:
-                dd = np.empty(retshape+(k,),dtype=np.float)
-                dd.fill(np.inf)
-                ii = np.empty(retshape+(k,),dtype=np.int)
-                ii.fill(self.n)
-            elif k == 1:
-                dd = np.empty(retshape,dtype=np.float)
-                dd.fill(np.inf)
-                ii = np.empty(retshape,dtype=np.int)
-                ii.fill(self.n)
-            else:
-                raise ValueError("Requested %s nearest neighbors; acceptable numbers are integers greater than or equal to one, or None")
-            for c in np.ndindex(retshape):
-                hits = self.__query(x[c], k=k, eps=eps, p=p, distance_upper_bound=distance_upper_bound)
-                if k is None:
-                    dd[c] = [d for (d,i) in hits]
-                    ii[c] = [i for (d,i) in hits]
-                elif k > 1:
-                    for j in range(len(hits)):
-                        dd[c+(j,)], ii[c+(j,)] = hits[j]
-                elif k == 1:
-                    if len(hits) > 0:
-                        dd[c], ii[c] = hits[0]
-                    else:
-                        dd[c] = np.inf
-                        ii[c] = self.n
-            return dd, ii
+        x = x.reshape(-1, self.m)
+        queries, dists, idxs, ranks = self.__query(x, k, eps, p, distance_upper_bound)
+
+        if k is None:
+            dd = np.empty(len(x), dtype=object)
+            ii = np.empty(len(x), dtype=object)
+            for c in range(len(x)):
+                dd[c], ii[c] = [], []
+            for q, d, i in zip(queries, dists, idxs):
+                dd[q].append(d)
+                ii[q].append(i)
         else:
-            hits = self.__query(x, k=k, eps=eps, p=p, distance_upper_bound=distance_upper_bound)
-            if k is None:
-                return [d for (d,i) in hits], [i for (d,i) in hits]
-            elif k == 1:
-                if len(hits) > 0:
-                    return hits[0]
-                else:
-                    return np.inf, self.n
-            elif k > 1:
-                dd = np.empty(k,dtype=np.float)
-                dd.fill(np.inf)
-                ii = np.empty(k,dtype=np.int)
-                ii.fill(self.n)
-                for j in range(len(hits)):
-                    dd[j], ii[j] = hits[j]
-                return dd, ii
+            dd = np.full((len(x), k), np.inf)
+            ii = np.full((len(x), k), self.n, dtype=int)
+            dd[queries, ranks] = dists
+            ii[queries, ranks] = idxs
+            if k == 1:
+                dd, ii = dd[:, 0], ii[:, 0]
             else:
-                raise ValueError("Requested %s nearest neighbors; acceptable numbers are integers greater than or equal to one, or None")
-         
-                
-    def fold_up(self, f_inter, f_leaf):
-        """
-        Apply recursively the function f_inter from leaves to root, begining with function f_leaf on leaves.
-        
-        """
-        return f_leaf(self) if self.leafnode else f_inter(self,
-                                                          self.lower.fold_up(f_inter, f_leaf), 
-                                                          self.greater.fold_up(f_inter, f_leaf))
-                        
-                
-            
+                retshape = retshape + (k,)
+        return dd.reshape(retshape)[()], ii.reshape(retshape)[()]
+
+
     def plot(self, ax, scatter=True, grid=True, progress_colors=True, progress_max=1., depth=10, plot_dims=[0,1]):
         """
         Plot a projection on 2D of the Tree.
@@ -779,21 +1331,24 @@ class Tree(object):
         
         
     def plot_grid(self, ax, progress_colors=True, progress_max=1., depth=10, plot_dims=[0,1]):
-        if self.leafnode or depth == 0:
-        
-            mins = self.bounds_x[0,plot_dims]
-            maxs = self.bounds_x[1,plot_dims]
-            
-            if progress_colors:
-                prog_min = 0.
-                c = plt.cm.jet((self.max_leaf_progress - prog_min) / (progress_max - prog_min)) if progress_max > prog_min else plt.cm.jet(0)
-                ax.add_patch(plt.Rectangle(mins, maxs[0] - mins[0], maxs[1] - mins[1], color=c, alpha=0.7))
+        stack = [(self.node, depth)]
+        while stack:
+            node, depth = stack.pop()
+            if self.lowers[node] < 0 or depth == 0:
+
+                mins = self.bounds[node, 0, plot_dims]
+                maxs = self.bounds[node, 1, plot_dims]
+
+                if progress_colors:
+                    prog_min = 0.
+                    c = plt.cm.jet((self.max_leaf_progresses[node] - prog_min) / (progress_max - prog_min)) if progress_max > prog_min else plt.cm.jet(0)
+                    ax.add_patch(plt.Rectangle(mins, maxs[0] - mins[0], maxs[1] - mins[1], color=c, alpha=0.7))
+                else:
+                    ax.add_patch(plt.Rectangle(mins, maxs[0] - mins[0], maxs[1] - mins[1], fill=False))
+
             else:
-                ax.add_patch(plt.Rectangle(mins, maxs[0] - mins[0], maxs[1] - mins[1], fill=False))
-                    
-        else:
-            self.lower.plot_grid(ax, progress_colors, progress_max, depth - 1, plot_dims)
-            self.greater.plot_grid(ax, progress_colors, progress_max, depth - 1, plot_dims)
+                stack.append((self.greaters[node], depth - 1))
+                stack.append((self.lowers[node], depth - 1))
 
     
 
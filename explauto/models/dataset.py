@@ -221,6 +221,22 @@ class Dataset(object):
         k_y = min(k, self.size)
         return self._nn(DATA_Y, y, k=k_y, radius=radius, eps=eps, p=p)
 
+    def nn_x_batch(self, X, k=1, radius=np.inf, eps=0.0, p=2):
+        """Find the k nearest neighbors of each row of X in the observed input data, with one query
+        @see Databag.nn() for argument description
+        @return  distances and indexes of found nearest neighbors, arrays of shape (len(X), k).
+        """
+        X = np.reshape(X, (-1, self.dim_x))
+        return self._nn_batch(DATA_X, X, k=min(k, len(self)), radius=radius, eps=eps, p=p)
+
+    def nn_y_batch(self, Y, k=1, radius=np.inf, eps=0.0, p=2):
+        """Find the k nearest neighbors of each row of Y in the observed output data, with one query
+        @see Databag.nn() for argument description
+        @return  distances and indexes of found nearest neighbors, arrays of shape (len(Y), k).
+        """
+        Y = np.reshape(Y, (-1, self.dim_y))
+        return self._nn_batch(DATA_Y, Y, k=min(k, len(self)), radius=radius, eps=eps, p=p)
+
     def nn_dims(self, x, y, dims_x, dims_y, k=1, radius=np.inf, eps=0.0, p=2):
         """Find the k nearest neighbors of a subset of dims of x and y in the observed output data
         @see Databag.nn() for argument description
@@ -256,6 +272,16 @@ class Dataset(object):
             dists, idxes = np.array([dists]), [idxes]
         return dists, idxes
 
+    def _nn_batch(self, side, V, k=1, radius=np.inf, eps=0.0, p=2):
+        """Compute the k nearest neighbors of each row of V in the observed data,
+        :see: _nn() for arguments descriptions.
+        @return  distances and indexes of found nearest neighbors, arrays of shape (len(V), k).
+        """
+        self._build_tree(side)
+        dists, idxes = self.kdtree[side].query(V, k=k, distance_upper_bound=radius,
+                                               eps=eps, p=p)
+        return np.reshape(dists, (len(V), k)), np.reshape(idxes, (len(V), k))
+
     def _build_tree(self, side):
         """Build the KDTree for the observed data
         :arg side  if equal to DATA_X, build input data tree.
@@ -415,4 +441,22 @@ class BufferedDataset(Dataset):
             return [knn[0] for knn in knns], [knn[1] for knn in knns] 
         else:
             return dists, idxes
-        
\ No newline at end of file
+
+    def _nn_batch(self, side, V, k=1, radius=np.inf, eps=0.0, p=2):
+        """Compute the k nearest neighbors of each row of V in the observed data and in the buffer,
+        :see: _nn() for arguments descriptions.
+        @return  distances and indexes of found nearest neighbors, arrays of shape (len(V), k).
+        """
+        if self.size > 0:
+            dists, idxes = Dataset._nn_batch(self, side, V, k, radius, eps, p)
+        else:
+            return self.buffer._nn_batch(side, V, k, radius, eps, p)
+        if self.buffer.size > 0:
+            buffer_dists, buffer_idxes = self.buffer._nn_batch(side, V, k, radius, eps, p)
+            dists = np.hstack((dists, buffer_dists))
+            idxes = np.hstack((idxes, buffer_idxes + self.size))
+            # Same order as the sorted merge of _nn (stable, the points of the tree first)
+            knns = np.argsort(dists, axis=1, kind='stable')[:, :k]
+            return np.take_along_axis(dists, knns, axis=1), np.take_along_axis(idxes, knns, axis=1)
+        else:
+            return dists, idxes
@@ -1,5 +1,7 @@
 import numpy
 
+from scipy.linalg import solve_triangular
+
 
 class Gaussian(object):
     """
@@ -22,11 +24,25 @@ class Gaussian(object):
         self.mu = mu
         if not inv_sigma:
             self.sigma = sigma
-            self.inv = numpy.linalg.inv(self.sigma)
         else:
             self.sigma = numpy.linalg.inv(sigma)
-            self.inv = self.sigma
-        self.det = numpy.absolute(numpy.linalg.det(self.sigma))
+        # lower Cholesky factor of sigma and log-determinant of sigma
+        self.chol = numpy.linalg.cholesky(self.sigma)
+        self.log_det = 2. * numpy.sum(numpy.log(numpy.diag(self.chol)))
+        self._inv = None
+
+    @property
+    def inv(self):
+        """ Inverse covariance matrix (computed on first access). """
+        if self._inv is None:
+            inv_chol = solve_triangular(self.chol, numpy.eye(len(self.chol)), lower=True)
+            self._inv = inv_chol.T.dot(inv_chol)
+        return self._inv
+
+    @property
+    def det(self):
+        """ Determinant of the covariance matrix. """
+        return numpy.exp(self.log_det)
 
     def generate(self, number=None):
         """Generates vectors from the Gaussian.
@@ -56,15 +72,20 @@ class Gaussian(object):
         array of all log probabilities if many vectors are given.
 
         @param x : may be of (n,) shape
+
+        The Mahalanobis term is computed with a triangular solve against the
+        Cholesky factor of sigma, for all the (n, d) vectors at once.
         """
         d = self.mu.shape[0]
         xc = x - self.mu
         if len(x.shape) == 1:
-            exp_term = numpy.sum(numpy.multiply(xc, numpy.dot(self.inv, xc)))
+            z = solve_triangular(self.chol, xc, lower=True)
+            exp_term = numpy.sum(z ** 2)
         else:
-            exp_term = numpy.sum(numpy.multiply(xc, numpy.dot(xc, self.inv)), axis=1)
+            z = solve_triangular(self.chol, xc.T, lower=True)
+            exp_term = numpy.sum(z ** 2, axis=0)
 
-        return -.5 * (d * numpy.log(2 * numpy.pi) + numpy.log(self.det) + exp_term)
+        return -.5 * (d * numpy.log(2 * numpy.pi) + self.log_det + exp_term)
 
     def cond_gaussian(self, dims, v):
         """
@@ -90,7 +111,7 @@ class Gaussian(object):
         """Computes (analyticaly) the entropy of the Gaussian distribution.
         """
         dim = self.mu.shape[0]
-        entropy = 0.5 * (dim * (numpy.log(2. * numpy.pi) + 1.) + numpy.log(self.det))
+        entropy = 0.5 * (dim * (numpy.log(2. * numpy.pi) + 1.) + self.log_det)
         return entropy
 
     def get_display_ellipse2D(self):
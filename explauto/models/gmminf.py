@@ -1,9 +1,15 @@
 
 import sklearn.mixture
-from numpy.linalg import inv, eig
-from numpy import ix_, array, inf, sqrt, linspace, zeros, arctan2, matrix, pi
+from numpy.linalg import inv, eig, cholesky, solve
+from numpy import ix_, array, inf, sqrt, linspace, arctan2, pi
+from numpy import asarray, arange, log, exp, diagonal, einsum, matmul, errstate, eye, finfo, cov
+from numpy.random import rand, randn
+from numpy import diag, zeros, zeros_like, outer, maximum
+from scipy.special import logsumexp
+from sklearn.utils import check_random_state
 
-from .gaussian import Gaussian
+
+covariance_types = ('full', 'diag', 'lowrank')
 
 
 def schur_complement(mat, row, col):
@@ -30,91 +36,323 @@ def conditional(mean, covar, dims_in, dims_out, covariance_type='full'):
     return lambda x: [cond_mean(x), cond_covar]
 
 
+class Conditioner(object):
+    """ Precompiled conditional operator P(Y | X) of a GMM P(V), for fixed disjoint subspaces X (in_dims) and Y (out_dims) of V.
+
+    Everything that does not depend on the value of X is computed once at construction: for each component, the regression matrix sig_out_in.sig_in_in^-1, the Schur complement (i.e. the conditional covariance) and the inverse Cholesky factor and log-determinant of sig_in_in. P(Y | X=v) can then be evaluated for a batch of values v with stacked numpy operations.
+
+    For 'lowrank' GMMs (covariances D + W.W^T), sig_in_in is inverted with the Woodbury identity: only r x r matrices are factorized and the conditional distribution is again diagonal plus rank r, so that the cost is O(d.r^2) instead of O(d^3).
+
+    .. note:: The operator is a snapshot of the GMM parameters at construction time. Use :meth:`GMM.conditioner` rather than this class directly, it rebuilds the operator when the parameters of the GMM are replaced (e.g. by a new fit).
+    """
+    def __init__(self, gmm, in_dims, out_dims):
+        if gmm.covariance_type not in covariance_types:
+            raise ValueError("covariance type other than {} not allowed".format(covariance_types))
+        self.covariance_type = gmm.covariance_type
+        self.in_dims = array(in_dims, dtype=int)
+        self.out_dims = array(out_dims, dtype=int)
+        self.params = gmm._parameters()
+
+        weights, means, covars = [asarray(p, dtype=float) for p in self.params[:3]]
+        n_components = len(weights)
+        in_dims, out_dims = self.in_dims, self.out_dims
+        self.n_components = n_components
+        with errstate(divide='ignore'):
+            self.log_weights = log(weights)
+        self.mu_in = means[:, in_dims]
+        self.mu_out = means[:, out_dims]
+
+        if self.covariance_type == 'full':
+            ks = arange(n_components)
+            sig_in = covars[ix_(ks, in_dims, in_dims)]
+            sig_in_out = covars[ix_(ks, in_dims, out_dims)]
+            self.covariances = covars[ix_(ks, out_dims, out_dims)]
+            if in_dims.size:
+                chol = cholesky(sig_in)
+                self.inv_chol = inv(chol)
+                self.log_dets = 2. * log(diagonal(chol, axis1=1, axis2=2)).sum(axis=1)
+                self.regression = solve(sig_in, sig_in_out).transpose(0, 2, 1)
+                self.covariances = self.covariances - matmul(self.regression, sig_in_out)
+        elif self.covariance_type == 'diag':
+            # diagonal covariances: X and Y are independent within each component
+            var_in = covars[:, in_dims]
+            self.covariances = covars[:, out_dims]
+            self.inv_chol = 1. / sqrt(var_in)
+            self.log_dets = log(var_in).sum(axis=1)
+        else:
+            # covariances D + W.W^T: covars holds the diagonals of D, factors the matrices W
+            factors = asarray(self.params[3], dtype=float)
+            rank = factors.shape[2]
+            var_in = covars[:, in_dims]
+            w_in = factors[:, in_dims, :]
+            w_out = factors[:, out_dims, :]
+            self.covariances = covars[:, out_dims]
+            self.factors = w_out
+            if in_dims.size:
+                # Woodbury: sig_in_in^-1 = D^-1 - D^-1.W.M^-1.W^T.D^-1 with M = I + W^T.D^-1.W
+                self.inv_var = 1. / var_in
+                self.projection = w_in * self.inv_var[:, :, None]
+                m_chol = cholesky(eye(rank) + matmul(w_in.transpose(0, 2, 1), self.projection))
+                self.inv_chol = inv(m_chol)
+                self.log_dets = (log(var_in).sum(axis=1) +
+                                 2. * log(diagonal(m_chol, axis1=1, axis2=2)).sum(axis=1))
+                m_inv = matmul(self.inv_chol.transpose(0, 2, 1), self.inv_chol)
+                # regression: W_out.M^-1.W_in^T.D_in^-1, conditional covariance: D_out + W_out.M^-1.W_out^T
+                self.regression = matmul(w_out, m_inv)
+                self.factors = matmul(w_out, cholesky(m_inv))
+        self._sampling_factors = None
+
+    def is_valid_for(self, gmm):
+        """ Whether this operator was built from the current parameter arrays of gmm. """
+        params = gmm._parameters()
+        return (self.covariance_type == gmm.covariance_type and len(params) == len(self.params) and
+                all(p is q for p, q in zip(self.params, params)))
+
+    def _values(self, values):
+        # a 1-d array is a single value of X, a 2-d array is a batch of values
+        values = asarray(values, dtype=float)
+        return values if values.ndim == 2 else values.reshape(1, -1)
+
+    def log_densities(self, values):
+        """ Log of weight_k * P(X=v | component k) for each row v of values, shape (n, n_components). """
+        values = self._values(values)
+        if not self.in_dims.size:
+            return self.log_weights[None, :].repeat(len(values), 0)
+        diffs = values[None, :, :] - self.mu_in[:, None, :]
+        if self.covariance_type == 'full':
+            maha = (matmul(diffs, self.inv_chol.transpose(0, 2, 1)) ** 2).sum(axis=2)
+        elif self.covariance_type == 'diag':
+            maha = ((diffs * self.inv_chol[:, None, :]) ** 2).sum(axis=2)
+        else:
+            proj = matmul(matmul(diffs, self.projection), self.inv_chol.transpose(0, 2, 1))
+            maha = (diffs ** 2 * self.inv_var[:, None, :]).sum(axis=2) - (proj ** 2).sum(axis=2)
+        return (self.log_weights[:, None] -
+                .5 * (self.in_dims.size * log(2 * pi) + self.log_dets[:, None] + maha)).T
+
+    def log_weights_given(self, values):
+        """ Log-weights of the components of P(Y | X=v) for each row v of values, shape (n, n_components). """
+        log_p = self.log_densities(values)
+        return log_p - logsumexp(log_p, axis=1)[:, None]
+
+    def weights_given(self, values):
+        """ Weights of the components of P(Y | X=v) for each row v of values, shape (n, n_components). """
+        return exp(self.log_weights_given(values))
+
+    def means_given(self, values):
+        """ Means of the components of P(Y | X=v) for each row v of values, shape (n, n_components, len(out_dims)). """
+        values = self._values(values)
+        if not self.in_dims.size or self.covariance_type == 'diag':
+            return self.mu_out[None, :, :].repeat(len(values), 0)
+        diffs = values[None, :, :] - self.mu_in[:, None, :]
+        if self.covariance_type == 'lowrank':
+            diffs = matmul(diffs, self.projection)
+        return (self.mu_out[:, None, :] +
+                matmul(diffs, self.regression.transpose(0, 2, 1))).transpose(1, 0, 2)
+
+    def sample(self, values):
+        """ Draw one sample of P(Y | X=v) for each row v of values, shape (n, len(out_dims)). """
+        weights = self.weights_given(values)
+        n = len(weights)
+        ks = (weights.cumsum(axis=1) > rand(n, 1) * weights.sum(axis=1)[:, None]).argmax(axis=1)
+        means = self.means_given(values)[arange(n), ks]
+        noise = randn(n, self.out_dims.size)
+        if self._sampling_factors is None:
+            if self.covariance_type == 'full':
+                self._sampling_factors = cholesky(self.covariances)
+            else:
+                self._sampling_factors = sqrt(self.covariances)
+        if self.covariance_type == 'full':
+            return means + einsum('nij,nj->ni', self._sampling_factors[ks], noise)
+        elif self.covariance_type == 'diag':
+            return means + self._sampling_factors[ks] * noise
+        else:
+            factor_noise = randn(n, self.factors.shape[2])
+            return (means + self._sampling_factors[ks] * noise +
+                    einsum('nir,nr->ni', self.factors[ks], factor_noise))
+
+    def __call__(self, value):
+        """ Return the GMM for P(Y | X=value) (or for P(Y) if in_dims is empty). """
+        res = GMM(n_components=self.n_components,
+                  covariance_type=self.covariance_type)
+        if self.covariance_type == 'lowrank':
+            res.rank = self.factors.shape[2]
+            res.factors_ = self.factors
+        if self.in_dims.size:
+            res.weights_ = self.weights_given(value)[0]
+            res.means_ = self.means_given(value)[0]
+        else:
+            res.weights_ = self.params[0]
+            res.means_ = self.mu_out
+        res.covariances_ = self.covariances
+        return res
+
+
 class GMM(sklearn.mixture.GaussianMixture):
-    def __init__(self, **kwargs):
+    """ Gaussian mixture model with inference facilities, see :meth:`inference`.
+
+    In addition to the covariance types of sklearn.mixture.GaussianMixture, covariance_type='lowrank' represents each covariance as D + W.W^T, with D diagonal and W of shape (n_features, rank). covariances_ then holds the diagonals of D, shape (n_components, n_features), and factors_ the matrices W, shape (n_components, n_features, rank). Fitting (EM for mixtures of factor analyzers), inference and sampling then cost O(n_features.rank^2) per component instead of O(n_features^3), which is meant for high-dimensional sensorimotor spaces.
+    """
+    def __init__(self, rank=1, **kwargs):
         sklearn.mixture.GaussianMixture.__init__(self, **kwargs)
+        self.rank = rank
         self.in_dims = array([])
         self.out_dims = array([])
+        self._conditioners = {}
 
     def __iter__(self):
-        for weight, mean, covar in zip(self.weights_, self.means_, self.covariances_):
+        covariances = self.covariances_
+        if self.covariance_type == 'lowrank':
+            covariances = [diag(c) + f.dot(f.T) for c, f in zip(self.covariances_, self.factors_)]
+        for weight, mean, covar in zip(self.weights_, self.means_, covariances):
             yield (weight, mean, covar)
 
+    def _parameters(self):
+        params = (self.weights_, self.means_, self.covariances_)
+        if self.covariance_type == 'lowrank':
+            params += (self.factors_,)
+        return params
+
+    def covariance_between(self, i, j):
+        """ Return the covariance between dimensions i and j within each component, shape (n_components,). """
+        if self.covariance_type == 'full':
+            return self.covariances_[:, i, j]
+        res = self.covariances_[:, i] if i % self.means_.shape[1] == j % self.means_.shape[1] else zeros(len(self.weights_))
+        if self.covariance_type == 'lowrank':
+            res = res + (self.factors_[:, i, :] * self.factors_[:, j, :]).sum(axis=1)
+        return res
+
+    def scale(self, a, b):
+        """ Transform the GMM in place so that it represents the distribution of a * V + b, where a and b are vectors (a * V is elementwise). """
+        a, b = asarray(a, dtype=float), asarray(b, dtype=float)
+        self.means_ = self.means_ * a + b
+        if self.covariance_type == 'full':
+            self.covariances_ = self.covariances_ * outer(a, a)
+        else:
+            self.covariances_ = self.covariances_ * a ** 2
+        if self.covariance_type == 'lowrank':
+            self.factors_ = self.factors_ * a[:, None]
+
+    def fit(self, X, y=None):
+        if self.covariance_type != 'lowrank':
+            return sklearn.mixture.GaussianMixture.fit(self, X, y)
+        X = asarray(X, dtype=float)
+        # initialize with a diagonal fit and small random factors
+        gmm = GMM(n_components=self.n_components, covariance_type='diag', tol=self.tol,
+                  reg_covar=self.reg_covar, max_iter=self.max_iter, n_init=self.n_init,
+                  init_params=self.init_params, random_state=self.random_state).fit(X)
+        random_state = check_random_state(self.random_state)
+        self.weights_, self.means_, self.covariances_ = gmm.weights_, gmm.means_, gmm.covariances_
+        self.factors_ = (1e-2 * sqrt(self.covariances_)[:, :, None] *
+                         random_state.randn(self.n_components, X.shape[1], self.rank))
+        self.n_features_in_ = X.shape[1]
+        self.converged_ = False
+        self.lower_bound_ = -inf
+        for self.n_iter_ in range(1, self.max_iter + 1):
+            prev_lower_bound = self.lower_bound_
+            self.lower_bound_ = self._em_step(X)
+            if abs(self.lower_bound_ - prev_lower_bound) < self.tol:
+                self.converged_ = True
+                break
+        return self
+
+    def _estimate_weighted_log_prob(self, X, **kwargs):
+        # Used by the sklearn scoring and prediction methods. The sklearn estimation relies on precisions_cholesky_,
+        # which is not defined for 'lowrank' covariances: the densities are computed with the Woodbury form instead.
+        if self.covariance_type != 'lowrank':
+            return sklearn.mixture.GaussianMixture._estimate_weighted_log_prob(self, X, **kwargs)
+        return self.conditioner(arange(X.shape[1]), []).log_densities(X)
+
     def probability(self, value):
-        p = 0.
-        for k, (w, m, c) in enumerate(self):
-            p += w * Gaussian(m.reshape(-1,), c).normal(value.reshape(-1,))
-        return p
+        return exp(self.log_prob_batch(asarray(value, dtype=float).reshape(1, -1)))[0]
+
+    def log_prob_batch(self, X):
+        """ Log-density of the GMM at each row of X (shape (n, d)), computed with a log-sum-exp over the components. """
+        X = asarray(X, dtype=float)
+        return logsumexp(self.conditioner(arange(X.shape[1]), []).log_densities(X), axis=1)
+
+    def partial_fit(self, X, n_iter=1, prior_weight=0.):
+        """ Run n_iter EM iterations on X, warm-started from the current parameters (a complete fit is performed if the GMM has not been fitted yet).
+
+        :param numpy.array X: data of shape (n_samples, n_features)
+
+        :param int n_iter: number of EM iterations
+
+        :param float prior_weight: if positive, covariances are shrunk towards the covariance of X with the weight of prior_weight pseudo-samples. This prevents components from collapsing onto a few points across successive warm-started fits.
+        """
+        if not hasattr(self, 'means_'):
+            return self.fit(X)
+        X = asarray(X, dtype=float)
+        for _ in range(n_iter):
+            self._em_step(X, prior_weight)
+        return self
+
+    def _em_step(self, X, prior_weight=0.):
+        """ Perform one EM iteration on X and return the average log-likelihood of X before the update. """
+        d = X.shape[1]
+        # E-step: the responsibilities are the weights of P(component | V=x)
+        log_p = self.conditioner(arange(d), []).log_densities(X)
+        log_lik = logsumexp(log_p, axis=1)
+        resp = exp(log_p - log_lik[:, None])
+        nk = resp.sum(axis=0) + 10 * finfo(float).eps
+        # M-step
+        means = resp.T.dot(X) / nk[:, None]
+        if self.covariance_type == 'full':
+            prior = cov(X, rowvar=False).reshape(d, d)
+            diffs = X[None, :, :] - means[:, None, :]
+            covars = ((einsum('nk,kni,knj->kij', resp, diffs, diffs) + prior_weight * prior) /
+                      (nk + prior_weight)[:, None, None] + self.reg_covar * eye(d))
+            prec_chol = inv(cholesky(covars)).transpose(0, 2, 1)
+            self.precisions_cholesky_ = prec_chol
+            self.precisions_ = matmul(prec_chol, prec_chol.transpose(0, 2, 1))
+        elif self.covariance_type == 'diag':
+            prior = X.var(axis=0)
+            diffs = X[None, :, :] - means[:, None, :]
+            covars = ((einsum('nk,kni->ki', resp, diffs ** 2) + prior_weight * prior) /
+                      (nk + prior_weight)[:, None] + self.reg_covar)
+            self.precisions_cholesky_ = 1. / sqrt(covars)
+            self.precisions_ = 1. / covars
+        elif self.covariance_type == 'lowrank':
+            # factor analysis M-step, without forming any d x d matrix
+            prior = X.var(axis=0)
+            rank = self.factors_.shape[2]
+            covars = zeros_like(self.covariances_)
+            factors = zeros_like(self.factors_)
+            for k in range(len(nk)):
+                w, diffs, h = self.factors_[k], X - means[k], resp[:, k] / nk[k]
+                dw = w / self.covariances_[k][:, None]
+                beta = solve(eye(rank) + w.T.dot(dw), dw.T)  # W^T.sigma^-1
+                s_beta = diffs.T.dot(h[:, None] * diffs.dot(beta.T))  # S.beta^T
+                factors[k] = solve(eye(rank) - beta.dot(w) + beta.dot(s_beta), s_beta.T).T
+                var = maximum(h.dot(diffs ** 2) - (factors[k] * s_beta).sum(axis=1), 0.)
+                covars[k] = (nk[k] * var + prior_weight * prior) / (nk[k] + prior_weight) + self.reg_covar
+            self.factors_ = factors
+        else:
+            raise ValueError("covariance type other than {} not allowed".format(covariance_types))
+        self.weights_, self.means_, self.covariances_ = nk / nk.sum(), means, covars
+        return log_lik.mean()
 
     def sub_gmm(self, inds_k):
-        gmm = GMM(n_components=len(inds_k), covariance_type=self.covariance_type)
+        gmm = GMM(n_components=len(inds_k), covariance_type=self.covariance_type, rank=self.rank)
 
         gmm.weights_, gmm.means_, gmm.covariances_ = (self.weights_[inds_k],
                                                 self.means_[inds_k, :],
-                                                self.covariances_[inds_k, :, :])
+                                                self.covariances_[inds_k])
+        if self.covariance_type == 'lowrank':
+            gmm.factors_ = self.factors_[inds_k]
         gmm.weights_ = gmm.weights_ / gmm.weights_.sum()
         return gmm
 
-    def conditional(self, in_dims, out_dims):
-        conditionals = []
-
-        for k, (weight_k, mean_k, covar_k) in enumerate(self):
-            conditionals.append(conditional(mean_k, covar_k,
-                                            in_dims, out_dims,
-                                            self.covariance_type))
-
-        cond_weights = lambda v: [(weight_k * Gaussian(mean_k[in_dims].reshape(-1,),
-                                  covar_k[ix_(in_dims, in_dims)]).normal(v.reshape(-1,)))
-                                  for k, (weight_k, mean_k, covar_k) in enumerate(self)]
-
-        def res(v):
-            gmm = GMM(n_components=self.n_components,
-                      covariance_type=self.covariance_type,
-                      random_state=self.random_state, thresh=self.thresh,
-                      min_covar=self.min_covar, n_iter=self.n_iter, n_init=self.n_init,
-                      params=self.params, init_params=self.init_params)
-            gmm.weights_ = cond_weights(v)
-            means_covars = [f(v) for f in conditionals]
-            gmm.means_ = array([mc[0] for mc in means_covars]).reshape(self.n_components,
-                                                                       -1)
-            gmm._set_covars(array([mc[1] for mc in means_covars]))
-            return gmm
-
-        return res
+    def conditioner(self, in_dims, out_dims):
+        """ Return the precompiled :class:`Conditioner` computing P(Y | X) for the dimension indices in_dims of X and out_dims of Y.
 
-        self.in_dims = array(in_dims)
-        self.out_dims = array(out_dims)
-        means = zeros((self.n_components, len(out_dims)))
-        covars = zeros((self.n_components, len(out_dims), len(out_dims)))
-        weights = zeros((self.n_components,))
-        sig_in = []
-        inin_inv = []
-        out_in = []
-        mu_in = []
-        for k, (weight_k, mean_k, covar_k) in enumerate(self):
-            sig_in.append(covar_k[ix_(in_dims, in_dims)])
-            inin_inv.append(matrix(sig_in).I)
-            out_in.append(covar_k[ix_(out_dims, in_dims)])
-            mu_in.append(mean_k[in_dims].reshape(-1, 1))
-
-            means[k, :] = (mean_k[out_dims] +
-                           (out_in *
-                            inin_inv *
-                            (value - mu_in)).T)
-
-            covars[k, :, :] = (covar_k[ix_(out_dims, out_dims)] -
-                               out_in *
-                               inin_inv *
-                               covar_k[ix_(in_dims, out_dims)])
-            weights[k] = weight_k * Gaussian(mu_in.reshape(-1,),
-                                             sig_in).normal(value.reshape(-1,))
-        weights /= sum(weights)
-
-        def p(value):
-            # hard copy of useful matrices local to the function
-            pass
-
-        return p
+        Operators are cached for each (in_dims, out_dims) pair and rebuilt when weights_, means_ or covariances_ are replaced (e.g. by a new fit). In-place modifications of these arrays are not detected.
+        """
+        key = (tuple(in_dims), tuple(out_dims))
+        cond = self._conditioners.get(key)
+        if cond is None or not cond.is_valid_for(self):
+            cond = Conditioner(self, in_dims, out_dims)
+            self._conditioners[key] = cond
+        return cond
 
     def inference(self, in_dims, out_dims, value=None):
         """ Perform Bayesian inference on the gmm. Let's call V = V1...Vd the d-dimensional space on which the current GMM is defined, such that it represents P(V). Let's call X and Y to disjoint subspaces of V, with corresponding dimension indices in ran. This method returns the GMM for P(Y | X=value).
@@ -130,51 +368,9 @@ class GMM(sklearn.mixture.GaussianMixture):
         .. note:: For example, if X = V1...Vm and Y = Vm+1...Vd, then P(Y | X=v1...vm) is returned by self.inference(in_dims=range(m), out_dims=range(m, d), array([v1, ..., vm])).
         """
 
-        if self.covariance_type != 'diag' and self.covariance_type != 'full':
-            raise ValueError("covariance type other than 'full' and 'diag' not allowed")
-        in_dims = array(in_dims)
-        out_dims = array(out_dims)
-        value = array(value)
-
-        means = zeros((self.n_components, len(out_dims)))
-        covars = zeros((self.n_components, len(out_dims), len(out_dims)))
-        weights = zeros((self.n_components,))
-        if in_dims.size:
-            for k, (weight_k, mean_k, covar_k) in enumerate(self):
-
-                sig_in = covar_k[ix_(in_dims, in_dims)]
-                inin_inv = matrix(sig_in).I
-                out_in = covar_k[ix_(out_dims, in_dims)]
-                mu_in = mean_k[in_dims].reshape(-1, 1)
-                means[k, :] = (mean_k[out_dims] +
-                               (out_in *
-                                inin_inv *
-                                (value.reshape(-1, 1) - mu_in)).T)
-                if self.covariance_type == 'full':
-                    covars[k, :, :] = (covar_k[ix_(out_dims, out_dims)] -
-                                       out_in *
-                                       inin_inv *
-                                       covar_k[ix_(in_dims, out_dims)])
-                elif self.covariance_type == 'diag':
-                    covars[k, :] = covar_k[out_dims]
-
-                weights[k] = weight_k * Gaussian(mu_in.reshape(-1,),
-                                                 sig_in).normal(value.reshape(-1,))
-            weights /= sum(weights)
-        else:
-            means = self.means_[:, out_dims]
-            if self.covariance_type == 'full':
-                covars = self.covariances_[ix_(list(range(self.n_components)), out_dims, out_dims)]
-            if self.covariance_type == 'diag':
-                covars = self.covariances_[ix_(list(range(self.n_components)), out_dims)]
-            weights = self.weights_
-
-        res = GMM(n_components=self.n_components,
-                  covariance_type=self.covariance_type)
-        res.weights_ = weights
-        res.means_ = means
-        res.covariances_ = covars
-        return res
+        if self.covariance_type not in covariance_types:
+            raise ValueError("covariance type other than {} not allowed".format(covariance_types))
+        return self.conditioner(in_dims, out_dims)(value)
 
     def ellipses2D(self, colors):
         from matplotlib.patches import Ellipse
@@ -15,20 +15,41 @@ except ImportError:
 
 # print imle.__file__
 
-from numpy import zeros, ones
+from numpy import zeros, ones, diagonal, maximum, sqrt
+from numpy.linalg import eigh
 
 from .gmminf import GMM
 
 
 class Imle(imle.Imle):
-    def to_gmm(self):
+    def to_gmm(self, covariance_type='full', rank=1):
+        """ Export the experts as a GMM on the joint (input, output) space.
+
+            :param str covariance_type: 'full', 'diag' (diagonal of the joint covariances) or 'lowrank' (the rank leading eigen-directions of the joint covariances plus the remaining diagonal variance, see GMM)
+            :param int rank: number of factors when covariance_type is 'lowrank'
+        """
         n = self.number_of_experts
-        gmm = GMM(n_components=n, covariance_type='full')
-        gmm.means_ = zeros((n, self.d+self.D))
-        gmm.covars_ = zeros((n, self.d+self.D, self.d+self.D))
+        d = self.d + self.D
+        gmm = GMM(n_components=n, covariance_type=covariance_type, rank=rank)
+        gmm.means_ = zeros((n, d))
+        if covariance_type == 'full':
+            gmm.covariances_ = zeros((n, d, d))
+        else:
+            gmm.covariances_ = zeros((n, d))
+        if covariance_type == 'lowrank':
+            gmm.factors_ = zeros((n, d, rank))
 
         for k in range(n):
             gmm.means_[k, :] = self.get_joint_mu(k)
-            gmm.covars_[k, :, :] = self.get_joint_sigma(k)
+            sigma = self.get_joint_sigma(k)
+            if covariance_type == 'full':
+                gmm.covariances_[k, :, :] = sigma
+            elif covariance_type == 'diag':
+                gmm.covariances_[k, :] = diagonal(sigma)
+            else:
+                vals, vecs = eigh(sigma)
+                factors = vecs[:, -rank:] * sqrt(maximum(vals[-rank:], 0.))
+                gmm.factors_[k, :, :] = factors
+                gmm.covariances_[k, :] = maximum(diagonal(sigma) - (factors ** 2).sum(axis=1), 1e-6 * diagonal(sigma).max())
         gmm.weights_ = (1.*ones((n,)))/n
         return gmm
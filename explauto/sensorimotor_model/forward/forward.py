@@ -1,4 +1,6 @@
 
+import numpy as np
+
 from explauto.models.dataset import BufferedDataset as Dataset
 
 
@@ -61,6 +63,14 @@ class ForwardModel(object):
         """
         raise NotImplementedError
 
+    def predict_y_batch(self, X, **kwargs):
+        """Provide a prediction of each row of X in the output space
+
+        @param X  an array of float of shape (n, dim_x)
+        @return    predicted ys as an array of float of shape (n, dim_y)
+        """
+        return np.array([self.predict_y(xq, **kwargs) for xq in X]).reshape(len(X), self.dim_y)
+
     def config(self):
         """Return a string with the configuration"""
         return ", ".join('%s:%s' % (key, value) for key, value in list(self.conf.items()))
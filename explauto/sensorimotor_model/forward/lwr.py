@@ -97,7 +97,23 @@ class LWLRForwardModel(ForwardModel):
         k = k or self.k
 
         dists, index = self.dataset.nn_x(xq, k=k)
+        return self._predict_y(xq, dists, index, sigma_sq)
 
+    def predict_y_batch(self, X, sigma=None, k=None):
+        """Provide a prediction of each row of X in the output space, with one k nearest neighbors query
+
+        @param X  an array of float of shape (n, dim_x)
+        @return    predicted ys as an array of float of shape (n, dim_y)
+        """
+        sigma_sq = self.sigma_sq if sigma is None else sigma*sigma
+        k = k or self.k
+
+        dists, indexes = self.dataset.nn_x_batch(X, k=k)
+        return np.array([self._predict_y(xq, d, index, sigma_sq)
+                         for xq, d, index in zip(X, dists, indexes)]).reshape(len(X), self.dim_y)
+
+    def _predict_y(self, xq, dists, index, sigma_sq):
+        """Local linear regression at xq on the neighbors index, at distances dists"""
         w = self._weights(dists, index, sigma_sq)
         Xq  = np.array(np.append([1.0], xq), ndmin = 2)
         X   = np.array([self.dataset.get_x_padded(i) for i in index])
@@ -31,6 +31,15 @@ class NNForwardModel(ForwardModel):
         """
         _, indexes = self.dataset.nn_x(xq, k = 1)
         return self.dataset.get_y(indexes[0])
+
+    def predict_y_batch(self, X, **kwargs):
+        """Provide a prediction of each row of X in the output space, with one nearest neighbor query
+
+        @param X  an array of float of shape (n, dim_x)
+        @return    predicted ys as an array of float of shape (n, dim_y)
+        """
+        _, indexes = self.dataset.nn_x_batch(X, k = 1)
+        return np.array([self.dataset.get_y(idx) for idx in indexes[:, 0]]).reshape(len(X), self.dim_y)
         
     def predict_given_context(self, x, c, c_dims):
         """Provide a prediction of x with context c on dimensions c_dims in the output space being S - c_dims
@@ -92,6 +101,19 @@ class NSNNForwardModel(ForwardModel):
         idx = index[np.argmax(w)]
         return self.dataset.get_y(idx)
 
+    def predict_y_batch(self, X, sigma=None, k = None):
+        """Provide a prediction of each row of X in the output space, with one k nearest neighbors query
+
+        @param X  an array of float of shape (n, dim_x)
+        @return    predicted ys as an array of float of shape (n, dim_y)
+        """
+        sigma_sq = self.sigma_sq if sigma is None else sigma*sigma
+        k = k or self.k
+
+        dists, indexes = self.dataset.nn_x_batch(X, k = k)
+        idxs = [index[np.argmax(self._weights(d, index, sigma_sq))] for d, index in zip(dists, indexes)]
+        return np.array([self.dataset.get_y(idx) for idx in idxs]).reshape(len(X), self.dim_y)
+
     def _weights(self, dists, index, sigma_sq):
         w = np.fromiter((gaussian_kernel(d, sigma_sq)
                          for d in dists), np.float, len(dists))
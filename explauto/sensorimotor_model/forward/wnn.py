@@ -29,6 +29,22 @@ class WeightedNNForwardModel(ForwardModel):
         sigma = sigma or self.sigma
         k = k or self.k
         dists, index = self.dataset.nn_x(xq, k = k)
+        return self._predict_y(dists, index, sigma)
+
+    def predict_y_batch(self, X, sigma=None, k=None, **kwargs):
+        """Provide a prediction of each row of X in the output space, with one k nearest neighbors query
+
+        @param X  an array of float of shape (n, dim_x)
+        @return    predicted ys as an array of float of shape (n, dim_y)
+        """
+        sigma = sigma or self.sigma
+        k = k or self.k
+        dists, indexes = self.dataset.nn_x_batch(X, k = k)
+        return np.array([self._predict_y(d, index, sigma)
+                         for d, index in zip(dists, indexes)]).reshape(len(X), self.dim_y)
+
+    def _predict_y(self, dists, index, sigma):
+        """Weighted average of the outputs of the neighbors index, at distances dists"""
         w = self._weights(dists, sigma*sigma)
         return np.sum([wi*self.dataset.get_y(idx) for wi, idx in zip(w, index)], axis = 0)
 
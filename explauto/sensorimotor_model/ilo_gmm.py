@@ -9,10 +9,12 @@ n_neighbors = 1
 
 
 class IloGmm(SensorimotorModel):
-    def __init__(self, conf, n_components=3):  # , n_components=None):
+    def __init__(self, conf, n_components=3, covariance_type='full', rank=1):  # , n_components=None):
         SensorimotorModel.__init__(self, conf)
         # self.n_components = n_neighbors/20 if n_components is None else n_components
         self.n_components = n_components
+        self.covariance_type = covariance_type  # 'full', 'diag' or 'lowrank' (see GMM)
+        self.rank = rank
         self.n_neighbors = max(100, (conf.ndims) ** 2)  # at least 100 neighbors
         self.n_neighbors = min(1000, self.n_neighbors)  # at most 1000 neighbors
         self.min_n_neighbors = 20  # otherwise raise ExplautoBootstrapError
@@ -47,20 +49,19 @@ class IloGmm(SensorimotorModel):
         return array(data)
 
     def fit_local_gmm(self, in_dims, out_dims, x):
-        gmm = GMM(n_components=self.n_components, covariance_type='full')
+        gmm = GMM(n_components=self.n_components, covariance_type=self.covariance_type, rank=self.rank)
         gmm.fit(self.get_local_data(in_dims, out_dims, x))
         return gmm
 
     def compute_conditional_gmm(self, in_dims, out_dims, x):
-        gmm = self.fit_local_gmm(in_dims, out_dims, x)
-        return gmm.inference(in_dims, out_dims, x)
+        return self.fit_local_gmm(in_dims, out_dims, x).conditioner(in_dims, out_dims)(x)
 
     def infer(self, in_dims, out_dims, x):
-        gmm = self.compute_conditional_gmm(in_dims, out_dims, x)
-        return gmm.sample().flatten()
+        gmm = self.fit_local_gmm(in_dims, out_dims, x)
+        return gmm.conditioner(in_dims, out_dims).sample(x)[0]
 
     def update(self, m, s):
         self.dataset.add_xy(tuple(m), tuple(s))
 
-configurations = {'default': {}}
+configurations = {'default': {}, 'high_dimensional': {'covariance_type': 'lowrank', 'rank': 3}}
 sensorimotor_models = {'ilo_gmm': (IloGmm, configurations)}
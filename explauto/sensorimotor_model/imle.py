@@ -20,12 +20,13 @@ class ImleModel(SensorimotorModel):
         This class wraps the IMLE model from Bruno Damas ( http://users.isr.ist.utl.pt/~bdamas/IMLE ) into a sensorimotor model class to be used by ..agent.agent
         """
     # def __init__(self, m_dims, s_dims, sigma0, psi0, mode='explore'):
-    def __init__(self, conf, mode='explore', **kwargs_imle):
+    def __init__(self, conf, mode='explore', gmm_refresh=1, **kwargs_imle):
         """ :param list m_dims: indices of motor dimensions
             :param list_ndims: indices of sensory dimensions
             :param float sigma0: a priori variance of the linear models on motor dimensions
             :param list psi0: a priori variance of the gaussian noise on each sensory dimensions
             :param string mode: either 'exploit' or 'explore' (default 'explore') to choose if the infer(.) method will return the most likely output or will sample according to the output probability.
+            :param int gmm_refresh: the GMM exported from the experts for general inference is rebuilt when the number of experts changes or after gmm_refresh updates, and reused otherwise.
             .. note::
             """
         SensorimotorModel.__init__(self, conf)
@@ -41,6 +42,23 @@ class ImleModel(SensorimotorModel):
                                #sigma0=sigma0, Psi0=psi0)
         self.normalizer = Normalizer(conf)
 
+        self.covariance_type = 'full'
+        self.rank = 1
+        self.gmm_refresh = gmm_refresh
+        self.gmm = None
+        self.gmm_t = None
+        self.gmm_n_experts = None
+
+    def to_gmm(self):
+        """ Return the GMM exported from the IMLE experts, rebuilt only if it is out of date (see gmm_refresh). """
+        n_experts = self.imle.number_of_experts
+        if (self.gmm is None or n_experts != self.gmm_n_experts or
+                self.t - self.gmm_t >= self.gmm_refresh):
+            self.gmm = self.imle.to_gmm(self.covariance_type, self.rank)
+            self.gmm_t = self.t
+            self.gmm_n_experts = n_experts
+        return self.gmm
+
     def infer(self, in_dims, out_dims, x_):
         x = self.normalizer.normalize(x_, in_dims)
         if self.t < 1:
@@ -70,7 +88,7 @@ class ImleModel(SensorimotorModel):
         # elif in_dims == self.m_dims and out_dims==self.s_dims:
         #     return self.imle.predict(x.flatten()).reshape(-1,1)
         else:
-            return self.normalizer.denormalize(self.imle.to_gmm().inference(in_dims, out_dims, x).sample().flatten(), out_dims)
+            return self.normalizer.denormalize(self.to_gmm().conditioner(in_dims, out_dims).sample(x)[0], out_dims)
 
     def update(self, m_, s_):
         m = self.normalizer.normalize(m_, self.conf.m_dims)
@@ -80,12 +98,20 @@ class ImleModel(SensorimotorModel):
 
 
 class ImleGmmModel(ImleModel):
+    def __init__(self, conf, mode='explore', covariance_type='full', rank=1, gmm_refresh=1, **kwargs_imle):
+        """ :param str covariance_type: covariance type of the exported GMM, 'full', 'diag' or 'lowrank' (see Imle.to_gmm)
+            :param int rank: number of factors when covariance_type is 'lowrank'
+            """
+        ImleModel.__init__(self, conf, mode, gmm_refresh, **kwargs_imle)
+        self.covariance_type = covariance_type
+        self.rank = rank
+
     def update_gmm(self):
-        self.gmm = self.imle.to_gmm()
+        self.gmm = None
+        return self.to_gmm()
 
     def infer(self, in_dims, out_dims, x):
-        self.update_gmm()
-        return self.gmm.inference(in_dims, out_dims, x).sample().T
+        return self.to_gmm().conditioner(in_dims, out_dims).sample(x).T
 
 def make_priors(prior_coef):
     priors = {}
@@ -38,6 +38,14 @@ class InverseModel(object):
         """
         assert len(y) == self.fmodel.dim_y, "Wrong dimension for y. Expected %i, got %i" % (self.fmodel.dim_y, len(y))
         self.goal = np.array(y)
+
+    def infer_x_batch(self, Y):
+        """Infer a probable x for each row of Y
+
+        @param Y  the desired outputs, an array of shape (n, dim_y)
+        @return   the infered xs, an array of shape (n, dim_x)
+        """
+        return np.array([self.infer_x(y)[0] for y in Y]).reshape(len(Y), self.fmodel.dim_x)
         
     def infer_dm(self, ds):
         """Infer probable dm from input ds
@@ -35,6 +35,17 @@ class NNInverseModel(inverse.InverseModel):
             _, index = self.fmodel.dataset.nn_y(y, k=1)
             return [self.fmodel.dataset.get_x(index[0])]
 
+    def infer_x_batch(self, Y):
+        """Infer probable xs from the rows of Y, with one nearest neighbor query
+
+        @param Y  the desired outputs, an array of shape (n, dim_y)
+        """
+        if len(self.fmodel.dataset) == 0:
+            return np.zeros((len(Y), self.dim_x))
+        else:
+            _, indexes = self.fmodel.dataset.nn_y_batch(Y, k=1)
+            return np.array([self.fmodel.dataset.get_x(idx) for idx in indexes[:, 0]]).reshape(len(Y), self.dim_x)
+
     def infer_dm(self, m, s, ds):
         return self.infer_dims(m, np.hstack((s, ds)), list(range(len(m))), list(range(self.dim_x, self.dim_x + self.dim_y)), list(range(len(m), self.dim_x)))
         
@@ -83,6 +94,18 @@ class NSNNInverseModel(inverse.InverseModel):
             idx = index[np.argmax(w)]
             return [self.fmodel.dataset.get_x(idx)]
 
+    def infer_x_batch(self, Y):
+        """Infer probable xs from the rows of Y, with one k nearest neighbors query
+
+        @param Y  the desired outputs, an array of shape (n, dim_y)
+        """
+        if len(self.fmodel.dataset) == 0:
+            return np.zeros((len(Y), self.dim_x))
+        else:
+            dists, indexes = self.fmodel.dataset.nn_y_batch(Y, k=self.k)
+            idxs = [index[np.argmax(self._weights(d, index))] for d, index in zip(dists, indexes)]
+            return np.array([self.fmodel.dataset.get_x(idx) for idx in idxs]).reshape(len(Y), self.dim_x)
+
     def _weights(self, dists, index):
         w = np.fromiter((gaussian_kernel(d, self.sigma_sq)
                          for d in dists), np.float, len(dists))
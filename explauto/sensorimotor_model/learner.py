@@ -62,6 +62,15 @@ class Learner(object):
         x = self.imodel.infer_x(np.array(self._pre_y(goal)), **kwargs)[0]
         return self._post_x(x, goal)
 
+    def infer_order_batch(self, goals):
+        """Infer an order for each goal (rows of goals, an array of shape (n, len(self.Sfeats))).
+
+        :rtype:  array of shape (n, len(self.Mfeats))
+        """
+        goals = np.asarray(goals, dtype=float)
+        assert goals.shape[1] == len(self.Sfeats)
+        return self.imodel.infer_x_batch(goals)
+
     def predict_effect(self, order, **kwargs):
         """Predict the effect of a goal.
 
@@ -71,6 +80,15 @@ class Learner(object):
         y = self.imodel.fmodel.predict_y(np.array(self._pre_x(order)), **kwargs)
         return self._post_y(y, order)
 
+    def predict_effect_batch(self, orders):
+        """Predict the effect of each order (rows of orders, an array of shape (n, len(self.Mfeats))).
+
+        :rtype:  array of shape (n, len(self.Sfeats))
+        """
+        orders = np.asarray(orders, dtype=float)
+        assert orders.shape[1] == len(self.Mfeats)
+        return self.imodel.fmodel.predict_y_batch(orders)
+
     # Pre and post treatment
 
     def _pre_x(self, x):
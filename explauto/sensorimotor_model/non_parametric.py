@@ -73,6 +73,33 @@ class NonParametric(SensorimotorModel):
             print((in_dims, out_dims, self.m_dims, self.s_dims, self.m_dims[len(self.m_dims)//2:]))
             raise NotImplementedError
 
+    def infer_batch(self, in_dims, out_dims, X):
+        """ Performs inference for each row of X, see :meth:`infer`.
+
+        Forward and inverse predictions query the dataset once for the nearest neighbours of all the rows, then run the model step of each row on its neighbours (the average of the WNN and the regression of the LWLR forward models, the choice of the NN and NSNN inverse models). The other inverse models make further queries that depend on the goal during its inference (the neighbourhoods of candidate commands for WNN and ES-WNN, forward predictions of the optimized command for BFGS, L-BFGS-B, COBYLA, CMAES and Jacobian), which cannot be shared in one query: they infer the rows one by one. Other inferences (e.g. dm = i(M, S, dS)) also loop over :meth:`infer`.
+
+        The exploration noise is drawn for all rows at once, in the same order as with successive calls to :meth:`infer`.
+        """
+        if self.t < max(self.model.imodel.fmodel.k, self.model.imodel.k):
+            raise ExplautoBootstrapError
+
+        X = np.asarray(X, dtype=float).reshape(-1, len(in_dims))
+        if in_dims == self.m_dims and out_dims == self.s_dims:  # forward
+            return self.model.predict_effect_batch(X)
+
+        elif in_dims == self.s_dims and out_dims == self.m_dims:  # inverse
+            if not self.bootstrapped_s:
+                return rand_bounds(np.array([self.m_mins, self.m_maxs]), len(X))
+            M = self.model.infer_order_batch(X)
+            if self.mode == 'explore':
+                explored = self.sigma_expl > 0
+                M[:, explored] = np.random.normal(M[:, explored], self.sigma_expl[explored])
+                self.mean_explore = M[-1].copy()
+                return bounds_min_max(M, self.m_mins, self.m_maxs)
+            return M
+
+        return SensorimotorModel.infer_batch(self, in_dims, out_dims, X)
+
     def predict_given_context(self, x, c, c_dims):
         return self.model.imodel.fmodel.predict_given_context(x, c, c_dims)
 
@@ -84,9 +111,16 @@ class NonParametric(SensorimotorModel):
                 self.bootstrapped_s = True
 
     def update_batch(self, m_list, s_list):
+        m_list = [np.array(m, dtype=float) for m in m_list]
+        s_list = [np.array(s, dtype=float) for s in s_list]
+        if not len(m_list):
+            return
+        if not self.bootstrapped_s:
+            # Bootstrapped as soon as two distinct points have been observed in the sensory space
+            s_first = self.model.imodel.fmodel.dataset.get_y(0) if self.t > 0 else s_list[0]
+            self.bootstrapped_s = any(list(s) != list(s_first) for s in s_list)
         self.model.add_xy_batch(m_list, s_list)
         self.t += len(m_list)
-        self.bootstrapped_s = True
 
     def size(self):
         return self.t
@@ -1,3 +1,5 @@
+import numpy as np
+
 from abc import ABCMeta, abstractmethod
 
 from . import sensorimotor_models
@@ -30,12 +32,29 @@ class SensorimotorModel(object, metaclass=ABCMeta):
         """
         pass
 
+    def infer_batch(self, in_dims, out_dims, X):
+        """ Performs inference for each row of X (array of shape (n, len(in_dims))), see :meth:`infer`.
+
+        :returns: an array of shape (n, len(out_dims))
+
+        .. note:: This default version calls :meth:`infer` on each row, models can override it with a vectorized inference.
+        """
+        return np.array([self.infer(in_dims, out_dims, x) for x in X]).reshape(len(X), len(out_dims))
+
     @abstractmethod
     def update(self, m, s):
         """ Update the sensorimotor model given a new (m, s) pair, where m is a motor command and s is the corresponding observed sensory effect.
         """
         pass
 
+    def update_batch(self, M, S):
+        """ Update the sensorimotor model given a batch of (m, s) pairs (rows of M and S), in order.
+
+        .. note:: This default version calls :meth:`update` on each pair, models can override it with a bulk update.
+        """
+        for m, s in zip(M, S):
+            self.update(m, s)
+
     def forward_prediction(self, m):
         """ Compute the expected sensory effect of the motor command m. It is a shortcut for self.infer(self.conf.m_dims, self.conf.s_dims, m)
         """
@@ -1,4 +1,4 @@
-from numpy import hstack, vstack, digitize, linspace, array, dot, unravel_index, ravel_multi_index, product
+from numpy import hstack, vstack, digitize, linspace, array, dot, unravel_index, ravel_multi_index, product, ndim, column_stack, random
 from collections import namedtuple
 
 from . import rand_bounds
@@ -47,6 +47,10 @@ def make_configuration(m_mins, m_maxs, s_mins, s_maxs):
 
 
 class Space(object):
+    """ Box of a space, discretized in a grid of cells when cardinalities (number of bins on each dimension) are given.
+
+    Cells are identified by their multi-index (bin on each dimension) or by their flat index in the grid. The edges of the bins are computed once, so that values, indices and random values of many cells can be converted at once.
+    """
     def __init__(self, mins, maxs, cardinalities=None):
         self.mins, self.maxs = array(mins).astype(float), array(maxs).astype(float)
         self.ndims = self.mins.shape[0]
@@ -60,22 +64,37 @@ class Space(object):
                          self.maxs[d] - self.bin_widths[d],
                          cardinalities[d] - 1) for d in range(self.ndims)]
             self.card = product(cardinalities)
+            # Edges of the bins on each dimension (including the bounds of the space)
+            self.edges = [hstack((mins, bins, maxs)) for mins, bins, maxs in zip(self.mins, self.bins, self.maxs)]
 
     def discretize(self, values, dims):
-        return array([digitize([values[d]], self.bins[d])[0] for d in dims])
+        """ Bins of values (on all dimensions) on dims: array of shape (len(dims),), or (n, len(dims)) for values of shape (n, ndims). """
+        values = array(values)
+        if values.ndim == 1:
+            return array([digitize([values[d]], self.bins[d])[0] for d in dims])
+        return column_stack([digitize(values[:, d], self.bins[d]) for d in dims]).astype(int).reshape(len(values), len(dims))
 
     def index(self, values):
+        """ Index of the cell of values (shape (ndims,)), or array of indices for values of shape (n, ndims). """
         discrete = self.discretize(values, self.dims)
-        return self.multi2index(discrete)
+        if discrete.ndim == 1:
+            return self.multi2index(discrete)
+        return self.multi2index(tuple(discrete.T))
 
     def rand_value(self, index, n=1):
+        """ n random values in the cell of given index (shape (n, ndims)), or one random value in each cell if index is an array of indices (shape (len(index), ndims)). """
         multi_index = unravel_index(index, self.cardinalities)
-        bins = [hstack((mins, bins, maxs)) for mins, bins, maxs in zip(self.mins, self.bins, self.maxs)]
-        bounds = array([[b[i], b[i + 1]] for b, i in zip(bins, multi_index)]).T
-        return rand_bounds(bounds, n)
+        if ndim(index) == 0:
+            bounds = array([[e[i], e[i + 1]] for e, i in zip(self.edges, multi_index)]).T
+            return rand_bounds(bounds, n)
+        lows = column_stack([e[i] for e, i in zip(self.edges, multi_index)]).reshape(-1, self.ndims)
+        highs = column_stack([e[i + 1] for e, i in zip(self.edges, multi_index)]).reshape(-1, self.ndims)
+        return lows + random.rand(*lows.shape) * (highs - lows)
 
     def multi2index(self, multi_index):
+        """ Flat index of a multi-index, or array of indices for a tuple of ndims arrays. """
         return ravel_multi_index(multi_index, self.cardinalities)
 
     def index2multi(self, index):
+        """ Multi-index of a flat index, or tuple of ndims arrays for an array of indices. """
         return unravel_index(index, self.cardinalities)
@@ -26,12 +26,16 @@ class Observable(object):
         logger.info('%s unsubscribes to the topic %s', subscriber, topic)
         self.subscribers[topic].remove(subscriber)
 
-    def emit(self, topic, message):
+    def emit(self, topic, message, subscribers=None):
         logger.info('Emits message %s on topic %s', message, topic)
 
-        for subscriber in self.subscribers[topic]:
+        for subscriber in self.subscribers[topic] if subscribers is None else subscribers:
             subscriber._wrapped_handle_notification(topic, message)
 
+    def row_subscribers(self, topic):
+        """ Subscribers of the topic that are not subscribed to its batch version (topic + '_batch'). """
+        return [s for s in self.subscribers[topic] if s not in self.subscribers[topic + '_batch']]
+
 
 class Observer(object):
     def __init__(self):
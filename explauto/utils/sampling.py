@@ -0,0 +1,81 @@
+import numpy as np
+
+
+class AliasSampler(object):
+    """ Categorical sampler using Walker's alias method.
+
+    Draws indices with probabilities proportional to non-negative weights in O(1) per draw, from an alias table built in O(n). The table is rebuilt lazily: only at the first draw following a change of the weights. Uniform draws are made when all the weights are zero.
+
+    :param weights: initial weights (array_like of shape (n,)), can be set later with set_weights
+    :param rng: numpy.random.Generator used for the draws (the global numpy.random state if None)
+    """
+    def __init__(self, weights=None, rng=None):
+        self.rng = rng
+        self.weights = None
+        self.prob = None
+        self.alias = None
+        if weights is not None:
+            self.set_weights(weights)
+
+    def set_weights(self, weights):
+        """ Set the weights, invalidating the alias table if they changed. """
+        weights = np.array(weights, dtype=float).flatten()
+        if self.weights is None or not np.array_equal(weights, self.weights):
+            if np.any(weights < 0) or not np.all(np.isfinite(weights)):
+                raise ValueError("Weights should be non-negative and finite")
+            self.weights = weights
+            self.prob = None
+
+    def build(self):
+        """ Build the alias table of the current weights.
+
+        Small (below average) and large cells are paired by blocks: each small cell is completed by a large one, which becomes small when its remaining weight falls below average.
+        """
+        n = len(self.weights)
+        total = np.sum(self.weights)
+        prob = self.weights * n / total if total > 0 else np.ones(n)
+        alias = np.arange(n)
+        small = np.nonzero(prob < 1.)[0]
+        large = np.nonzero(prob >= 1.)[0]
+        while len(small) and len(large):
+            m = min(len(small), len(large))
+            s, l = small[:m], large[:m]
+            alias[s] = l
+            prob[l] -= 1. - prob[s]
+            small = np.concatenate((small[m:], l[prob[l] < 1.]))
+            large = np.concatenate((large[m:], l[prob[l] >= 1.]))
+        # Remaining cells are only due to rounding errors
+        prob[small] = 1.
+        prob[large] = 1.
+        self.prob, self.alias = prob, alias
+
+    def sample(self, n=None):
+        """ Draw an index (or an array of n indices if n is given). """
+        if self.weights is None or not len(self.weights):
+            raise ValueError("No weights to sample from")
+        if self.prob is None:
+            self.build()
+        rng = np.random if self.rng is None else self.rng
+        u = rng.random(1 if n is None else n) * len(self.prob)
+        cells = np.minimum(u.astype(int), len(self.prob) - 1)
+        idxs = np.where(u - cells < self.prob[cells], cells, self.alias[cells])
+        return idxs[0] if n is None else idxs
+
+
+def categorical_draw(weights, n=None, rng=None):
+    """ Draw an index with probabilities proportional to weights (uniformly if they are all zero), or an array of n indices if n is given.
+
+    The indices are drawn by inverting the cumulative sum of the weights. This costs O(len(weights)) per call, like building an alias table, which only pays off when it is kept for many draws with the same weights (see AliasSampler).
+    """
+    weights = np.array(weights, dtype=float).flatten()
+    if not len(weights):
+        raise ValueError("No weights to sample from")
+    if np.any(weights < 0) or not np.all(np.isfinite(weights)):
+        raise ValueError("Weights should be non-negative and finite")
+    cumsum = np.cumsum(weights)
+    if not cumsum[-1] > 0:
+        cumsum = np.arange(1., len(weights) + 1)
+    rng = np.random if rng is None else rng
+    u = rng.random(1 if n is None else n) * cumsum[-1]
+    idxs = np.minimum(np.searchsorted(cumsum, u, side='right'), len(weights) - 1)
+    return idxs[0] if n is None else idxs
@@ -1,7 +1,7 @@
 import numpy as np
 import math
 
-from scipy import stats
+from .sampling import categorical_draw
 
 
 def dist(p1, p2):
@@ -30,8 +30,7 @@ def prop_choice(v, eps=0.):
     if np.sum(v) == 0 or np.random.rand() < eps:
         return np.random.randint(np.size(v))
     else:
-        probas = np.array(v) / np.sum(v)
-        return np.where(np.random.multinomial(1, probas) == 1)[0][0]
+        return categorical_draw(v)
     
 def softmax_choice(v, temperature=1.):
     if np.sum(v) == 0:
@@ -39,19 +38,11 @@ def softmax_choice(v, temperature=1.):
     else:
         v = np.array(v)
         vmax = max(v)
-        probas = np.exp((v-vmax) / temperature)
-        probas = probas / np.sum(probas)
-        return np.where(np.random.multinomial(1, probas) == 1)[0][0]
+        return categorical_draw(np.exp((v-vmax) / temperature))
 
 def discrete_random_draw(data, nb=1):
-    ''' Code from Steve Nguyen'''
-    data = np.array(data)
-    if not data.any():
-        data = np.ones_like(data)
-    data = data/data.sum()
-    xk = np.arange(len(data))
-    custm = stats.rv_discrete(name='custm', values=(xk, data))
-    return custm.rvs(size=nb)
+    ''' Draw nb indices with probabilities proportional to data (uniformly if data is zero), see utils.sampling. '''
+    return categorical_draw(data, nb)
 
 
 def rk4(x, h, y, f):
@@ -0,0 +1,20 @@
+import numpy as np
+
+from explauto.utils.config import Space
+
+
+def test_space_batch_conversions():
+	space = Space([-1., 0., 2.], [1., 3., 4.], [4, 3, 5])
+	rng = np.random.RandomState(0)
+	values = space.mins + rng.rand(200, 3) * space.widths
+
+	discrete = space.discretize(values, [0, 2])
+	assert np.array_equal(discrete, [space.discretize(v, [0, 2]) for v in values])
+	indices = space.index(values)
+	assert np.array_equal(indices, [space.index(v) for v in values])
+	assert np.array_equal(space.multi2index(space.index2multi(indices)), indices)
+
+	random_values = space.rand_value(indices)
+	assert random_values.shape == (200, 3)
+	assert np.array_equal(space.index(random_values), indices)
+	assert np.array_equal(space.index(space.rand_value(indices[0], 10)), [indices[0]] * 10)
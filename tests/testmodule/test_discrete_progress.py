@@ -0,0 +1,68 @@
+from collections import deque
+
+import numpy as np
+
+from explauto.utils.config import Space, make_configuration
+from explauto.interest_model.competences import competence_dist
+from explauto.interest_model.discrete_progress import DiscreteProgress, DiscretizedProgress
+
+
+def test_ring_buffer_windows():
+	rng = np.random.RandomState(0)
+	x_card, win_size = 7, 10
+	dp = DiscreteProgress(0, x_card, win_size, 0.3, competence_dist)
+	queues = [deque([0.] * win_size, maxlen=win_size) for _ in range(x_card)]
+	for _ in range(50):
+		indices = rng.randint(x_card, size=5)
+		competences = rng.rand(5) * (rng.rand(5) < 0.8)
+		dp.update_from_indices_and_competences(indices, competences)
+		for index, competence in zip(indices, competences):
+			queues[index].append(competence)
+		for index, queue in enumerate(queues):
+			queue = np.array(queue)
+			assert np.array_equal(dp.window(index), queue)
+			assert dp.is_novel(index) == (not queue.any())
+			assert np.isclose(dp.progress()[index], queue[:win_size // 2].mean() - queue[win_size // 2:].mean())
+
+
+def test_sample_given_context():
+	space = Space([0., 0., 0.], [1., 1., 1.], [4, 3, 5])
+	dp = DiscreteProgress(0, space.card, 10, 0.3, competence_dist)
+	rng = np.random.RandomState(0)
+	dp.current_progress = rng.randn(space.card) * (rng.rand(space.card) < 0.5)
+	c, c_dims = [0.6], [1]
+	multi_context = space.discretize([0., 0.6, 0.], c_dims)
+
+	# Cells of the context, enumerated one by one
+	cells = [i for i in range(space.card) if space.index2multi(i)[1] == multi_context[0]]
+	weights = abs(dp.current_progress[cells]) / abs(dp.current_progress[cells]).sum()
+
+	np.random.seed(0)
+	draws = [dp.sample_given_context(c, c_dims, space) for _ in range(10000)]
+	assert set(draws) <= set(cells)
+	freqs = np.array([draws.count(i) for i in cells]) / 10000.
+	assert np.allclose(freqs, weights, atol=0.015)
+
+
+def discretized_progress(sparse=False, eps_random=0.3):
+	conf = make_configuration([0., 0.], [1., 1.], [0., 0.], [1., 1.])
+	return DiscretizedProgress(conf, [2, 3], 100, 10, eps_random, competence_dist, sparse)
+
+
+def test_sparse_matches_dense():
+	rng = np.random.RandomState(0)
+	dense, sparse = discretized_progress(), discretized_progress(sparse=True)
+	XY = rng.rand(500, 4)
+	# goals reached up to a small error, so that most samples stay in their cell
+	MS = XY + 0.02 * rng.randn(500, 4)
+	for xy, ms in zip(XY, MS):
+		dense.update(xy, ms)
+		sparse.update(xy, ms)
+	assert np.allclose(dense.discrete_progress.progress(), sparse.discrete_progress.progress())
+	for index in range(100):
+		assert np.array_equal(dense.discrete_progress.window(index), sparse.discrete_progress.window(index))
+		assert dense.discrete_progress.is_novel(index) == sparse.discrete_progress.is_novel(index)
+
+	progress = sparse.discrete_progress.progress()
+	sparse.discrete_progress.eps_random = 0.
+	assert np.all(progress[sparse.discrete_progress.sample(100)] != 0)
@@ -0,0 +1,96 @@
+import numpy as np
+
+from explauto.utils import rand_bounds
+from explauto.utils.observer import Observer
+from explauto.environment import environments
+from explauto.environment.simple_arm import SimpleArmEnvironment, make_arm_config, configurations
+from explauto.environment.simple_arm.simple_arm import forward, joint_positions, lengths
+from explauto.environment.modular_environment import FlatEnvironment, HierarchicalEnvironment
+
+
+arm_config = make_arm_config(3, np.pi / 3, np.array([-0.5, -1.]), np.array([1., 1.]), 3, 0.)
+top_arm_config = make_arm_config(2, 1., np.array([-1., -1.]), np.array([1., 1.]), 1, 0.)
+
+
+def all_environments():
+	pendulum_cls, pendulum_configs, _ = environments['pendulum']
+	yield 'simple_arm', SimpleArmEnvironment(**arm_config)
+	yield 'pendulum', pendulum_cls(**pendulum_configs['default'])
+	yield 'flat', FlatEnvironment([-1.] * 4, [1.] * 4, [SimpleArmEnvironment] * 2, [arm_config] * 2, lambda s: s)
+	yield 'hierarchical', HierarchicalEnvironment([-np.pi / 3] * 3, [np.pi / 3] * 3, [-1.] * 4, [1.] * 4,
+												  SimpleArmEnvironment, SimpleArmEnvironment, top_arm_config, arm_config,
+												  lambda m: m, lambda m, s: s, lambda m, s_lower, s_top: s_lower + s_top)
+
+
+def test_batch_updates_match_updates():
+	for name, env in all_environments():
+		np.random.seed(0)
+		M = rand_bounds(env.conf.m_bounds, 20)
+		# one command after the other
+		env.reset()
+		chained = [env.update(m, reset=False, log=False) for m in M]
+		assert np.allclose(env.update(M, log=False), chained), name
+		# each command from a reset environment
+		reset = [env.update(m, log=False) for m in M]
+		assert np.allclose(env.update_batch(M, log=False), reset), name
+
+
+class Recorder(Observer):
+	def messages(self):
+		messages = []
+		while not self.notifications.empty():
+			messages.append(self.notifications.get())
+		return messages
+
+
+def test_update_topics():
+	env = SimpleArmEnvironment(**arm_config)
+	M = rand_bounds(env.conf.m_bounds, 5)
+	rows, batches = Recorder(), Recorder()
+	for topic in ['motor', 'sensori']:
+		env.subscribe(topic, rows)
+		env.subscribe(topic, batches)
+		env.subscribe(topic + '_batch', batches)
+
+	S = env.update(M)
+	# the row subscribers get the messages of successive updates
+	messages = rows.messages()
+	assert [topic for topic, _ in messages] == ['motor', 'sensori'] * 5
+	assert np.allclose([msg for _, msg in messages[::2]], M)
+	assert np.allclose([msg for _, msg in messages[1::2]], S)
+	# the batch subscribers get the batch only
+	messages = batches.messages()
+	assert [topic for topic, _ in messages] == ['motor_batch', 'sensori_batch']
+	assert np.allclose(messages[0][1], M) and np.allclose(messages[1][1], S)
+
+
+def test_simple_arm_kinematics_batch():
+	rng = np.random.RandomState(0)
+	ls = lengths(7, 1.5)
+	A = rng.uniform(-1, 1, (20, 7))
+	X, Y = forward(A, ls)
+	JX, JY = joint_positions(A, ls, unit='std')
+	for a, x, y, jx, jy in zip(A, X, Y, JX, JY):
+		# the joint positions of one arm, segment by segment
+		angle, ref_x, ref_y = 0., [0.], [0.]
+		for ai, li in zip(a, ls):
+			angle += ai
+			ref_x.append(ref_x[-1] + li * np.cos(angle))
+			ref_y.append(ref_y[-1] + li * np.sin(angle))
+		assert np.allclose(forward(a, ls), (ref_x[-1], ref_y[-1]))
+		assert np.allclose((x, y), (ref_x[-1], ref_y[-1]))
+		assert np.allclose(joint_positions(a, ls), (ref_x[1:], ref_y[1:]))
+		assert np.allclose((jx, jy), joint_positions(np.pi * a, ls))
+
+
+def test_simple_arm_update_batch_matches_updates():
+	for config in configurations.values():
+		env = SimpleArmEnvironment(**config)
+		M = rand_bounds(env.conf.m_bounds, 100) * 1.2
+		# the noise of the batch is drawn in the order of successive updates
+		np.random.seed(0)
+		reset = [env.update(m, log=False) for m in M]
+		np.random.seed(0)
+		assert np.allclose(env.update_batch(M, log=False), reset)
+		env.noise = 0.
+		assert np.allclose(env.update_batch(M, log=False), [env.update(m, log=False) for m in M])
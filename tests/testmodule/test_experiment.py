@@ -0,0 +1,73 @@
+import numpy as np
+
+from explauto.experiment import Experiment, make_settings
+
+
+def experiment(n_bootstrap=0, eval_at=(1, 10, 25, 40)):
+	xp = Experiment.from_settings(make_settings('simple_arm', 'goal', 'random', 'nearest_neighbor',
+												environment_config='low_dimensional'))
+	xp.env.noise = 0.
+	xp.ag.n_bootstrap = n_bootstrap
+	xp.evaluate_at(list(eval_at), xp.env.uniform_sensor(5))
+	# record the number of iterations perceived by the agent at each evaluation
+	xp.eval_times = []
+	evaluate = xp.evaluation.evaluate
+	def timed_evaluate():
+		xp.eval_times.append(xp.ag.t)
+		return evaluate()
+	xp.evaluation.evaluate = timed_evaluate
+	return xp
+
+
+def check_logs(xp, n_iter):
+	for topic in ['choice', 'inference', 'motor', 'sensori', 'perception']:
+		assert xp.log.counts[topic] == n_iter, topic
+		assert len(xp.log.logs[topic]) == n_iter, topic
+	assert xp.ag.t == n_iter
+	assert xp.ag.sensorimotor_model.size() == n_iter
+	# the logged movements and their effects are those learned by the sensorimotor model
+	dataset = xp.ag.sensorimotor_model.model.imodel.fmodel.dataset
+	M = np.array(list(dataset.iter_x()))
+	S = np.array(list(dataset.iter_y()))
+	assert np.allclose(M, xp.log.logs['motor'])
+	assert np.allclose(S, xp.log.logs['sensori'])
+	assert np.allclose(S, xp.env.update(M))
+
+
+def test_bootstrap_stage():
+	np.random.seed(0)
+	xp = experiment(n_bootstrap=30)
+	xp.run(50)
+	check_logs(xp, 50)
+	assert xp.ag.n_bootstrap == 0
+	assert xp.eval_times == [0, 9, 24, 39]
+	assert len(xp.log.eval_errors) == 4
+
+	# the bootstrap inferences are random commands within the bounds, executed as they are
+	inferences = np.array(xp.log.logs['inference'][:30])
+	assert np.allclose(inferences, xp.log.logs['motor'][:30])
+	assert np.all(inferences >= xp.ag.conf.m_mins) and np.all(inferences <= xp.ag.conf.m_maxs)
+
+
+def test_agent_bootstrap():
+	np.random.seed(0)
+	xp = experiment(n_bootstrap=30)
+	S = xp.ag.bootstrap(xp.env, 20)
+	assert S.shape == (20, len(xp.ag.conf.s_dims))
+	assert xp.ag.n_bootstrap == 10 and xp.ag.t == 20
+	assert xp.ag.sensorimotor_model.size() == 20
+	assert np.allclose(S, xp.env.update(xp.ag.m))
+
+
+def test_batch_run_matches_sequential_run():
+	runs = {}
+	for batch_size in [1, 7, 50]:
+		np.random.seed(0)
+		xp = experiment(n_bootstrap=5)
+		xp.run(60, batch_size=batch_size)
+		check_logs(xp, 60)
+		runs[batch_size] = xp
+	for batch_size in [7, 50]:
+		# the evaluations take place after the same numbers of iterations
+		assert runs[batch_size].eval_times == runs[1].eval_times == [0, 9, 24, 39]
+		assert len(runs[batch_size].log.eval_errors) == 4
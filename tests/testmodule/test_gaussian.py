@@ -0,0 +1,16 @@
+import numpy as np
+from scipy.stats import multivariate_normal
+
+from explauto.models.gaussian import Gaussian
+
+
+def test_log_normal_matches_scipy():
+	rng = np.random.RandomState(0)
+	a = rng.randn(4, 4)
+	mu, sigma = rng.randn(4), a.dot(a.T) + np.eye(4)
+	gaussian = Gaussian(mu, sigma)
+	x = rng.randn(20, 4)
+	assert np.allclose(gaussian.log_normal(x), multivariate_normal.logpdf(x, mu, sigma))
+	assert np.allclose(gaussian.normal(x[0]), multivariate_normal.pdf(x[0], mu, sigma))
+	assert np.allclose(gaussian.inv, np.linalg.inv(sigma))
+	assert np.allclose(gaussian.det, np.linalg.det(sigma))
@@ -0,0 +1,105 @@
+from copy import deepcopy
+
+import numpy as np
+from scipy.stats import multivariate_normal
+
+from explauto.models.gmminf import GMM, conditional
+
+
+def fitted_gmm(covariance_type='full', n_components=3, dim=4, **kwargs):
+	rng = np.random.RandomState(0)
+	data = rng.randn(300, dim).dot(rng.randn(dim, dim)) + rng.randn(dim)
+	return GMM(n_components=n_components, covariance_type=covariance_type, random_state=0, **kwargs).fit(data), data
+
+
+def reference_conditional(gmm, in_dims, out_dims, value):
+	# P(Y | X=value) computed component by component with the conditional function
+	weights, means, covars = [], [], []
+	for w, m, c in gmm:
+		weights.append(w * multivariate_normal.pdf(value, m[in_dims], c[np.ix_(in_dims, in_dims)]))
+		mean, covar = conditional(m, c, in_dims, out_dims)(value)
+		means.append(mean)
+		covars.append(covar)
+	return np.array(weights) / np.sum(weights), np.array(means), np.array(covars)
+
+
+def test_conditioner_matches_conditional():
+	gmm, data = fitted_gmm()
+	in_dims, out_dims = [0, 2], [1, 3]
+	cond = gmm.conditioner(in_dims, out_dims)
+	values = data[:10, in_dims]
+	weights, means = cond.weights_given(values), cond.means_given(values)
+	for i, value in enumerate(values):
+		ref_weights, ref_means, ref_covars = reference_conditional(gmm, in_dims, out_dims, value)
+		assert np.allclose(weights[i], ref_weights)
+		assert np.allclose(means[i], ref_means)
+		assert np.allclose(cond.covariances, ref_covars)
+
+		gmm_inf = gmm.inference(in_dims, out_dims, value)
+		assert np.allclose(gmm_inf.weights_, ref_weights)
+		assert np.allclose(gmm_inf.means_, ref_means)
+
+
+def test_conditioner_cache():
+	gmm, data = fitted_gmm()
+	cond = gmm.conditioner([0], [1, 2])
+	assert gmm.conditioner([0], [1, 2]) is cond
+	gmm.fit(data[:100])
+	assert gmm.conditioner([0], [1, 2]) is not cond
+
+
+def test_partial_fit_matches_sklearn_em_iteration():
+	for covariance_type in ['full', 'diag']:
+		gmm, data = fitted_gmm(covariance_type, max_iter=5)
+		# one warm-started EM iteration of sklearn
+		reference = deepcopy(gmm)
+		reference.warm_start, reference.max_iter = True, 1
+		new_data = data[::-1] + 0.1
+		gmm.partial_fit(new_data, n_iter=1)
+		reference.fit(new_data)
+		assert np.allclose(gmm.weights_, reference.weights_)
+		assert np.allclose(gmm.means_, reference.means_)
+		assert np.allclose(gmm.covariances_, reference.covariances_)
+
+
+def test_log_prob_batch_matches_sklearn():
+	for covariance_type in ['full', 'diag']:
+		gmm, data = fitted_gmm(covariance_type)
+		assert np.allclose(gmm.log_prob_batch(data), gmm.score_samples(data))
+		assert np.allclose(gmm.probability(data[0]), np.exp(gmm.score_samples(data[:1]))[0])
+
+
+def full_gmm(gmm):
+	# The same mixture with explicit full covariances
+	res = GMM(n_components=gmm.n_components, covariance_type='full')
+	res.weights_, res.means_ = gmm.weights_, gmm.means_
+	res.covariances_ = np.array([c if np.ndim(c) == 2 else np.diag(c) for _, _, c in gmm])
+	return res
+
+
+def test_structured_conditioners_match_full():
+	for covariance_type, kwargs in [('diag', {}), ('lowrank', {'rank': 2})]:
+		gmm, data = fitted_gmm(covariance_type, dim=6, **kwargs)
+		full = full_gmm(gmm)
+		in_dims, out_dims = [0, 3, 4], [1, 2, 5]
+		cond, full_cond = gmm.conditioner(in_dims, out_dims), full.conditioner(in_dims, out_dims)
+		values = data[:10, in_dims]
+		assert np.allclose(cond.weights_given(values), full_cond.weights_given(values))
+		assert np.allclose(cond.means_given(values), full_cond.means_given(values))
+		covariances = full_gmm(gmm.inference(in_dims, out_dims, values[0])).covariances_
+		assert np.allclose(covariances, full_cond.covariances)
+		assert np.allclose(gmm.log_prob_batch(data), full.log_prob_batch(data))
+
+
+def test_sklearn_scoring_after_fits():
+	for covariance_type, kwargs in [('full', {}), ('diag', {}), ('lowrank', {'rank': 2})]:
+		gmm, data = fitted_gmm(covariance_type, dim=6, **kwargs)
+		for _ in range(2):
+			log_prob = gmm.log_prob_batch(data)
+			assert np.allclose(gmm.score_samples(data), log_prob)
+			assert np.isclose(gmm.score(data), np.mean(log_prob))
+			weights = gmm.conditioner([0, 1, 2, 3, 4, 5], []).weights_given(data)
+			assert np.allclose(gmm.predict_proba(data), weights)
+			assert np.array_equal(gmm.predict(data), weights.argmax(axis=1))
+			# the scores follow the parameters of a warm-started fit
+			gmm.partial_fit(data[::2], n_iter=2)
@@ -0,0 +1,119 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from explauto import Environment
+from explauto.utils.config import make_configuration
+
+
+def test_to_gmm_cache():
+	pytest.importorskip('imle')
+	from explauto.sensorimotor_model.imle import ImleGmmModel
+
+	env = Environment.from_configuration('simple_arm', 'low_dimensional')
+	sm = ImleGmmModel(env.conf, gmm_refresh=10)
+	for m in env.random_motors(50):
+		sm.update(m, env.update(m))
+
+	gmm = sm.to_gmm()
+	fresh = sm.imle.to_gmm(sm.covariance_type, sm.rank)
+	for p, q in zip(gmm._parameters(), fresh._parameters()):
+		assert np.allclose(p, q)
+	assert sm.to_gmm() is gmm
+
+	# refreshed after gmm_refresh updates
+	for m in env.random_motors(10):
+		sm.update(m, env.update(m))
+	refreshed = sm.to_gmm()
+	assert refreshed is not gmm
+	assert sm.update_gmm() is not refreshed
+
+
+class StubImle(object):
+	""" Experts with random joint distributions, standing for the IMLE extension: a new expert every 5 updates,
+	the others updates moving the mean of the last expert. """
+	def __init__(self, d, D, **kwargs):
+		self.d, self.D = d, D
+		self.rng = np.random.RandomState(0)
+		self.mus, self.sigmas = [], []
+		self.n_updates = 0
+
+	@property
+	def number_of_experts(self):
+		return len(self.mus)
+
+	def get_joint_mu(self, k):
+		return self.mus[k]
+
+	def get_joint_sigma(self, k):
+		return self.sigmas[k]
+
+	def update(self, x, y):
+		if self.n_updates % 5 == 0:
+			a = self.rng.randn(self.d + self.D, self.d + self.D)
+			self.mus.append(np.hstack((x, y)))
+			self.sigmas.append(a.dot(a.T) + 0.1 * np.eye(self.d + self.D))
+		else:
+			self.mus[-1] = self.mus[-1] + 0.01
+		self.n_updates += 1
+
+
+def stub_imle_model(monkeypatch, **kwargs):
+	# import the IMLE model against the stub extension
+	monkeypatch.setitem(sys.modules, 'imle', types.SimpleNamespace(Imle=StubImle))
+	for name in ['explauto.models.imle_model', 'explauto.sensorimotor_model.imle']:
+		# removed for the test, and restored (or removed) afterwards
+		monkeypatch.setitem(sys.modules, name, None)
+		monkeypatch.delitem(sys.modules, name)
+	from explauto.sensorimotor_model.imle import ImleGmmModel
+	return ImleGmmModel(make_configuration([0.] * 3, [1.] * 3, [0.] * 3, [1.] * 3), **kwargs)
+
+
+def test_to_gmm_cache_with_stub_experts(monkeypatch):
+	sm = stub_imle_model(monkeypatch, gmm_refresh=3)
+	rng = np.random.RandomState(1)
+	update = lambda: sm.update(rng.rand(3), rng.rand(3))
+	for _ in range(6):
+		update()
+	gmm = sm.to_gmm()
+	assert gmm.n_components == 2
+	for p, q in zip(gmm._parameters(), sm.imle.to_gmm()._parameters()):
+		assert np.allclose(p, q)
+	assert sm.to_gmm() is gmm
+
+	# same experts, fewer than gmm_refresh updates: the stale GMM is kept
+	update()
+	assert sm.to_gmm() is gmm
+	# rebuilt after gmm_refresh updates
+	update()
+	update()
+	refreshed = sm.to_gmm()
+	assert refreshed is not gmm
+	assert np.allclose(refreshed.means_, [sm.imle.get_joint_mu(k) for k in range(2)])
+	# rebuilt when the number of experts changes, before gmm_refresh updates
+	update()
+	assert sm.to_gmm() is refreshed
+	update()
+	assert sm.to_gmm() is not refreshed and sm.to_gmm().n_components == 3
+
+
+def test_structured_exports(monkeypatch):
+	rank = 2
+	sm = stub_imle_model(monkeypatch, covariance_type='lowrank', rank=rank)
+	rng = np.random.RandomState(1)
+	for _ in range(20):
+		sm.update(rng.rand(3), rng.rand(3))
+	lowrank, diag = sm.to_gmm(), sm.imle.to_gmm('diag')
+	for k in range(sm.imle.number_of_experts):
+		sigma = sm.imle.get_joint_sigma(k)
+		assert np.allclose(diag.covariances_[k], np.diagonal(sigma))
+		factors = lowrank.factors_[k]
+		covariance = np.diag(lowrank.covariances_[k]) + factors.dot(factors.T)
+		# the leading eigen-directions plus the remaining variances: exact diagonal, and an error
+		# bounded by the discarded eigenvalues out of the diagonal
+		assert np.allclose(np.diagonal(covariance), np.diagonal(sigma))
+		discarded = np.linalg.eigvalsh(sigma)[:-rank]
+		assert np.linalg.norm(covariance - sigma, 2) <= 2 * discarded.max() + 1e-10
+		assert np.allclose(covariance, sigma) == np.allclose(discarded, 0.)
@@ -0,0 +1,112 @@
+import numpy as np
+
+from explauto.utils.config import make_configuration
+from explauto.interest_model import interest_models
+from explauto.interest_model.competences import competence_dist, competence_exp
+from explauto.interest_model.discrete_progress import DiscretizedProgress
+from explauto.interest_model.gmm_progress import GmmInterest
+from explauto.interest_model.random import MiscRandomInterest
+from explauto.interest_model.tree import InterestTree
+
+
+conf = make_configuration([0., 0.], [1., 1.], [0., 0.], [1., 1.])
+
+
+def goals_and_reached(n, seed=0):
+	rng = np.random.RandomState(seed)
+	XY = rng.rand(n, 4)
+	return XY, XY + 0.1 * rng.randn(n, 4)
+
+
+def test_misc_random_window_statistics():
+	XY, MS = goals_and_reached(100)
+	for win_size in [1, 7, 20]:
+		im = MiscRandomInterest(conf, [2, 3], competence_dist, win_size)
+		for t, (xy, ms) in enumerate(zip(XY, MS)):
+			im.update(xy, ms)
+			# competences as stored in the dataset, and the statistics over the window
+			c = np.array([im.data_xc.get_y(idx)[0] for idx in range(t + 1)])
+			assert np.isclose(im.competence_global('all'), np.mean(c))
+			window = c[-win_size:]
+			assert np.isclose(im.competence_global(), np.mean(window))
+			assert np.isclose(im.competence_std(), np.std(window))
+			if t > 0 and len(window) > 1:
+				half = len(window) // 2
+				assert np.isclose(im.interest_global(), abs(np.mean(window[half:]) - np.mean(window[:half])))
+		assert im.window_c.shape == (win_size,)
+
+
+def all_interest_models():
+	for name, (cls, configs) in interest_models.items():
+		for config_name, config in configs.items():
+			yield name + '/' + config_name, cls(conf, [2, 3], **config)
+
+
+def test_sample_shapes_and_bounds():
+	np.random.seed(0)
+	XY, MS = goals_and_reached(200)
+	for name, im in all_interest_models():
+		for xy, ms in zip(XY, MS):
+			im.update(xy, ms)
+		x = im.sample()
+		assert np.shape(x) == (2,), name
+		for n in [1, 7, 100]:
+			X = im.sample(n)
+			assert np.shape(X) == (n, 2), name
+			assert np.all(X >= conf.s_mins) and np.all(X <= conf.s_maxs), name
+
+
+def test_gmm_sample_serves_current_batch_first():
+	np.random.seed(0)
+	im = GmmInterest(conf, [2, 3], competence_exp)
+	im.sample()
+	left = im.goals.copy()
+	X = im.sample(len(left) + 5)
+	assert np.array_equal(X[:len(left)], left)
+	assert len(im.goals) == 0
+
+
+def sequential_and_batch(cls, XY, MS, **kwargs):
+	# Two models built from the same random state, updated one sample at a time and in one batch
+	np.random.seed(0)
+	sequential = cls(conf, [2, 3], **kwargs)
+	np.random.seed(0)
+	batch = cls(conf, [2, 3], **kwargs)
+	for xy, ms in zip(XY, MS):
+		sequential.update(xy, ms)
+	batch.update_batch(XY, MS)
+	return sequential, batch
+
+
+def test_update_batch_matches_sequential():
+	XY, MS = goals_and_reached(500)
+	for name, (cls, configs) in interest_models.items():
+		if name == 'tree':
+			# the node ids depend on the insertion order, the leaves are compared below
+			continue
+		for config in configs.values():
+			sequential, batch = sequential_and_batch(cls, XY, MS, **config)
+			np.random.seed(1)
+			X = sequential.sample(20)
+			np.random.seed(1)
+			assert np.allclose(batch.sample(20), X), name
+
+	sequential, batch = sequential_and_batch(MiscRandomInterest, XY, MS, competence_measure=competence_dist, win_size=20)
+	assert np.allclose(list(batch.data_xc.iter_y()), list(sequential.data_xc.iter_y()))
+	assert np.allclose(batch.window_c, sequential.window_c)
+	assert np.isclose(batch.interest(), sequential.interest())
+	assert np.isclose(batch.interest_global(), sequential.interest_global())
+
+	sequential, batch = sequential_and_batch(DiscretizedProgress, XY, MS, x_card=100, win_size=10, eps_random=0.3,
+											 measure=competence_dist)
+	assert np.allclose(batch.discrete_progress.progress(), sequential.discrete_progress.progress())
+
+	sequential, batch = sequential_and_batch(GmmInterest, XY, MS, measure=competence_exp)
+	assert sequential.t == batch.t
+	assert np.allclose(batch.data, sequential.data)
+	assert np.allclose(batch.gmm.means_, sequential.gmm.means_)
+
+	sequential, batch = sequential_and_batch(InterestTree, XY, MS, **interest_models['tree'][1]['default'])
+	assert np.array_equal(batch.data_x, sequential.data_x) and np.allclose(batch.data_c, sequential.data_c)
+	leaves = lambda tree: sorted((tuple(tree.bounds[leaf].flatten()), round(tree.progresses[leaf], 9)) for leaf in tree.leaves())
+	assert leaves(batch.tree) == leaves(sequential.tree)
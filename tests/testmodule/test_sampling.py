@@ -0,0 +1,44 @@
+import pickle
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from explauto.utils.sampling import AliasSampler, categorical_draw
+from explauto.interest_model.competences import competence_dist
+from explauto.interest_model.discrete_progress import DiscreteProgress
+
+
+def frequencies(draws, n_cells):
+	return np.bincount(draws, minlength=n_cells) / float(len(draws))
+
+
+def test_draws_match_weights():
+	rng = np.random.RandomState(0)
+	weights = rng.rand(20) * (rng.rand(20) < 0.7)
+	probabilities = weights / weights.sum()
+
+	np.random.seed(0)
+	sampler = AliasSampler(weights)
+	assert np.allclose(frequencies(sampler.sample(100000), 20), probabilities, atol=0.005)
+	assert np.allclose(frequencies(categorical_draw(weights, 100000), 20), probabilities, atol=0.005)
+	assert np.allclose(frequencies([categorical_draw(weights) for _ in range(20000)], 20), probabilities, atol=0.01)
+
+	generator_draws = AliasSampler(weights, np.random.default_rng(0)).sample(100000)
+	assert np.allclose(frequencies(generator_draws, 20), probabilities, atol=0.005)
+
+	# uniform draws when all the weights are zero
+	assert np.allclose(frequencies(AliasSampler(np.zeros(5)).sample(50000), 5), 0.2, atol=0.01)
+	assert np.allclose(frequencies(categorical_draw(np.zeros(5), 50000), 5), 0.2, atol=0.01)
+
+	with pytest.raises(ValueError):
+		categorical_draw([1., -1.])
+
+
+def test_discrete_progress_copy():
+	dp = DiscreteProgress(0, 10, 5, 0., competence_dist)
+	dp.update_from_indices_and_competences([1, 2, 2], [0.5, 0.2, 0.9])
+	dp.sample(10)
+	for copy in [deepcopy(dp), pickle.loads(pickle.dumps(dp))]:
+		assert np.array_equal(copy.progress(), dp.progress())
+		assert set(copy.sample(100)) <= {1, 2}
@@ -0,0 +1,73 @@
+import numpy as np
+
+from explauto.utils.config import make_configuration
+from explauto.models.dataset import BufferedDataset
+from explauto.sensorimotor_model.non_parametric import NonParametric, sensorimotor_models
+
+
+conf = make_configuration([-1., -1., -1.], [1., 1., 1.], [-3., -3.], [3., 3.])
+
+
+def arm(M):
+	# a smooth function from the motor to the sensory space
+	return np.column_stack((np.cos(M[:, 0]) + M[:, 1], np.sin(M[:, 2]) * M[:, 0] + M[:, 1] ** 2))
+
+
+def test_dataset_batch_queries():
+	rng = np.random.RandomState(0)
+	X, Y = rng.rand(450, 3), rng.rand(450, 2)
+	# points in the tree only, in the buffer only, and in both
+	for n in [0, 150, 450]:
+		dataset = BufferedDataset(3, 2)
+		if n == 150:
+			for x, y in zip(X[:n], Y[:n]):
+				dataset.add_xy(x, y)
+		else:
+			dataset.add_xy_batch(list(X[:300]), list(Y[:300]))
+			for x, y in zip(X[300:n], Y[300:n]):
+				dataset.add_xy(x, y)
+		for k in [1, 5]:
+			dists, idxs = dataset.nn_x_batch(X[:20] + 0.01, k=k)
+			for x, d, i in zip(X[:20] + 0.01, dists, idxs):
+				ref_d, ref_i = dataset.nn_x(x, k=k)
+				assert np.allclose(d, ref_d) and np.array_equal(i, ref_i)
+			dists, idxs = dataset.nn_y_batch(Y[:20] + 0.01, k=k)
+			for y, d, i in zip(Y[:20] + 0.01, dists, idxs):
+				ref_d, ref_i = dataset.nn_y(y, k=k)
+				assert np.allclose(d, ref_d) and np.array_equal(i, ref_i)
+
+
+def test_infer_batch_matches_infer():
+	rng = np.random.RandomState(0)
+	M = rng.uniform(-1, 1, (450, 3))
+	S = arm(M)
+	X_m, X_s = rng.uniform(-1, 1, (5, 3)), arm(rng.uniform(-1, 1, (5, 3)))
+	for name, (cls, configs) in sensorimotor_models.items():
+		for config in configs.values():
+			sm = cls(conf, **config)
+			# not bootstrapped in the sensory space: random commands
+			for m in M[:20]:
+				sm.update(m, [0., 0.])
+			np.random.seed(0)
+			ref = [sm.infer(conf.s_dims, conf.m_dims, s) for s in X_s]
+			np.random.seed(0)
+			assert np.allclose(sm.infer_batch(conf.s_dims, conf.m_dims, X_s), ref), name
+
+			# the tree of the dataset, and its buffer
+			sm = cls(conf, **config)
+			sm.update_batch(M[:300], S[:300])
+			for m, s in zip(M[300:], S[300:]):
+				sm.update(m, s)
+			ref = [sm.infer(conf.m_dims, conf.s_dims, m) for m in X_m]
+			assert np.allclose(sm.infer_batch(conf.m_dims, conf.s_dims, X_m), ref), name
+			if name == 'LWLR-CMAES':
+				# the inverse loops over infer, and the bundled cma module fails with recent numpy versions
+				continue
+			for mode in ['explore', 'exploit']:
+				sm.mode = mode
+				np.random.seed(0)
+				ref = [sm.infer(conf.s_dims, conf.m_dims, s) for s in X_s]
+				mean_explore = getattr(sm, 'mean_explore', None)
+				np.random.seed(0)
+				assert np.allclose(sm.infer_batch(conf.s_dims, conf.m_dims, X_s), ref), (name, mode)
+				assert np.allclose(getattr(sm, 'mean_explore', None), mean_explore), (name, mode)
@@ -0,0 +1,189 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from explauto.utils.config import make_configuration
+from explauto.interest_model.competences import competence_exp
+from explauto.interest_model.tree import InterestTree, Tree, SumTree
+
+
+def tree_params(**kwargs):
+	params = dict(max_points_per_region=20, max_depth=20, split_mode='median',
+				  competence_measure=lambda target, reached: competence_exp(target, reached, 0., 10.),
+				  progress_win_size=10, progress_measure='abs_deriv_smooth',
+				  sampling_mode={'mode': 'proportional', 'param': 0.2, 'multiscale': False, 'volume': True})
+	params.update(kwargs)
+	return params
+
+
+conf = make_configuration([0., 0.], [1., 1.], [0., 0.], [1., 1.])
+
+
+def interest_tree(**kwargs):
+	return InterestTree(conf, [2, 3], **tree_params(**kwargs))
+
+
+def test_buffers():
+	rng = np.random.RandomState(0)
+	XY, MS = rng.rand(100, 4), rng.rand(100, 4)
+	im = interest_tree()
+	for xy, ms in zip(XY, MS):
+		im.update(xy, ms)
+	assert np.array_equal(im.data_x, XY[:, 2:])
+	assert np.allclose(im.data_c, [competence_exp(xy, ms, 0., 10.) for xy, ms in zip(XY, MS)])
+
+
+def filled_tree(n=500, seed=0, **kwargs):
+	rng = np.random.RandomState(seed)
+	im = interest_tree(**kwargs)
+	for xy, ms in zip(rng.rand(n, 4), rng.rand(n, 4)):
+		im.update(xy, ms)
+	return im
+
+
+def test_leaves_partition_points():
+	im = filled_tree()
+	tree = im.tree
+	leaves = tree.leaves()
+	assert len(leaves) > 1
+	assert sorted(i for leaf in leaves for i in tree.leaf_idxs[leaf]) == list(range(im.n_points))
+	for leaf in leaves:
+		x = im.data_x[tree.leaf_idxs[leaf]]
+		assert np.all(tree.pt2leaf_ids(x) == leaf)
+		assert all(tree.pt2leaf_id(xi) == leaf for xi in x)
+		assert np.all(x >= tree.bounds[leaf, 0]) and np.all(x <= tree.bounds[leaf, 1])
+	for node in tree.subtree():
+		assert tree.counts[node] == len(tree.node_idxs(node))
+		assert (tree.leaf_idxs[node] is None) == (tree.lowers[node] >= 0)
+
+
+def test_incremental_progress():
+	for progress_measure in ['abs_deriv_cov', 'abs_deriv', 'abs_deriv_smooth']:
+		im = filled_tree(progress_measure=progress_measure)
+		tree = im.tree
+		for node in tree.subtree():
+			assert np.isclose(tree.progresses[node], tree.progress_idxs(tree.node_idxs(node)))
+		for node in tree.leaves():
+			assert tree.max_leaf_progresses[node] == tree.progresses[node]
+		assert np.isclose(tree.max_leaf_progresses[0], max(tree.progresses[tree.leaves()]))
+
+
+def test_best_interest_diff_split():
+	rng = np.random.RandomState(0)
+	data_x, data_c = rng.rand(20, 2), rng.rand(20)
+	for progress_measure in ['abs_deriv_cov', 'abs_deriv', 'abs_deriv_smooth']:
+		tree = Tree(lambda: data_x, [[0., 0.], [1., 1.]], lambda: data_c, 20, 20, 'best_interest_diff', 10,
+					progress_measure, {'mode': 'greedy', 'multiscale': False, 'volume': False}, idxs=range(20))
+
+		masks = rng.rand(50, 20) < 0.5
+		assert np.allclose(tree.progress_masks(data_c, masks),
+						   [tree.progress_idxs(np.nonzero(mask)[0]) for mask in masks])
+
+		# Splits between consecutive points, evaluated one by one
+		x = np.sort(data_x[:, 0])
+		splits = (x[:-1] + x[1:]) / 2
+		fitness = []
+		for split in splits:
+			lower, greater = np.nonzero(data_x[:, 0] <= split)[0], np.nonzero(data_x[:, 0] > split)[0]
+			fitness.append(len(lower) * len(greater) * abs(tree.progress_idxs(lower) - tree.progress_idxs(greater)))
+		tree.split(0)
+		assert tree.split_values[0] == splits[np.argmax(fitness)]
+
+
+def test_sum_tree():
+	rng = np.random.RandomState(0)
+	weights = rng.rand(37)
+	weights[5] = 0.
+	sum_tree, max_tree = SumTree(weights), SumTree(weights, np.maximum)
+	weights = np.concatenate((weights, np.zeros(40)))
+	weights[[3, 40, 70]] = [2., 0.5, 1.5]
+	sum_tree.update([3, 40, 70], weights[[3, 40, 70]])
+	max_tree.update([3, 40, 70], weights[[3, 40, 70]])
+	assert np.isclose(sum_tree.total(), weights.sum())
+	assert max_tree.total() == weights.max()
+
+	np.random.seed(0)
+	draws = np.bincount(sum_tree.sample(200000), minlength=len(weights))
+	assert len(draws) == len(weights)
+	assert draws[weights == 0.].sum() == 0
+	assert np.allclose(draws / 200000., weights / weights.sum(), atol=0.005)
+
+
+def test_weight_trees_follow_progress():
+	rng = np.random.RandomState(0)
+	for multiscale in [False, True]:
+		im = filled_tree(sampling_mode={'mode': 'proportional', 'multiscale': multiscale, 'volume': True})
+		tree = im.tree
+		keys = [('leaves', np.add, None), ('progress', np.add, None), ('progress', np.maximum, None), ('softmax', np.add, 0.5)]
+		for weights, op, scale in keys:
+			tree.weight_tree(weights, op, scale)
+		for xy, ms in zip(rng.rand(200, 4), rng.rand(200, 4)):
+			im.update(xy, ms)
+			im.sample()
+		for weights, op, scale in keys:
+			weight_tree = tree.weight_tree(weights, op, scale)
+			expected = tree.sampling_weights(np.arange(tree.n_nodes), weights, scale, tree.weight_trees[(weights, op)][2])
+			assert np.allclose(weight_tree.nodes[weight_tree.capacity:][:tree.n_nodes], expected)
+			assert np.isclose(weight_tree.total(), op.reduce(expected))
+
+
+def test_softmax_weight_tree_rebuilds(monkeypatch):
+	import explauto.interest_model.tree as tree_module
+	builds = []
+	def counting_sum_tree(*args, **kwargs):
+		builds.append(args)
+		return SumTree(*args, **kwargs)
+	monkeypatch.setattr(tree_module, 'SumTree', counting_sum_tree)
+
+	rng = np.random.RandomState(0)
+	for temperature, max_builds in [(0.2, 2), (1e-5, 100)]:
+		del builds[:]
+		im = interest_tree(sampling_mode={'mode': 'softmax', 'param': temperature, 'multiscale': False, 'volume': True})
+		for xy, ms in zip(rng.rand(2000, 4), rng.rand(2000, 4)):
+			im.update(xy, ms)
+			im.sample()
+		# The max-tree of progresses and the softmax sum-tree are built once, and only rebased on overflows
+		assert 2 <= len(builds) <= max_builds
+		tree = im.tree
+		weight_tree, _, offset = tree.weight_trees[('softmax', np.add)]
+		w = tree.progresses[:tree.n_nodes] * tree.volumes[:tree.n_nodes]
+		leaves = tree.lowers[:tree.n_nodes] < 0
+		assert np.isfinite(weight_tree.total()) and weight_tree.total() > 0.
+		assert np.allclose(weight_tree.nodes[weight_tree.capacity:][:tree.n_nodes][leaves],
+						   np.exp(w[leaves] / temperature - offset))
+
+
+def test_nn_matches_ckdtree():
+	im = filled_tree(1000)
+	kdtree = cKDTree(im.data_x)
+	x = np.random.RandomState(1).rand(50, 2)
+	for k in [1, 5]:
+		for p in [1, 2, np.inf]:
+			for distance_upper_bound in [np.inf, 0.05]:
+				dists, idxs = im.tree.nn(x, k=k, p=p, distance_upper_bound=distance_upper_bound)
+				ref_dists, ref_idxs = kdtree.query(x, k=k, p=p, distance_upper_bound=distance_upper_bound)
+				assert np.allclose(dists, ref_dists)
+				assert np.array_equal(idxs, ref_idxs)
+	dists, idxs = im.tree.nn(x[0], k=3)
+	assert np.shape(dists) == (3,) and np.array_equal(idxs, kdtree.query(x[0], k=3)[1])
+	_, idxs = im.tree.nn(x, k=None, distance_upper_bound=0.1)
+	assert [sorted(i) for i in idxs] == [sorted(i) for i in kdtree.query_ball_point(x, 0.1)]
+
+
+def leaves_summary(tree):
+	return sorted((tuple(tree.bounds[leaf].flatten()), tuple(sorted(tree.leaf_idxs[leaf])), round(tree.progresses[leaf], 9))
+				  for leaf in tree.leaves())
+
+
+def test_bulk_update_matches_sequential():
+	for split_mode in ['median', 'middle', 'best_interest_diff']:
+		im = filled_tree(1000, split_mode=split_mode)
+		X, C = im.data_x.copy(), im.data_c.copy()
+
+		bulk = interest_tree(split_mode=split_mode)
+		bulk.bulk_update(X[:300], C[:300])
+		bulk.bulk_update(X[300:], C[300:])
+		assert np.array_equal(bulk.data_x, X) and np.array_equal(bulk.data_c, C)
+		assert leaves_summary(bulk.tree) == leaves_summary(im.tree)
+
+		rebuilt = InterestTree.from_data(conf, [2, 3], X, C, **tree_params(split_mode=split_mode))
+		assert leaves_summary(rebuilt.tree) == leaves_summary(im.tree)